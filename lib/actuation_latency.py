@@ -0,0 +1,126 @@
+"""
+Package for measuring how late actuator events are executed compared with their scheduled times.
+"""
+
+import bisect
+import logging
+import time
+
+# upper bounds of the histogram buckets in seconds (1, 2 and 5 times powers of ten from 100 microseconds to 1000
+# seconds), later events are counted in the last bucket
+_BUCKET_BOUNDS = [factor * 10 ** exponent for exponent in range(-4, 3) for factor in (1, 2, 5)] + [1000]
+
+class LatencyHistogram():
+    """
+    Class for counting latencies in buckets with bounds growing by a factor of about two, so the histogram takes the
+    same memory regardless of how long the sampler runs. Percentiles are reported as the upper bound of the bucket that
+    contains them, the maximum is exact.
+    """
+    __slots__ = ["bucket_counts", "count", "maximum"]
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(_BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.maximum = 0.0
+
+    def add(self, latency):
+        """
+        :param latency: float representing the latency in seconds, negative latencies are counted as zero
+        """
+        latency = max(0.0, latency)
+        self.bucket_counts[bisect.bisect_left(_BUCKET_BOUNDS, latency)] += 1
+        self.count += 1
+        self.maximum = max(self.maximum, latency)
+
+    def get_percentile(self, percentile):
+        """
+        :param percentile: number between 0 and 100
+        :return: float representing the upper bound of the bucket containing the percentile in seconds (at most the
+        maximum), or None if no latency was added
+        """
+        assert(0 <= percentile <= 100)
+        if self.count == 0:
+            return None
+        rank = max(1, percentile * self.count / 100)
+        cumulative_count = 0
+        for bucket, bucket_count in enumerate(self.bucket_counts):
+            cumulative_count += bucket_count
+            if cumulative_count >= rank:
+                break
+        if bucket == len(_BUCKET_BOUNDS):
+            return self.maximum
+        return min(self.maximum, _BUCKET_BOUNDS[bucket])
+
+    def get_summary(self):
+        """
+        :return: string representing the number of latencies, p50, p99 and maximum in milliseconds
+        """
+        if self.count == 0:
+            return "no events"
+        return "{} events, p50 <= {:.1f} ms, p99 <= {:.1f} ms, max {:.1f} ms".format(
+            self.count, self.get_percentile(50) * 1000, self.get_percentile(99) * 1000, self.maximum * 1000)
+
+class ActuationLatency():
+    """
+    Class for recording the timing of executed actuator events. For every event, the scheduled time, the time the event
+    was dispatched and the time its GPIO pin was written are recorded on the monotonic clock. The scheduled time is
+    converted to the monotonic clock when the event is dispatched, so a later change of the system time doesn't change
+    the measured latencies.
+
+    Two histograms are kept: the lateness of the GPIO write compared with the scheduled time and the time from dispatch
+    to the GPIO write.
+    """
+    __slots__ = ["logger", "lateness", "write_durations"]
+
+    def __init__(self, logger):
+        """
+        :param logger: `logging.Logger` object used for logging the timing of events and the histograms
+        """
+        self.set_logger(logger)
+        self.reset()
+
+    def set_logger(self, logger):
+        """
+        :param logger: `logging.Logger` object used for logging the timing of events and the histograms
+        """
+        assert(isinstance(logger, logging.Logger))
+        self.logger = logger
+
+    def reset(self):
+        """
+        Clears both histograms.
+        """
+        self.lateness = LatencyHistogram()
+        self.write_durations = LatencyHistogram()
+
+    def record_event(self, event, scheduled_time, dispatch_time, write_time):
+        """
+        :param event: executed `ValveEvent` or `PumpEvent` object
+        :param scheduled_time: float representing the scheduled time of the event on the monotonic clock
+        :param dispatch_time: float representing the time of `time.monotonic()` when the event was dispatched
+        :param write_time: float representing the time of `time.monotonic()` when the GPIO pin was written
+        """
+        self.lateness.add(write_time - scheduled_time)
+        self.write_durations.add(write_time - dispatch_time)
+        self.logger.debug("actuation_latency.py: event `{}` at {} dispatched {:.1f} ms late, GPIO written {:.1f} ms late"
+                          .format(event.get_action(), event.get_time(), (dispatch_time - scheduled_time) * 1000,
+                                  (write_time - scheduled_time) * 1000))
+
+    def log_histograms(self):
+        """
+        Logs p50, p99 and maximum of both histograms.
+        """
+        self.logger.info("actuation_latency.py: lateness of GPIO writes: {}".format(self.lateness.get_summary()))
+        self.logger.info("actuation_latency.py: dispatch to GPIO write: {}".format(self.write_durations.get_summary()))
+
+
+if __name__ == "__main__":
+    import random
+    logging.basicConfig(format="%(asctime)s %(message)s", level=logging.INFO)
+    actuation_latency = ActuationLatency(logging.getLogger("logger"))
+    for _ in range(1000):
+        dispatch_time = time.monotonic()
+        scheduled_time = dispatch_time - random.expovariate(1000)
+        actuation_latency.lateness.add(dispatch_time + 0.0001 - scheduled_time)
+        actuation_latency.write_durations.add(0.0001)
+    actuation_latency.log_histograms()
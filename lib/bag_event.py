@@ -4,6 +4,8 @@ Store information (bag number, time bag starts filling, time bag stops filling)
 
 from datetime import datetime, timedelta
 
+import schedule_time
+
 class BagEvent():
     """
     Class for storing information (bag number, time bag starts filling, time bag stops filling) about a single bag event.
@@ -85,7 +87,8 @@ class BagEvent():
         return self.bag_number, self.bag_time_on, self.bag_time_off
     
     def get_bag_event_as_string(self):
-        return str(self.bag_number) + ", " + self.bag_time_on.strftime("%Y-%m-%d %H:%M:%S") + ", " + self.bag_time_off.strftime("%Y-%m-%d %H:%M:%S") 
+        return str(self.bag_number) + ", " + schedule_time.format_time(self.bag_time_on) + ", " \
+            + schedule_time.format_time(self.bag_time_off)
     
     def print_bag_event(self):
         """
@@ -0,0 +1,212 @@
+"""
+Package for recording executed actuator events to an append-only journal on the SD card, so the state of the pump and
+valves is known after the Pi loses power.
+
+Every record has the same size and contains the executed event and the state of the actuators after the event, so the
+state is restored by reading only the last record. Records are written immediately but synced to the SD card in
+batches by `sync`, a power loss loses at most the records written since the last sync.
+"""
+
+import logging
+import os
+import struct
+import zlib
+
+from valve_event import *
+from pump_event import *
+import schedule_time
+
+# time of the event in milliseconds, action, bag number (-1 for pump events), pump state, open bag (-1 if none), CRC-32
+_RECORD = struct.Struct("<qBhBhI")
+# start value of the CRC-32, records of older versions (e.g. with times in seconds) don't pass the check and are ignored
+_RECORD_VERSION = 2
+_ACTIONS = ("turn pump on", "turn pump off", "open valve", "close valve")
+# a journal larger than this is compacted to its last record when it is opened
+MAX_JOURNAL_SIZE = 1 << 20
+
+class Checkpoint():
+    """
+    Class for storing the last executed actuator event and the state of the actuators after it.
+    """
+    __slots__ = ["event_time", "action", "bag_number", "pump_on", "open_bag_number"]
+
+    def __init__(self, event_time, action, bag_number, pump_on, open_bag_number):
+        """
+        :param event_time: `datetime` object representing the scheduled time of the event
+        :param action: string representing the action of the event
+        :param bag_number: integer representing the bag number of a valve event, None for pump events
+        :param pump_on: True if the pump was on after the event, otherwise False
+        :param open_bag_number: integer representing the bag whose valve was open after the event, or None
+        """
+        self.event_time = event_time
+        self.action = action
+        self.bag_number = bag_number
+        self.pump_on = pump_on
+        self.open_bag_number = open_bag_number
+
+    def get_event_time(self):
+        """
+        :return: `datetime` object representing the scheduled time of the last executed event
+        """
+        return self.event_time
+
+    def is_pump_on(self):
+        """
+        :return: True if the pump was on after the last executed event, otherwise False
+        """
+        return self.pump_on
+
+    def get_open_bag_number(self):
+        """
+        :return: integer representing the bag whose valve was open after the last executed event, or None
+        """
+        return self.open_bag_number
+
+    def get_summary(self):
+        """
+        :return: string representing the last executed event and the state of the actuators
+        """
+        return "last event `{}`{} at {}, pump {}, {}".format(
+            self.action, "" if self.bag_number is None else " of bag {}".format(self.bag_number), self.event_time,
+            "on" if self.pump_on else "off",
+            "no valve open" if self.open_bag_number is None else "valve of bag {} open".format(self.open_bag_number))
+
+class CheckpointJournal():
+    """
+    Class for appending executed actuator events to the journal file and reading the last checkpoint.
+    """
+    __slots__ = ["file_path", "logger", "file_descriptor", "pump_on", "open_bag_number", "unsynced_records"]
+
+    def __init__(self, file_path, logger):
+        """
+        Opens the journal file, creates it if it doesn't exist. The actuator state starts with the state of the last
+        checkpoint.
+        :param file_path: string representing the path to the journal file
+        :param logger: `logging.Logger` object used for logging actions of the object
+        """
+        self.set_logger(logger)
+        self.file_path = file_path
+        checkpoint = read_last_checkpoint(file_path)
+        self.pump_on = checkpoint is not None and checkpoint.is_pump_on()
+        self.open_bag_number = None if checkpoint is None else checkpoint.get_open_bag_number()
+        self.unsynced_records = 0
+        if os.path.exists(file_path) and (os.path.getsize(file_path) > MAX_JOURNAL_SIZE
+                                          or os.path.getsize(file_path) % _RECORD.size):
+            self.__compact(checkpoint)
+        self.file_descriptor = os.open(file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def set_logger(self, logger):
+        """
+        :param logger: `logging.Logger` object used for logging actions of the object
+        """
+        assert(isinstance(logger, logging.Logger))
+        self.logger = logger
+
+    def __compact(self, checkpoint):
+        """
+        Replaces the journal file with a file containing only `checkpoint`, e.g. to remove a record that was only
+        partly written when the Pi lost power.
+        :param checkpoint: `Checkpoint` object or None
+        """
+        temporary_file_path = self.file_path + ".tmp"
+        with open(temporary_file_path, "wb") as journal_file:
+            if checkpoint is not None:
+                journal_file.write(_pack_record(checkpoint))
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        os.replace(temporary_file_path, self.file_path)
+        self.logger.info("checkpoint_journal.py: compacted {}".format(self.file_path))
+
+    def record_event(self, event):
+        """
+        Appends `event` and the state of the actuators after it to the journal. The record isn't synced to the SD card
+        until `sync` is called.
+        :param event: executed `ValveEvent` or `PumpEvent` object
+        """
+        action = event.get_action()
+        bag_number = None
+        if action == "turn pump on" or action == "turn pump off":
+            self.pump_on = action == "turn pump on"
+        else:
+            bag_number = event.get_valve_number()
+            if action == "open valve":
+                self.open_bag_number = bag_number
+            elif self.open_bag_number == bag_number:
+                self.open_bag_number = None
+        checkpoint = Checkpoint(event.get_time(), action, bag_number, self.pump_on, self.open_bag_number)
+        os.write(self.file_descriptor, _pack_record(checkpoint))
+        self.unsynced_records += 1
+
+    def record_actuators_off(self, current_time):
+        """
+        Appends records of turning the pump off and closing the open valve, e.g. after all GPIO pins were reset when the
+        program stopped.
+        :param current_time: `datetime` object
+        """
+        current_time = schedule_time.truncate_to_milliseconds(current_time)
+        if self.open_bag_number is not None:
+            self.record_event(ValveEvent(current_time, self.open_bag_number, "close valve"))
+        if self.pump_on:
+            self.record_event(PumpEvent(current_time, "turn pump off"))
+
+    def has_unsynced_records(self):
+        """
+        :return: True if records were written since the last sync, otherwise False
+        """
+        return self.unsynced_records > 0
+
+    def sync(self):
+        """
+        Forces the written records to be written to the SD card. Can be called from another thread than `record_event`.
+        """
+        self.unsynced_records = 0
+        os.fsync(self.file_descriptor)
+
+    def close(self):
+        self.sync()
+        os.close(self.file_descriptor)
+
+def _pack_record(checkpoint):
+    """
+    :param checkpoint: `Checkpoint` object
+    :return: bytes representing the journal record of `checkpoint`
+    """
+    fields = (schedule_time.datetime_to_milliseconds(checkpoint.event_time), _ACTIONS.index(checkpoint.action),
+              -1 if checkpoint.bag_number is None else checkpoint.bag_number, int(checkpoint.pump_on),
+              -1 if checkpoint.open_bag_number is None else checkpoint.open_bag_number)
+    return _RECORD.pack(*fields, zlib.crc32(_RECORD.pack(*fields, 0), _RECORD_VERSION))
+
+def read_last_checkpoint(file_path):
+    """
+    Reads the last complete record of the journal. A record that was only partly written when the Pi lost power is
+    ignored, so only the last few records are read regardless of the size of the journal.
+    :param file_path: string representing the path to the journal file
+    :return: `Checkpoint` object, or None if the journal doesn't exist or doesn't contain a valid record
+    """
+    try:
+        with open(file_path, "rb") as journal_file:
+            file_size = journal_file.seek(0, os.SEEK_END)
+            offset = file_size - file_size % _RECORD.size - _RECORD.size
+            while offset >= 0:
+                journal_file.seek(offset)
+                event_milliseconds, action_index, bag_number, pump_on, open_bag_number, checksum = \
+                    _RECORD.unpack(journal_file.read(_RECORD.size))
+                fields = (event_milliseconds, action_index, bag_number, pump_on, open_bag_number)
+                if checksum == zlib.crc32(_RECORD.pack(*fields, 0), _RECORD_VERSION) and action_index < len(_ACTIONS):
+                    return Checkpoint(schedule_time.milliseconds_to_datetime(event_milliseconds),
+                                      _ACTIONS[action_index], None if bag_number < 0 else bag_number, bool(pump_on),
+                                      None if open_bag_number < 0 else open_bag_number)
+                offset -= _RECORD.size
+    except OSError:
+        pass
+    return None
+
+
+if __name__ == "__main__":
+    from datetime import datetime
+    logging.basicConfig(format="%(asctime)s %(message)s", level=logging.DEBUG)
+    journal = CheckpointJournal("/tmp/checkpoint_journal.bin", logging.getLogger("logger"))
+    journal.record_event(PumpEvent(datetime(2020, 3, 6, 11, 37, 55), "turn pump on"))
+    journal.record_event(ValveEvent(datetime(2020, 3, 6, 11, 38, 0), 3, "open valve"))
+    journal.close()
+    print(read_last_checkpoint("/tmp/checkpoint_journal.bin").get_summary())
@@ -0,0 +1,219 @@
+"""
+Package containing clocks used by the scheduler. `SystemClock` reads the time of the Pi, `VirtualClock` only advances
+when the scheduler waits, so a schedule can be replayed much faster than in real time.
+
+Besides waiting for a number of seconds, both clocks wait until an absolute deadline of their monotonic clock. Waiting
+until a deadline doesn't add the time spent between reading the clock and starting to wait, so events scheduled with
+millisecond precision are executed on time.
+"""
+
+from datetime import datetime, timedelta
+import asyncio
+import time
+
+from deadline_timer import *
+
+class SystemClock():
+    """
+    Class for reading the system time and waiting in real time.
+    """
+    __slots__ = ["deadline_timer"]
+
+    def __init__(self, use_deadline_timer=True):
+        """
+        :param use_deadline_timer: False to wait until a deadline with the timeout of the event loop even when timerfd
+        is available
+        """
+        # `DeadlineTimer` object created by the first `wait_until_async` and armed again by every later one, None
+        # until then, False when it isn't used
+        self.deadline_timer = None if use_deadline_timer else False
+
+    def now(self):
+        """
+        :return: `datetime` object representing the current local time
+        """
+        return datetime.now()
+
+    def monotonic(self):
+        """
+        :return: float representing the time of a clock that never goes backwards in seconds
+        """
+        return time.monotonic()
+
+    def wait(self, event, timeout):
+        """
+        Waits until `event` is set or `timeout` seconds pass.
+        :param event: `threading.Event` object
+        :param timeout: float representing the number of seconds
+        :return: True if `event` was set, otherwise False
+        """
+        return event.wait(timeout)
+
+    async def wait_async(self, event, timeout):
+        """
+        Waits until `event` is set or `timeout` seconds pass without blocking the asyncio event loop.
+        :param event: `asyncio.Event` object
+        :param timeout: float representing the number of seconds
+        :return: True if `event` was set, otherwise False
+        """
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def wait_until(self, event, deadline):
+        """
+        Waits until `event` is set or the monotonic clock reaches `deadline`.
+        :param event: `threading.Event` object
+        :param deadline: float representing the time of `monotonic()` when the waiting ends
+        :return: True if `event` was set, otherwise False
+        """
+        while True:
+            remaining_time = deadline - time.monotonic()
+            if remaining_time <= 0:
+                return event.is_set()
+            if event.wait(remaining_time):
+                return True
+
+    async def wait_until_async(self, event, deadline):
+        """
+        Same as `wait_until`, but waits without blocking the asyncio event loop. The loop is woken up by a timerfd
+        timer at `deadline`, because a timeout of the event loop is rounded up to whole milliseconds. Without timerfd
+        (e.g. not on Linux), the timeout of the event loop is used.
+        :param event: `asyncio.Event` object
+        :param deadline: float representing the time of `monotonic()` when the waiting ends
+        :return: True if `event` was set, otherwise False
+        """
+        loop = asyncio.get_running_loop()
+        expired = asyncio.Event()
+        if self.deadline_timer is None:
+            try:
+                self.deadline_timer = DeadlineTimer()
+            except OSError:
+                self.deadline_timer = False
+        if self.deadline_timer is False:
+            # the default event loop reads `time.monotonic`, so `deadline` is a time of the loop
+            handle = loop.call_at(deadline, expired.set)
+            try:
+                return await self.__wait_for_either(event, expired)
+            finally:
+                handle.cancel()
+        deadline_timer = self.deadline_timer
+        # arming the timer again discards an expiration of the previous wait that wasn't read
+        deadline_timer.set_deadline(deadline)
+        loop.add_reader(deadline_timer, lambda: deadline_timer.has_expired() and expired.set())
+        try:
+            return await self.__wait_for_either(event, expired)
+        finally:
+            loop.remove_reader(deadline_timer)
+
+    @staticmethod
+    async def __wait_for_either(event, expired):
+        """
+        :param event: `asyncio.Event` object
+        :param expired: `asyncio.Event` object set when the deadline passes
+        :return: True if `event` was set, otherwise False
+        """
+        if not event.is_set():
+            event_waiter = asyncio.ensure_future(event.wait())
+            expired_waiter = asyncio.ensure_future(expired.wait())
+            try:
+                await asyncio.wait([event_waiter, expired_waiter], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                event_waiter.cancel()
+                expired_waiter.cancel()
+        return event.is_set()
+
+    def close(self):
+        """
+        Closes the timerfd file descriptor, a later `wait_until_async` creates a new one.
+        """
+        if self.deadline_timer:
+            self.deadline_timer.close()
+            self.deadline_timer = None
+
+    def __del__(self):
+        self.close()
+
+class VirtualClock():
+    """
+    Class for simulating time. Waiting doesn't take any real time, the clock advances by the waited time instead. The
+    monotonic time is the number of seconds since the clock was created.
+    """
+    __slots__ = ["start_time", "elapsed_time"]
+
+    def __init__(self, start_time):
+        """
+        :param start_time: `datetime` object representing the initial time of the clock
+        """
+        assert(isinstance(start_time, datetime))
+        self.start_time = start_time
+        self.elapsed_time = timedelta(0)
+
+    def now(self):
+        """
+        :return: `datetime` object representing the current virtual time
+        """
+        return self.start_time + self.elapsed_time
+
+    def monotonic(self):
+        """
+        :return: float representing the number of virtual seconds since the clock was created
+        """
+        return self.elapsed_time.total_seconds()
+
+    def advance(self, seconds):
+        """
+        :param seconds: non-negative float representing the number of seconds the clock moves forward
+        """
+        assert(seconds >= 0)
+        self.elapsed_time += timedelta(seconds=seconds)
+
+    def wait(self, event, timeout):
+        """
+        Advances the clock by `timeout` seconds unless `event` is already set.
+        :param event: `threading.Event` object
+        :param timeout: float representing the number of seconds
+        :return: True if `event` was set, otherwise False
+        """
+        if event.is_set():
+            return True
+        self.advance(timeout)
+        return False
+
+    async def wait_async(self, event, timeout):
+        """
+        Same as `wait`, but yields to the asyncio event loop first, so other tasks can set `event`.
+        :param event: `asyncio.Event` object
+        :param timeout: float representing the number of seconds
+        :return: True if `event` was set, otherwise False
+        """
+        await asyncio.sleep(0)
+        return self.wait(event, timeout)
+
+    def wait_until(self, event, deadline):
+        """
+        Advances the clock to `deadline` unless `event` is already set or the clock already passed `deadline`.
+        :param event: `threading.Event` object
+        :param deadline: float representing the time of `monotonic()` when the waiting ends
+        :return: True if `event` was set, otherwise False
+        """
+        return self.wait(event, max(0.0, deadline - self.monotonic()))
+
+    async def wait_until_async(self, event, deadline):
+        """
+        Same as `wait_until`, but yields to the asyncio event loop first, so other tasks can set `event`.
+        :param event: `asyncio.Event` object
+        :param deadline: float representing the time of `monotonic()` when the waiting ends
+        :return: True if `event` was set, otherwise False
+        """
+        await asyncio.sleep(0)
+        return self.wait_until(event, deadline)
+
+
+if __name__ == "__main__":
+    import threading
+    clock = VirtualClock(datetime(2020, 3, 6, 12, 0, 0))
+    clock.wait(threading.Event(), 7 * 24 * 3600)
+    print("Virtual time after waiting a week: ", clock.now(), clock.monotonic())
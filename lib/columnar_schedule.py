@@ -0,0 +1,263 @@
+"""
+Store a sorted bag schedule as columns of integers instead of a list of `BagEvent` objects.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from bag_event import *
+from valve_event import *
+from pump_intervals import *
+from event_times import *
+import schedule_time
+
+class ColumnarSchedule():
+    """
+    Class for storing a bag schedule sorted by the time the bags start filling as three columns: bag numbers, times the
+    bags start filling and times the bags stop filling. Times are stored as integers representing the number of
+    milliseconds since `schedule_time.SCHEDULE_EPOCH`.
+
+    When NumPy is installed, the columns are NumPy arrays (int16 and int64) and overlap checking and merging of pump
+    intervals are vectorized. Otherwise the columns are `array.array` objects and the same operations are done in
+    pure Python. `BagEvent`, `ValveEvent` and `PumpEvent` objects are only created when they are requested.
+
+    Every bag event produces two valve events, "open valve" and "close valve", so the valve events are numbered 0, 1, ...
+    in time order. Bag, valve and pump events are searched by bisection and parts of the schedule are returned as views
+    that share the columns with the original object.
+    """
+    __slots__ = ["bag_numbers", "start_times", "stop_times"]
+
+    def __init__(self, bag_numbers, start_times, stop_times):
+        """
+        :param bag_numbers: column of integers representing the bag numbers
+        :param start_times: column of integers representing the times the bags start filling, sorted in increasing order
+        :param stop_times: column of integers representing the times the bags stop filling
+        """
+        assert(len(bag_numbers) == len(start_times) == len(stop_times))
+        self.bag_numbers = bag_numbers
+        self.start_times = start_times
+        self.stop_times = stop_times
+        if numpy is not None:
+            for column in (self.bag_numbers, self.start_times, self.stop_times):
+                column.flags.writeable = False
+        else:
+            # slices of `memoryview` objects are views, while slices of `array.array` objects are copies
+            self.bag_numbers = memoryview(bag_numbers).toreadonly()
+            self.start_times = memoryview(start_times).toreadonly()
+            self.stop_times = memoryview(stop_times).toreadonly()
+
+    @staticmethod
+    def is_vectorized():
+        """
+        :return: True if NumPy is installed and the columns are NumPy arrays, otherwise False
+        """
+        return numpy is not None
+
+    @staticmethod
+    def __create_columns(records):
+        """
+        :param records: iterable of tuples (bag number, start time, stop time) with times in milliseconds
+        :return: tuple of three `array.array` objects containing bag numbers, start times and stop times
+        """
+        bag_numbers, start_times, stop_times = array("h"), array("q"), array("q")
+        for bag_number, start_time, stop_time in records:
+            bag_numbers.append(bag_number)
+            start_times.append(start_time)
+            stop_times.append(stop_time)
+        return bag_numbers, start_times, stop_times
+
+    @classmethod
+    def from_sorted_records(cls, records):
+        """
+        :param records: iterable of tuples (bag number, start time, stop time) with times in milliseconds sorted by
+        start time
+        :return: `ColumnarSchedule` object
+        """
+        bag_numbers, start_times, stop_times = cls.__create_columns(records)
+        if numpy is not None:
+            return cls(numpy.frombuffer(bag_numbers, dtype=numpy.int16),
+                       numpy.frombuffer(start_times, dtype=numpy.int64),
+                       numpy.frombuffer(stop_times, dtype=numpy.int64))
+        return cls(bag_numbers, start_times, stop_times)
+
+    @staticmethod
+    def column_from_buffer(buffer, typecode, offset, count):
+        """
+        Creates a column that is a view of `buffer`, the data isn't copied.
+        :param buffer: object supporting the buffer protocol, e.g. `mmap.mmap` object
+        :param typecode: string representing the type of the column, "h" for int16 or "q" for int64
+        :param offset: integer representing the position of the column in `buffer` in bytes
+        :param count: integer representing the number of items in the column
+        :return: NumPy array if NumPy is installed, otherwise `memoryview` object
+        """
+        assert(typecode == "h" or typecode == "q")
+        if numpy is not None:
+            return numpy.frombuffer(buffer, dtype=numpy.int16 if typecode == "h" else numpy.int64,
+                                    count=count, offset=offset)
+        item_size = 2 if typecode == "h" else 8
+        return memoryview(buffer)[offset:offset + count * item_size].cast(typecode)
+
+    def __len__(self):
+        return len(self.start_times)
+
+    def get_bag_event(self, index):
+        """
+        :param index: integer representing the position of the event in the schedule
+        :return: `BagEvent` object
+        """
+        return BagEvent(int(self.bag_numbers[index]),
+                        schedule_time.milliseconds_to_datetime(int(self.start_times[index])),
+                        schedule_time.milliseconds_to_datetime(int(self.stop_times[index])))
+
+    def find_overlaps(self):
+        """
+        :return: list of integers `i` such that the `i`-th bag stops filling after the `i + 1`-th bag starts filling
+        """
+        if numpy is not None:
+            return numpy.flatnonzero(self.stop_times[:-1] > self.start_times[1:]).tolist()
+        return [i for i in range(len(self) - 1) if self.stop_times[i] > self.start_times[i + 1]]
+
+    def view(self, first, last=None):
+        """
+        :param first: integer representing the position of the first bag event in the view
+        :param last: integer representing the position after the last bag event in the view, or None for all events
+        :return: `ColumnarSchedule` object sharing the columns with this object
+        """
+        if last is None:
+            last = len(self)
+        return ColumnarSchedule(self.bag_numbers[first:last], self.start_times[first:last],
+                                self.stop_times[first:last])
+
+    def get_index_after(self, time):
+        """
+        :param time: integer representing a time in milliseconds
+        :return: integer representing the position of the first bag that starts filling after `time`
+        """
+        if numpy is not None:
+            return int(numpy.searchsorted(self.start_times, time, side="right"))
+        return bisect_right(self.start_times, time)
+
+    def get_index_range(self, start_time, stop_time):
+        """
+        :param start_time: integer representing the start of the time window in milliseconds (included)
+        :param stop_time: integer representing the end of the time window in milliseconds (excluded)
+        :return: tuple of integers representing the position of the first bag that starts filling in the window and the
+        position after the last bag that starts filling in the window
+        """
+        if numpy is not None:
+            first, last = numpy.searchsorted(self.start_times, [start_time, stop_time], side="left")
+            return int(first), int(last)
+        return bisect_left(self.start_times, start_time), bisect_left(self.start_times, stop_time)
+
+    def get_window(self, start_time, stop_time):
+        """
+        :param start_time: integer representing the start of the time window in milliseconds (included)
+        :param stop_time: integer representing the end of the time window in milliseconds (excluded)
+        :return: `ColumnarSchedule` object containing bags that start filling in the window, sharing the columns with
+        this object
+        """
+        return self.view(*self.get_index_range(start_time, stop_time))
+
+    def iter_bag_events(self, start=0, stop=None):
+        """
+        :param start: integer representing the position of the first event
+        :param stop: integer representing the position after the last event, or None for all events
+        :return: generator of `BagEvent` objects starting with the `start`-th event
+        """
+        if stop is None:
+            stop = len(self)
+        for index in range(start, stop):
+            yield self.get_bag_event(index)
+
+    def get_valve_event_time(self, event_index):
+        """
+        :param event_index: integer representing the position of the valve event
+        :return: integer representing the time of the valve event
+        """
+        if event_index % 2:
+            return int(self.stop_times[event_index // 2])
+        return int(self.start_times[event_index // 2])
+
+    def get_valve_event_times(self):
+        """
+        Bag events don't overlap, so the valve events are sorted by time.
+        :return: `EventTimes` object representing the sorted times of all valve events
+        """
+        return EventTimes(2 * len(self), self.get_valve_event_time)
+
+    def get_valve_event_index_after(self, time):
+        """
+        :param time: integer representing a time in milliseconds
+        :return: integer representing the position of the first valve event after `time`
+        """
+        return bisect_right(self.get_valve_event_times(), time)
+
+    def get_valve_event_index_range(self, start_time, stop_time):
+        """
+        :param start_time: integer representing the start of the time window in milliseconds (included)
+        :param stop_time: integer representing the end of the time window in milliseconds (excluded)
+        :return: tuple of integers representing the position of the first valve event in the window and the position
+        after the last valve event in the window
+        """
+        valve_event_times = self.get_valve_event_times()
+        return bisect_left(valve_event_times, start_time), bisect_left(valve_event_times, stop_time)
+
+    def iter_valve_events(self, first_event=0, last_event=None):
+        """
+        :param first_event: integer representing the position of the first valve event
+        :param last_event: integer representing the position after the last valve event, or None for all events
+        :return: generator of `ValveEvent` objects
+        """
+        if last_event is None:
+            last_event = 2 * len(self)
+        for event_index in range(first_event, last_event):
+            yield ValveEvent(schedule_time.milliseconds_to_datetime(self.get_valve_event_time(event_index)),
+                             int(self.bag_numbers[event_index // 2]),
+                             "close valve" if event_index % 2 else "open valve")
+
+    def get_pump_intervals(self, start_before, stop_after, off_time_tolerance, start=0):
+        """
+        Creates intervals when the pump is on. The pump starts `start_before` milliseconds before a bag starts filling
+        and stops `stop_after` milliseconds after the bag stops filling. Intervals that overlap or are separated by at
+        most `off_time_tolerance` milliseconds are merged.
+        :param start_before: integer representing the number of milliseconds the pump starts before the valve opens
+        :param stop_after: integer representing the number of milliseconds the pump keeps pumping after the valve closes
+        :param off_time_tolerance: integer representing the number of milliseconds. If pump is supposed to turn off for
+        less than specified number of milliseconds, it will continue pumping.
+        :param start: integer representing the position of the first bag event
+        :return: `PumpIntervals` object
+        """
+        if numpy is not None:
+            times_on = self.start_times[start:] - start_before
+            times_off = self.stop_times[start:] + stop_after
+            if not len(times_on):
+                return PumpIntervals(times_on, times_off)
+            # the pump turns off before the next interval only when the next interval starts more than
+            # `off_time_tolerance` after every earlier interval ended
+            latest_times_off = numpy.maximum.accumulate(times_off)
+            is_first = numpy.empty(len(times_on), dtype=bool)
+            is_first[0] = True
+            is_first[1:] = times_on[1:] - latest_times_off[:-1] > off_time_tolerance
+            first_indices = numpy.flatnonzero(is_first)
+            return PumpIntervals(times_on[first_indices], numpy.maximum.reduceat(times_off, first_indices))
+
+        merged_times_on, merged_times_off = array("q"), array("q")
+        for time_on, time_off in merge_pump_intervals(zip(self.start_times[start:], self.stop_times[start:]),
+                                                      start_before, stop_after, off_time_tolerance):
+            merged_times_on.append(time_on)
+            merged_times_off.append(time_off)
+        return PumpIntervals(merged_times_on, merged_times_off)
+
+
+if __name__ == "__main__":
+    records = [(1, 1583494680000, 1583494710000), (3, 1583494695000, 1583494720000), (2, 1583494755000, 1583494775000)]
+    schedule = ColumnarSchedule.from_sorted_records(records)
+    print("Vectorized: ", ColumnarSchedule.is_vectorized())
+    print("Overlaps: ", schedule.find_overlaps())
+    [event.print_bag_event() for event in schedule.iter_bag_events()]
+    [event.print_pump_event() for event in schedule.get_pump_intervals(5000, 5000, 10000).iter_pump_events()]
@@ -0,0 +1,207 @@
+"""
+Package containing methods for writing a validated schedule to a compact binary file and opening it with `mmap`.
+
+Layout of the compiled schedule file (little-endian, every int64 column starts at a multiple of 8 bytes):
+    + header (`_HEADER`): magic, format version, size and modification time of the schedule file, SHA-256 digest of the
+      schedule file, pump parameters in milliseconds, number of bag events and number of pump intervals
+    + times the bags start filling in milliseconds (int64 column)
+    + times the bags stop filling in milliseconds (int64 column)
+    + times the pump turns on in milliseconds (int64 column)
+    + times the pump turns off in milliseconds (int64 column)
+    + bag numbers (int16 column)
+
+Valve events are not stored separately, because every bag event maps to exactly one "open valve" and one "close valve"
+event, so the bag columns double as the valve event table.
+"""
+
+from array import array
+import logging
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+
+from columnar_schedule import *
+from pump_intervals import *
+from parsed_schedule import *
+
+_MAGIC = b"ASCH"
+# version 2 stores times in milliseconds instead of seconds, files of version 1 are compiled again
+_VERSION = 2
+_HEADER = struct.Struct("<4sHxxqq32sqqqqq")
+_INT64_SIZE = 8
+_INT16_SIZE = 2
+# number of integers buffered in memory for each column while the columns of a schedule are streamed to a file
+_VALUES_PER_WRITE = 1 << 16
+
+class _ColumnFile():
+    """
+    Class for appending integers to a column stored in a temporary file. The integers are buffered in an `array.array`
+    object and written in blocks of `_VALUES_PER_WRITE` integers.
+    """
+    __slots__ = ["typecode", "file", "buffer", "count"]
+
+    def __init__(self, typecode):
+        """
+        :param typecode: string representing the type of the column, "h" for int16 or "q" for int64
+        """
+        self.typecode = typecode
+        self.file = tempfile.TemporaryFile()
+        self.buffer = array(typecode)
+        self.count = 0
+
+    def append(self, value):
+        """
+        :param value: integer appended to the column
+        """
+        self.buffer.append(value)
+        if len(self.buffer) >= _VALUES_PER_WRITE:
+            self.__flush()
+
+    def __flush(self):
+        self.buffer.tofile(self.file)
+        self.count += len(self.buffer)
+        self.buffer = array(self.typecode)
+
+    def __len__(self):
+        return self.count + len(self.buffer)
+
+    def copy_to(self, output_file):
+        """
+        Copies the column to `output_file` in blocks and deletes the temporary file.
+        :param output_file: file object opened for writing in binary mode
+        """
+        self.__flush()
+        with self.file:
+            self.file.seek(0)
+            shutil.copyfileobj(self.file, output_file)
+
+def write_compiled_schedule(file_path, parsed_schedule, pump_parameters, pump_intervals):
+    """
+    Writes the bag schedule of `parsed_schedule` and its pump intervals to a compiled schedule file. The file is written
+    to a temporary file first and then renamed, so a compiled schedule file is never left half written.
+    :param file_path: string representing the path to the compiled schedule file
+    :param parsed_schedule: `ParsedSchedule` object
+    :param pump_parameters: tuple of integers representing the number of milliseconds the pump starts before the valve
+    opens, the number of milliseconds the pump keeps pumping after the valve closes and the pump time off tolerance
+    :param pump_intervals: `PumpIntervals` object representing the intervals when the pump is on for the complete bag
+    schedule and `pump_parameters`
+    """
+    assert(sys.byteorder == "little")
+    bag_schedule = parsed_schedule.get_bag_schedule()
+    pump_start_before, pump_stop_after, pump_off_time_tolerance = pump_parameters
+    assert(pump_intervals.is_complete())
+    header = _HEADER.pack(_MAGIC, _VERSION,
+                          parsed_schedule.file_size, parsed_schedule.file_mtime,
+                          bytes.fromhex(parsed_schedule.get_content_hash()),
+                          pump_start_before, pump_stop_after, pump_off_time_tolerance,
+                          len(bag_schedule), len(pump_intervals))
+    temporary_file_path = file_path + ".tmp"
+    with open(temporary_file_path, "wb") as compiled_file:
+        compiled_file.write(header)
+        for column in (bag_schedule.start_times, bag_schedule.stop_times, pump_intervals.times_on,
+                       pump_intervals.times_off, bag_schedule.bag_numbers):
+            compiled_file.write(column)
+        compiled_file.flush()
+        os.fsync(compiled_file.fileno())
+    os.replace(temporary_file_path, file_path)
+    logging.info("compiled_schedule.py: wrote compiled schedule {} ({} bag events, {} pump intervals)"
+                 .format(file_path, len(bag_schedule), len(pump_intervals)))
+
+def write_sorted_bag_records(compiled_file, file_size, file_mtime, content_hash, bag_records, pump_parameters):
+    """
+    Writes a compiled schedule file from bag records without holding the schedule in memory. The columns are streamed
+    to temporary files while the pump intervals are merged, and then copied after the header, so memory use doesn't
+    grow with the number of bag events.
+    :param compiled_file: file object opened for writing in binary mode, positioned at the start of an empty file
+    :param file_size: integer representing the size of the schedule file in bytes
+    :param file_mtime: integer representing the modification time of the schedule file in nanoseconds
+    :param content_hash: string representing the SHA-256 digest of the schedule file in hexadecimal format
+    :param bag_records: iterable of tuples (bag number, start time, stop time) with times in milliseconds sorted by
+    start time
+    :param pump_parameters: tuple of integers representing the number of milliseconds the pump starts before the valve
+    opens, the number of milliseconds the pump keeps pumping after the valve closes and the pump time off tolerance
+    """
+    assert(sys.byteorder == "little")
+    bag_numbers, start_times, stop_times = _ColumnFile("h"), _ColumnFile("q"), _ColumnFile("q")
+    pump_times_on, pump_times_off = _ColumnFile("q"), _ColumnFile("q")
+
+    def iter_bag_times():
+        for bag_number, start_time, stop_time in bag_records:
+            bag_numbers.append(bag_number)
+            start_times.append(start_time)
+            stop_times.append(stop_time)
+            yield start_time, stop_time
+
+    for time_on, time_off in merge_pump_intervals(iter_bag_times(), *pump_parameters):
+        pump_times_on.append(time_on)
+        pump_times_off.append(time_off)
+    compiled_file.write(_HEADER.pack(_MAGIC, _VERSION, file_size, file_mtime, bytes.fromhex(content_hash),
+                                     *pump_parameters, len(start_times), len(pump_times_on)))
+    for column in (start_times, stop_times, pump_times_on, pump_times_off, bag_numbers):
+        column.copy_to(compiled_file)
+    compiled_file.flush()
+    os.fsync(compiled_file.fileno())
+
+def read_compiled_schedule(file_path, schedule_file_path):
+    """
+    Opens a compiled schedule file with `mmap`. The columns of the returned schedule are views of the mapped file, so
+    opening the file takes the same time regardless of the number of events.
+    :param file_path: string representing the path to the compiled schedule file
+    :param schedule_file_path: string representing the path to the schedule file that the compiled file was created from
+    :return: tuple (`ParsedSchedule` object, tuple of integers representing the pump parameters, `PumpIntervals`
+    object), or None if the file doesn't exist or isn't a valid compiled schedule file
+    """
+    try:
+        with open(file_path, "rb") as compiled_file:
+            return map_compiled_schedule(compiled_file, schedule_file_path)
+    except (OSError, ValueError):
+        return None
+
+def map_compiled_schedule(compiled_file, schedule_file_path):
+    """
+    Maps an open compiled schedule file to memory. The mapping stays valid after the file is closed, renamed or deleted.
+    :param compiled_file: file object of the compiled schedule file opened for reading in binary mode
+    :param schedule_file_path: string representing the path to the schedule file that the compiled file was created from
+    :return: tuple (`ParsedSchedule` object, tuple of integers representing the pump parameters, `PumpIntervals`
+    object), or None if the file isn't a valid compiled schedule file
+    """
+    mapped_file = mmap.mmap(compiled_file.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapped_file) < _HEADER.size:
+        return None
+    magic, version, file_size, file_mtime, content_hash, pump_start_before, pump_stop_after, pump_off_time_tolerance, \
+        bag_count, pump_interval_count = _HEADER.unpack_from(mapped_file, 0)
+    expected_size = _HEADER.size + (2 * bag_count + 2 * pump_interval_count) * _INT64_SIZE + bag_count * _INT16_SIZE
+    if magic != _MAGIC or version != _VERSION or len(mapped_file) != expected_size:
+        return None
+
+    offset = _HEADER.size
+    start_times = ColumnarSchedule.column_from_buffer(mapped_file, "q", offset, bag_count)
+    offset += bag_count * _INT64_SIZE
+    stop_times = ColumnarSchedule.column_from_buffer(mapped_file, "q", offset, bag_count)
+    offset += bag_count * _INT64_SIZE
+    pump_times_on = ColumnarSchedule.column_from_buffer(mapped_file, "q", offset, pump_interval_count)
+    offset += pump_interval_count * _INT64_SIZE
+    pump_times_off = ColumnarSchedule.column_from_buffer(mapped_file, "q", offset, pump_interval_count)
+    offset += pump_interval_count * _INT64_SIZE
+    bag_numbers = ColumnarSchedule.column_from_buffer(mapped_file, "h", offset, bag_count)
+
+    parsed_schedule = ParsedSchedule(schedule_file_path, file_size, file_mtime, content_hash.hex(),
+                                     ColumnarSchedule(bag_numbers, start_times, stop_times))
+    return (parsed_schedule, (pump_start_before, pump_stop_after, pump_off_time_tolerance),
+            PumpIntervals(pump_times_on, pump_times_off))
+
+
+if __name__ == "__main__":
+    file_path = "../tests/valid_schedule.txt"
+    compiled_file_path = "/tmp/valid_schedule.bin"
+    records = [(3, 1583494620000, 1583494650000), (1, 1583494695000, 1583494720000), (2, 1583494755000, 1583494775000)]
+    bag_schedule = ColumnarSchedule.from_sorted_records(records)
+    parsed_schedule = ParsedSchedule(file_path, 0, 0, ParsedSchedule.hash_file(file_path), bag_schedule)
+    write_compiled_schedule(compiled_file_path, parsed_schedule, (5000, 5000, 10000),
+                            bag_schedule.get_pump_intervals(5000, 5000, 10000))
+    compiled_schedule, pump_parameters, pump_intervals = read_compiled_schedule(compiled_file_path, file_path)
+    [event.print_bag_event() for event in compiled_schedule.get_bag_schedule().iter_bag_events()]
+    [event.print_pump_event() for event in pump_intervals.iter_pump_events()]
@@ -6,6 +6,7 @@ from datetime import timedelta
 import logging
 
 from invalid_file_format_errors import *
+import schedule_time
 
 class Configuration():
     """
@@ -75,7 +76,7 @@ class Configuration():
             self.set_pump_starts_before(lines[3])
         except:
             error_messages.append("- Line 4: Number of seconds that pump starts before valve opens is invalid."
-                                  "\n + Expected a non-negative integer.")
+                                  "\n + Expected a non-negative number with at most three decimal places.")
         # number of seconds pump continues pumping after valve closes section
         try:
             if lines[4] != "Number of seconds pump continues pumping after valve closes":
@@ -84,7 +85,7 @@ class Configuration():
             self.set_pump_stops_after(lines[5])
         except:
             error_messages.append("- Line 6: Number of seconds pump continues pumping after valve closes is invalid."
-                                  "\n + It must be a non-negative integer.")
+                                  "\n + It must be a non-negative number with at most three decimal places.")
         # pump time off tolerance in seconds
         try:
             if lines[6] != "Pump time off tolerance in seconds":
@@ -93,7 +94,7 @@ class Configuration():
             self.set_pump_time_off_tolerance(lines[7])
         except:
             error_messages.append("- Line 8: Pump time off tolerance in seconds is invalid."
-                                  "\n + It must be a non-negative integer.")
+                                  "\n + It must be a non-negative number with at most three decimal places.")
         # check if file contains more lines
         if len(lines) > 8:
             for i in range (8, len(lines)):
@@ -130,28 +131,25 @@ class Configuration():
     def set_pump_starts_before(self, number_of_seconds):
         """
         :param number_of_seconds: string representing the number of seconds that the pump starts pumping before the
-        valve opens
+        valve opens, with at most three decimal places
         """
-        assert(int(number_of_seconds) >= 0)
-        self.pump_starts_before = timedelta(seconds=int(number_of_seconds))
+        self.pump_starts_before = schedule_time.string_to_timedelta(number_of_seconds)
         self.logger.info("configuration.py: set pump starts before valve opens to {}".format(self.pump_starts_before))
 
     def set_pump_stops_after(self, number_of_seconds):
         """
         :param number_of_seconds: string representing the number of seconds that the pump keeps pumping after the
-        valve closes
+        valve closes, with at most three decimal places
         """
-        assert(int(number_of_seconds) >= 0)
-        self.pump_stops_after = timedelta(seconds=int(number_of_seconds))
+        self.pump_stops_after = schedule_time.string_to_timedelta(number_of_seconds)
         self.logger.info("configuration.py: set pump stops after valve closes to {}".format(self.pump_stops_after))
 
     def set_pump_time_off_tolerance(self, number_of_seconds):
         """
-        :param number_of_seconds: string representing the number of seconds. If pump is supposed to turn off for less
-        than specified number of seconds, it will continue pumping
+        :param number_of_seconds: string representing the number of seconds with at most three decimal places. If
+        pump is supposed to turn off for less than specified number of seconds, it will continue pumping
         """
-        assert(int(number_of_seconds) >= 0)
-        self.pump_time_off_tolerance = timedelta(seconds=int(number_of_seconds))
+        self.pump_time_off_tolerance = schedule_time.string_to_timedelta(number_of_seconds)
         self.logger.info("configuration.py: set pump time off tolerance to {}".format(self.pump_time_off_tolerance))
 
     def get_diode_light_duration(self):
@@ -0,0 +1,121 @@
+"""
+Package for waking up at an absolute time of the monotonic clock with the Linux timerfd interface. The kernel makes the
+file descriptor readable when the deadline passes, so an asyncio event loop wakes up with the precision of the kernel
+timer instead of rounding its timeout up to whole milliseconds.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import time
+
+# constants from <time.h> and <sys/timerfd.h>, `time.monotonic` reads `CLOCK_MONOTONIC` on Linux
+CLOCK_MONOTONIC = 1
+TFD_TIMER_ABSTIME = 1
+TFD_NONBLOCK = os.O_NONBLOCK
+TFD_CLOEXEC = os.O_CLOEXEC
+
+_NANOSECONDS_PER_SECOND = 1000000000
+_EXPIRATIONS_SIZE = 8
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+class _Itimerspec(ctypes.Structure):
+    _fields_ = [("it_interval", _Timespec), ("it_value", _Timespec)]
+
+# `ctypes.CDLL` object of the C library, loaded by the first `DeadlineTimer` because finding the library starts a
+# process, or the `OSError` raised when timerfd isn't available
+_libc = None
+
+class DeadlineTimer():
+    """
+    Class for a one-shot timer expiring at a time of `time.monotonic()`. The file descriptor is non-blocking and can be
+    registered with an asyncio event loop (`loop.add_reader`), it becomes readable when the deadline passes. The timer
+    is armed again for every deadline by `set_deadline`, so one object serves all waits.
+    """
+    __slots__ = ["libc", "file_descriptor"]
+
+    def __init__(self):
+        """
+        :raise OSError: when timerfd isn't available (e.g. not on Linux)
+        """
+        self.file_descriptor = None
+        self.libc = _load_libc()
+        file_descriptor = self.libc.timerfd_create(CLOCK_MONOTONIC, TFD_NONBLOCK | TFD_CLOEXEC)
+        if file_descriptor < 0:
+            raise _get_os_error()
+        self.file_descriptor = file_descriptor
+
+    def fileno(self):
+        """
+        :return: integer representing the timerfd file descriptor
+        """
+        return self.file_descriptor
+
+    def set_deadline(self, deadline):
+        """
+        Arms the timer and discards an expiration of the previous deadline that wasn't read, a deadline that already
+        passed makes the file descriptor readable immediately.
+        :param deadline: float representing the time of `time.monotonic()` when the timer expires
+        """
+        # a zero expiration time disarms the timer, so the earliest deadline is one nanosecond
+        nanoseconds = max(1, round(deadline * _NANOSECONDS_PER_SECOND))
+        value = _Itimerspec(_Timespec(0, 0), _Timespec(*divmod(nanoseconds, _NANOSECONDS_PER_SECOND)))
+        if self.libc.timerfd_settime(self.file_descriptor, TFD_TIMER_ABSTIME, ctypes.byref(value), None) < 0:
+            raise _get_os_error()
+
+    def has_expired(self):
+        """
+        Reads the expiration count without blocking, so the file descriptor isn't readable until the timer expires
+        again.
+        :return: True if the timer expired since the deadline was set, otherwise False
+        """
+        try:
+            return len(os.read(self.file_descriptor, _EXPIRATIONS_SIZE)) == _EXPIRATIONS_SIZE
+        except BlockingIOError:
+            return False
+
+    def close(self):
+        if self.file_descriptor is not None:
+            os.close(self.file_descriptor)
+            self.file_descriptor = None
+
+def _load_libc():
+    """
+    Loads the C library once, later calls return the same object or raise the same error.
+    :return: `ctypes.CDLL` object of the C library with the timerfd functions
+    :raise OSError: when the C library doesn't provide timerfd
+    """
+    global _libc
+    if _libc is None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            if not hasattr(libc, "timerfd_create"):
+                raise OSError(errno.ENOSYS, "timerfd is not available")
+            libc.timerfd_settime.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.POINTER(_Itimerspec),
+                                             ctypes.POINTER(_Itimerspec)]
+            _libc = libc
+        except OSError as error:
+            _libc = error
+    if isinstance(_libc, OSError):
+        raise _libc
+    return _libc
+
+def _get_os_error():
+    """
+    :return: `OSError` object created from the `errno` of the last C library call
+    """
+    error_number = ctypes.get_errno()
+    return OSError(error_number, os.strerror(error_number))
+
+
+if __name__ == "__main__":
+    import select
+    deadline_timer = DeadlineTimer()
+    deadline = time.monotonic() + 0.25
+    deadline_timer.set_deadline(deadline)
+    select.select([deadline_timer], [], [])
+    print("Expired: ", deadline_timer.has_expired(), "late by", time.monotonic() - deadline, "s")
+    deadline_timer.close()
@@ -2,7 +2,7 @@
 Package for diode.
 """
 
-import RPi.GPIO as GPIO
+from gpio_backend import GPIO
 import time
 import logging
 from datetime import timedelta
@@ -70,7 +70,8 @@ class Diode():
 
     def turn_diode_on_for(self, number_of_seconds):
         """
-        Turns diode on for specified number of seconds.
+        Turns diode on for specified number of seconds. Blocks the calling thread, `DiodeDriver` in `diode_driver.py`
+        shows the light without blocking.
         :param number_of_seconds: float representing the number of seconds that diode stays turned on
         """
         assert(isinstance(number_of_seconds, float))
@@ -83,6 +84,16 @@ class Diode():
         self.diode_on = False
         self.logger.info("diode: diode turned off")
 
+    def set_diode_light(self, diode_on):
+        """
+        Turns the diode on or off without logging, e.g. for the steps of a blinking pattern. The GPIO pin is only
+        written when the state changes.
+        :param diode_on: True to turn the diode on, False to turn it off
+        """
+        if self.diode_on != diode_on:
+            GPIO.output(self.diode_pin_number, int(diode_on))
+            self.diode_on = diode_on
+
     def diode_is_on(self):
         """
         :return: True when the diode is on, False when the diode is off
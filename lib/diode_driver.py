@@ -0,0 +1,210 @@
+"""
+Package for showing the state of the sampler with light patterns of the status diode. One `DiodeDriver` object plays
+all patterns from one asyncio task, so showing a state never starts a thread or blocks the caller.
+"""
+
+import asyncio
+import itertools
+import logging
+
+# a pattern with a higher priority interrupts a playing pattern with a lower priority
+HEARTBEAT_PRIORITY = 0
+STATUS_PRIORITY = 10
+ERROR_PRIORITY = 20
+
+class DiodePattern():
+    """
+    Class for storing a light pattern, a sequence of steps that turn the diode on or off for a number of seconds.
+    """
+    __slots__ = ["name", "steps", "repetitions", "priority"]
+
+    def __init__(self, name, steps, repetitions, priority):
+        """
+        :param name: string representing the pattern in log messages
+        :param steps: list of tuples (True to turn the diode on or False to turn it off, number of seconds)
+        :param repetitions: integer representing how many times the steps are played, or None to play them until the
+        pattern is stopped
+        :param priority: integer representing the priority, e.g. `STATUS_PRIORITY`
+        """
+        assert(len(steps) > 0 and all(seconds > 0 for _, seconds in steps))
+        assert(repetitions is None or repetitions > 0)
+        self.name = name
+        self.steps = tuple(steps)
+        self.repetitions = repetitions
+        self.priority = priority
+
+    def get_name(self):
+        return self.name
+
+    def get_priority(self):
+        return self.priority
+
+def solid_pattern(number_of_seconds, priority=STATUS_PRIORITY):
+    """
+    :param number_of_seconds: float representing the number of seconds that the diode stays on
+    :param priority: integer representing the priority of the pattern
+    :return: `DiodePattern` object that turns the diode on once
+    """
+    return DiodePattern("solid for {} s".format(number_of_seconds), [(True, number_of_seconds)], 1, priority)
+
+def error_blink_pattern(blink_interval=0.5):
+    """
+    :param blink_interval: number of seconds the diode stays on and off
+    :return: `DiodePattern` object that blinks the diode until it is stopped
+    """
+    return DiodePattern("error blink", [(True, blink_interval), (False, blink_interval)], None, ERROR_PRIORITY)
+
+def heartbeat_pattern(period=5):
+    """
+    :param period: number of seconds between two heartbeats
+    :return: `DiodePattern` object that flashes the diode twice every `period` seconds until it is stopped
+    """
+    assert(period > 0.5)
+    return DiodePattern("heartbeat", [(True, 0.1), (False, 0.15), (True, 0.1), (False, period - 0.35)], None,
+                        HEARTBEAT_PRIORITY)
+
+def pulse_code_pattern(number_of_pulses, repetitions=3, pulse_duration=0.3, pause_duration=2):
+    """
+    :param number_of_pulses: integer representing the code shown by the number of pulses
+    :param repetitions: integer representing how many times the code is shown, or None to show it until it is stopped
+    :param pulse_duration: number of seconds the diode stays on and off in a pulse
+    :param pause_duration: number of seconds the diode stays off between two codes
+    :return: `DiodePattern` object that shows the code
+    """
+    assert(number_of_pulses > 0)
+    steps = [(True, pulse_duration), (False, pulse_duration)] * number_of_pulses
+    steps[-1] = (False, pause_duration)
+    return DiodePattern("code {}".format(number_of_pulses), steps, repetitions, STATUS_PRIORITY)
+
+class DiodeDriver():
+    """
+    Class for playing `DiodePattern` objects with one `Diode` object. Patterns are queued, the pattern with the highest
+    priority is played and patterns with the same priority are played in the order they were added. A pattern that is
+    interrupted by a pattern with a higher priority is played again from the start afterwards, unless it was stopped.
+    When no pattern is queued, the diode is off.
+
+    All methods must be called in the thread of the event loop that runs `run`.
+    """
+    __slots__ = ["diode", "logger", "queued_patterns", "sequence_numbers", "current_pattern", "changed"]
+
+    def __init__(self, diode, logger):
+        """
+        :param diode: `Diode` object
+        :param logger: `logging.Logger` object used for logging actions of the object
+        """
+        self.set_logger(logger)
+        self.diode = diode
+        # list of tuples (priority, sequence number, `DiodePattern` object)
+        self.queued_patterns = []
+        self.sequence_numbers = itertools.count()
+        self.current_pattern = None
+        self.changed = asyncio.Event()
+
+    def set_logger(self, logger):
+        """
+        :param logger: `logging.Logger` object used for logging actions of the object
+        """
+        assert(isinstance(logger, logging.Logger))
+        self.logger = logger
+
+    def set_diode(self, diode):
+        """
+        Turns the current diode off and plays the patterns with `diode`, e.g. after the configuration was reloaded.
+        :param diode: `Diode` object
+        """
+        if diode is not self.diode:
+            self.diode.set_diode_light(False)
+            self.diode = diode
+            self.changed.set()
+
+    def play(self, pattern):
+        """
+        Queues `pattern`, it interrupts the playing pattern if it has a higher priority.
+        :param pattern: `DiodePattern` object
+        :return: `pattern`, which can be passed to `stop`
+        """
+        self.queued_patterns.append((pattern.get_priority(), next(self.sequence_numbers), pattern))
+        if self.current_pattern is None or pattern.get_priority() > self.current_pattern.get_priority():
+            self.changed.set()
+        return pattern
+
+    def stop(self, pattern):
+        """
+        Removes `pattern` from the queue and interrupts it if it is playing.
+        :param pattern: `DiodePattern` object passed to `play`
+        """
+        self.queued_patterns = [entry for entry in self.queued_patterns if entry[2] is not pattern]
+        if pattern is self.current_pattern:
+            self.changed.set()
+
+    def get_current_pattern(self):
+        """
+        :return: `DiodePattern` object that is playing, or None if the diode is off
+        """
+        return self.current_pattern
+
+    async def run(self):
+        """
+        Plays the queued patterns until the task is cancelled, then turns the diode off.
+        """
+        try:
+            while True:
+                self.changed.clear()
+                self.current_pattern = self.__get_next_pattern()
+                if self.current_pattern is None:
+                    self.diode.set_diode_light(False)
+                    await self.changed.wait()
+                    continue
+                self.logger.info("diode_driver.py: playing pattern {}".format(self.current_pattern.get_name()))
+                if await self.__play(self.current_pattern):
+                    self.stop(self.current_pattern)
+        finally:
+            self.current_pattern = None
+            self.diode.set_diode_light(False)
+
+    def __get_next_pattern(self):
+        """
+        :return: queued `DiodePattern` object with the highest priority that was added first, or None
+        """
+        if not self.queued_patterns:
+            return None
+        return min(self.queued_patterns, key=lambda entry: (-entry[0], entry[1]))[2]
+
+    async def __play(self, pattern):
+        """
+        :param pattern: `DiodePattern` object
+        :return: True if all repetitions of `pattern` were played, False if it was interrupted
+        """
+        repetition = 0
+        while pattern.repetitions is None or repetition < pattern.repetitions:
+            for diode_on, number_of_seconds in pattern.steps:
+                self.diode.set_diode_light(diode_on)
+                try:
+                    await asyncio.wait_for(self.changed.wait(), number_of_seconds)
+                    return False
+                except asyncio.TimeoutError:
+                    pass
+            repetition += 1
+        return True
+
+
+if __name__ == "__main__":
+    from diode import *
+
+    async def show_patterns(diode_driver):
+        task = asyncio.ensure_future(diode_driver.run())
+        diode_driver.play(solid_pattern(2.0))
+        heartbeat = diode_driver.play(heartbeat_pattern())
+        await asyncio.sleep(1)
+        # the error blink interrupts the solid light, which is played again afterwards
+        error_blink = diode_driver.play(error_blink_pattern())
+        await asyncio.sleep(3)
+        diode_driver.stop(error_blink)
+        diode_driver.play(pulse_code_pattern(3, repetitions=1))
+        await asyncio.sleep(15)
+        diode_driver.stop(heartbeat)
+        task.cancel()
+
+    logging.basicConfig(format="%(asctime)s %(message)s", level=logging.DEBUG)
+    logger = logging.getLogger("logger")
+    asyncio.run(show_patterns(DiodeDriver(Diode(18, "BCM", logger), logger)))
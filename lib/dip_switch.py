@@ -2,7 +2,9 @@
 Read dual inline package (DIP) switches.
 """
 
-import RPi.GPIO as GPIO
+import threading
+
+from gpio_backend import GPIO
 
 import settings
 import validate
@@ -10,20 +12,33 @@ import validate
 class DIPSwitch():
     """
     Reads dual inline package (DIP) switches.
+
+    The pins are set up once and the positions of all switches are cached as a bitmask (bit 0 is switch 1). Edge
+    detection updates the bitmask when a switch is moved, after the pins didn't change for `debounce_time` seconds, so
+    reading a position doesn't read any pin. If edge detection isn't available, the pins are read on every call.
     """
-    def __init__(self, dip_switch_pin_numbers, mode):
+    def __init__(self, dip_switch_pin_numbers, mode, debounce_time=0.05):
         """
         :param dip_switch_pin_numbers: list of at least one integer representing unique valid pin numbers of the Pi
         that the DIP switch is connected to. The pins in the list are ordered low-to-high. E.g. DIP switch has two
         switches. Switch with physical number 1 is connected to GPIO 26 and switch with number 2 to GPIO 19, so the
         `dip_switch_pin_numbers` is equal to [26,19].
         :param mode: string that represents a board numbering mode. Must be either "BCM" or "BOARD".
+        :param debounce_time: number of seconds the pins must be stable after an edge before the positions are updated
         """
         # set board numbering mode
         settings.set_board_numbering_mode(mode)
         self._mode = mode
         # check if `dip_switch_pin_numbers` is list of valid pin numbers
         self._set_dip_switch_pin_numbers(dip_switch_pin_numbers)
+        self._debounce_time = debounce_time
+        self._lock = threading.Lock()
+        self._debounce_timer = None
+        self._change_callbacks = []
+        # set up pins as inputs
+        GPIO.setup(self.dip_switch_pin_numbers, GPIO.IN, pull_up_down = GPIO.PUD_UP)
+        self._switch_bits = self._read_switch_bits()
+        self._edge_detection = self._add_edge_detection()
 
     def _set_dip_switch_pin_numbers(self, dip_switch_pin_numbers):
         """
@@ -44,17 +59,75 @@ class DIPSwitch():
         assert(False not in [validate.is_valid_GPIO_pin_number(pin_number, self._mode) for pin_number in dip_switch_pin_numbers])
         self.dip_switch_pin_numbers = dip_switch_pin_numbers
 
-    def _read_switch_positions(self):
+    def _read_switch_bits(self):
         """
-        Reads the pin numbers of the Pi that the DIP switch is connected to and set items in the `self.switch_positions`
-        list to "1" if the switch is in on position and to "0" if the switch is in off position. The switch positions
-        in the `self.switch_positions` list correspond to the pin numbers in the `self.dip_switch_pin_numbers` list.
-        E.g. When `self.dip_switch_pin_numbers` is equal to [26,19] and GPIO 26 is off and GPIO 19 is on, the
-        `self.switch_positions` is equal to ["0","1"]
+        Reads the pin numbers of the Pi that the DIP switch is connected to.
+        :return: integer whose bit i is 1 if the switch connected to `self.dip_switch_pin_numbers[i]` is in on position
+        and 0 if it is in off position. E.g. When `self.dip_switch_pin_numbers` is equal to [26,19] and GPIO 26 is off
+        and GPIO 19 is on, the bitmask is equal to 0b10.
         """
-        # set up pins as inputs
-        [GPIO.setup(pin_number, GPIO.IN, pull_up_down = GPIO.PUD_UP) for pin_number in self.dip_switch_pin_numbers]
-        self.switch_positions = ["1" if GPIO.input(pin) else "0" for pin in self.dip_switch_pin_numbers]
+        switch_bits = 0
+        for i, pin_number in enumerate(self.dip_switch_pin_numbers):
+            if GPIO.input(pin_number):
+                switch_bits |= 1 << i
+        return switch_bits
+
+    def _add_edge_detection(self):
+        """
+        Calls `self._on_edge` whenever the level of a DIP switch pin changes.
+        :return: True if edge detection was added, False if it isn't available and the pins are read on every call
+        """
+        try:
+            for pin_number in self.dip_switch_pin_numbers:
+                GPIO.add_event_detect(pin_number, GPIO.BOTH, callback=self._on_edge)
+        except (RuntimeError, AttributeError):
+            self._remove_edge_detection()
+            return False
+        return True
+
+    def _remove_edge_detection(self):
+        for pin_number in self.dip_switch_pin_numbers:
+            try:
+                GPIO.remove_event_detect(pin_number)
+            except (RuntimeError, AttributeError):
+                pass
+
+    def _on_edge(self, pin_number):
+        """
+        Restarts the debounce window, the pins are read when no edge came for `self._debounce_time` seconds. Called in
+        the edge detection thread of the GPIO library.
+        :param pin_number: integer representing the pin number whose level changed
+        """
+        with self._lock:
+            if self._debounce_timer is not None:
+                self._debounce_timer.cancel()
+            self._debounce_timer = threading.Timer(self._debounce_time, self._update_switch_bits)
+            self._debounce_timer.daemon = True
+            self._debounce_timer.start()
+
+    def _update_switch_bits(self):
+        """
+        Reads the pins after the debounce window and calls the change callbacks if the positions changed.
+        """
+        switch_bits = self._read_switch_bits()
+        with self._lock:
+            self._debounce_timer = None
+            if switch_bits == self._switch_bits:
+                return
+            old_switch_bits = self._switch_bits
+            self._switch_bits = switch_bits
+            change_callbacks = list(self._change_callbacks)
+        for change_callback in change_callbacks:
+            change_callback(self, old_switch_bits, switch_bits)
+
+    def get_switch_bits(self):
+        """
+        :return: integer whose bit i is 1 if switch number i + 1 is in on position, it is equal to the decimal number of
+        `get_switch_positions()`
+        """
+        if not self._edge_detection:
+            self._switch_bits = self._read_switch_bits()
+        return self._switch_bits
 
     def get_switch_position(self, switch_number):
         """
@@ -63,20 +136,36 @@ class DIPSwitch():
         are written on the DIP switch.
         :return: "0" if switch with `switch number` is in off position or "1" if switch is in on position.
         """
-        self._read_switch_positions()
-        # we have to subtract 1 from `switch_number` because `self.switch_positions` is a list that starts with index 0
-        # while switch numbers on DIP switch start with index 1
-        return self.switch_positions[switch_number - 1]
+        assert(1 <= switch_number <= len(self.dip_switch_pin_numbers))
+        # we have to subtract 1 from `switch_number` because bit 0 of the bitmask is the switch with number 1
+        return "1" if self.get_switch_bits() >> (switch_number - 1) & 1 else "0"
 
     def get_switch_positions(self):
         """
         Gets positions of all switches in DIP switch.
         :return: List of "1"s and "0"s that represent on and off positions of all switches in DIP switch. The switch
-        positions in the `self.switch_positions` list correspond to the pin numbers in the`self.dip_switch_pin_numbers`
-        list.
+        positions in the list correspond to the pin numbers in the `self.dip_switch_pin_numbers` list.
+        """
+        switch_bits = self.get_switch_bits()
+        return ["1" if switch_bits >> i & 1 else "0" for i in range(len(self.dip_switch_pin_numbers))]
+
+    def add_change_callback(self, change_callback):
+        """
+        Subscribes to changes of the switch positions, e.g. to change the sampler ID at runtime without polling. The
+        callback is called in a thread of the GPIO library, an asyncio program should pass the change to its event loop
+        with `loop.call_soon_threadsafe`. Without edge detection, the callbacks are never called.
+        :param change_callback: function called with the `DIPSwitch` object, the old bitmask and the new bitmask (see
+        `get_switch_bits`) after the positions changed
         """
-        self._read_switch_positions()
-        return self.switch_positions
+        with self._lock:
+            self._change_callbacks.append(change_callback)
+
+    def remove_change_callback(self, change_callback):
+        """
+        :param change_callback: function that was passed to `add_change_callback`
+        """
+        with self._lock:
+            self._change_callbacks.remove(change_callback)
 
     @staticmethod
     def convert_switch_positions_to_decimal_number(switch_positions):
@@ -98,12 +187,23 @@ class DIPSwitch():
             factor *= 2
         return decimal_number
 
-    def __del__(self):
+    def close(self):
         """
-        Sets all pins in `self.dip_switch_pin_numbers` as inputs.
+        Stops the edge detection and sets all pins in `self.dip_switch_pin_numbers` as inputs. The GPIO library keeps a
+        reference to the object while edge detection is on, so it must be closed instead of only deleted.
         """
+        if self._edge_detection:
+            self._remove_edge_detection()
+            self._edge_detection = False
+        with self._lock:
+            if self._debounce_timer is not None:
+                self._debounce_timer.cancel()
+                self._debounce_timer = None
         GPIO.cleanup(self.dip_switch_pin_numbers)
 
+    def __del__(self):
+        self.close()
+
 if __name__ == "__main__":
     # list GPIOs numbers in BCM mode that the DIP switch is connected to in low-to-high order
     dip_switch_pin_numbers = [26, 19, 13, 6, 5, 21, 20, 16]
@@ -114,3 +214,7 @@ if __name__ == "__main__":
     print("DIP switch positions: ", dip_switch.get_switch_positions())
     print("DIP switch positions as decimal number: ", str(decimal_number))
     print("DIP switch 4th position: ", dip_switch.get_switch_position(4))
+    dip_switch.add_change_callback(lambda dip_switch, old_bits, new_bits:
+                                   print("DIP switch changed from {} to {}".format(old_bits, new_bits)))
+    input("Move the switches and press Enter to stop\n")
+    dip_switch.close()
@@ -0,0 +1,114 @@
+"""
+Package for measuring how accurately the scheduler executes actuator events scheduled with millisecond precision. A
+`Scheduler` drives a `Sampler` on the fake GPIO backend in real time, every GPIO write is recorded with the time of
+`time.monotonic()` and compared with the monotonic time the event was scheduled for. `Scheduler.run_async` is measured
+twice, waking up with a timerfd timer and with the timeout of the event loop.
+
+Usage (the number of events and the interval between them in milliseconds are optional):
+    python3 dispatch_benchmark.py [<number of events> [<interval in milliseconds>]]
+"""
+
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import sys
+import time
+
+from gpio_backend import *
+from pump_event import *
+from clock import *
+from sampler import *
+from scheduler import *
+from valve_event import *
+
+_PUMP_PIN_NUMBER = 27
+_BAG_TO_VALVE_PIN_NUMBERS_DICT = {1: 17}
+
+def get_benchmark_events(start_time, number_of_events, interval):
+    """
+    :param start_time: `datetime` object representing the time of the first event
+    :param number_of_events: integer representing the number of events
+    :param interval: `timedelta` object representing the time between two events
+    :return: list of `PumpEvent` and `ValveEvent` objects, every event changes the level of one GPIO pin
+    """
+    actions = [lambda event_time: PumpEvent(event_time, "turn pump on"),
+               lambda event_time: ValveEvent(event_time, 1, "open valve"),
+               lambda event_time: ValveEvent(event_time, 1, "close valve"),
+               lambda event_time: PumpEvent(event_time, "turn pump off")]
+    return [actions[index % len(actions)](start_time + index * interval) for index in range(number_of_events)]
+
+def get_percentile(values, percentile):
+    """
+    :param values: sorted list of floats
+    :param percentile: float between 0 and 100
+    :return: float representing the smallest value that at least `percentile` percent of `values` don't exceed
+    """
+    return values[max(0, -(-len(values) * percentile // 100) - 1)]
+
+class DispatchBenchmark():
+    """
+    Class for executing a list of actuator events with a `Scheduler` object in real time and collecting how late the
+    GPIO pins were written.
+    """
+    __slots__ = ["number_of_events", "interval", "logger", "fake_gpio"]
+
+    def __init__(self, number_of_events, interval, logger):
+        """
+        :param number_of_events: integer representing the number of events
+        :param interval: `timedelta` object representing the time between two events
+        :param logger: `logging.Logger` object used by the sampler and the scheduler
+        """
+        assert(number_of_events > 0 and interval > timedelta(0))
+        self.number_of_events = number_of_events
+        self.interval = interval
+        self.logger = logger
+        self.fake_gpio = select_gpio_backend("fake")
+        GPIO.setmode(GPIO.BCM)
+
+    def run(self, use_asyncio, clock=None):
+        """
+        :param use_asyncio: True to run the scheduler with `Scheduler.run_async`, False to run it with `Scheduler.run`
+        :param clock: `SystemClock` object that the scheduler waits with, `SystemClock` with a timerfd timer if None
+        :return: sorted list of floats representing the number of seconds that the GPIO writes were late
+        """
+        sampler = Sampler(_PUMP_PIN_NUMBER, _BAG_TO_VALVE_PIN_NUMBERS_DICT, "BCM", self.logger)
+        # start with a fraction of a second, so the events aren't aligned with whole seconds or milliseconds
+        start_time = datetime.now() + timedelta(seconds=0.5, microseconds=137)
+        events = get_benchmark_events(start_time, self.number_of_events, self.interval)
+        scheduler = Scheduler(iter(events), sampler, self.logger, clock=clock)
+        self.fake_gpio.recorder.clear()
+        current_time, current_monotonic_time = datetime.now(), time.monotonic()
+        scheduled_times = [current_monotonic_time + (event.get_time() - current_time).total_seconds()
+                           for event in events]
+        if use_asyncio:
+            asyncio.run(scheduler.run_async())
+        else:
+            scheduler.run()
+        write_times = [write_time for write_time, _, _ in self.fake_gpio.recorder.get_transitions()]
+        # leave all pins low, so the first event of the next run changes the level of its pin
+        sampler.turn_pump_off()
+        sampler.close_all_valves()
+        assert(len(write_times) == len(scheduled_times))
+        return sorted(write_time - scheduled_time for write_time, scheduled_time in zip(write_times, scheduled_times))
+
+def get_summary(latencies):
+    """
+    :param latencies: sorted list of floats representing latencies in seconds
+    :return: string representing the median, the 99th percentile and the maximum latency in milliseconds
+    """
+    return "p50 {:.3f} ms, p99 {:.3f} ms, max {:.3f} ms".format(
+        get_percentile(latencies, 50) * 1000, get_percentile(latencies, 99) * 1000, latencies[-1] * 1000)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3:
+        print(__doc__)
+        sys.exit(1)
+    logging.basicConfig(format="%(asctime)s %(message)s", level=logging.WARNING)
+    number_of_events = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    interval = timedelta(milliseconds=int(sys.argv[2]) if len(sys.argv) > 2 else 25)
+    benchmark = DispatchBenchmark(number_of_events, interval, logging.getLogger("logger"))
+    print("Scheduler.run:       ", get_summary(benchmark.run(use_asyncio=False)))
+    print("Scheduler.run_async: ", get_summary(benchmark.run(use_asyncio=True)))
+    print("  without timerfd:   ", get_summary(benchmark.run(use_asyncio=True,
+                                                             clock=SystemClock(use_deadline_timer=False))))
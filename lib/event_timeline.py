@@ -0,0 +1,38 @@
+"""
+Package containing methods for merging streams of actuator events (`ValveEvent` and `PumpEvent` objects) into one
+stream ordered by time.
+"""
+
+from datetime import datetime
+import heapq
+
+from valve_event import *
+from pump_event import *
+
+# actions that take place at the same time are executed in this order: the pump is already on when a valve opens, a
+# valve closes before the next valve opens and the pump turns off after the valve closes
+ACTION_PRIORITIES = {"turn pump on": 0, "close valve": 1, "open valve": 2, "turn pump off": 3}
+
+def get_event_key(event):
+    """
+    :param event: actuator event, e.g. `ValveEvent` or `PumpEvent` object
+    :return: tuple of the time of the event and the priority of its action
+    """
+    return event.get_time(), ACTION_PRIORITIES[event.get_action()]
+
+def merge_actuator_events(*event_streams):
+    """
+    Merges streams of actuator events lazily, only the next event of every stream is held in a heap.
+    :param event_streams: iterables of actuator events, each sorted by `get_event_key`
+    :return: generator of actuator events sorted by time and by `ACTION_PRIORITIES` at the same time
+    """
+    return heapq.merge(*event_streams, key=get_event_key)
+
+
+if __name__ == "__main__":
+    valve_events = [ValveEvent(datetime(2020, 3, 6, 11, 38, 0), 3, "open valve"),
+                    ValveEvent(datetime(2020, 3, 6, 11, 38, 30), 3, "close valve")]
+    pump_events = [PumpEvent(datetime(2020, 3, 6, 11, 38, 0), "turn pump on"),
+                   PumpEvent(datetime(2020, 3, 6, 11, 38, 30), "turn pump off")]
+    for event in merge_actuator_events(valve_events, pump_events):
+        print(event.get_time(), "\t", event.get_action())
@@ -0,0 +1,33 @@
+"""
+Read-only sequence of event times that are computed from schedule columns on demand.
+"""
+
+class EventTimes():
+    """
+    Class for presenting the times of events stored in columns (e.g. valve events stored as bag start and stop times) as
+    a sorted sequence, so it can be searched with the `bisect` module without creating a list of the times.
+    """
+    __slots__ = ["length", "get_time"]
+
+    def __init__(self, length, get_time):
+        """
+        :param length: integer representing the number of events
+        :param get_time: function that takes an integer representing the position of the event and returns an integer
+        representing the time of the event
+        """
+        assert(length >= 0)
+        self.length = length
+        self.get_time = get_time
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        return self.get_time(index)
+
+
+if __name__ == "__main__":
+    from bisect import bisect_right
+    start_times, stop_times = [10, 30, 50], [20, 40, 60]
+    event_times = EventTimes(6, lambda i: stop_times[i // 2] if i % 2 else start_times[i // 2])
+    print("Events after 35 start at position: ", bisect_right(event_times, 35))
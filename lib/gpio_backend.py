@@ -0,0 +1,258 @@
+"""
+Package for selecting the library that controls the GPIO pins. Hardware modules import `GPIO` from this package instead
+of importing `RPi.GPIO`, so they can be imported and run on a computer without GPIO pins.
+
+Two backends are available:
+    + "RPi" uses the `RPi.GPIO` library of the Pi (default)
+    + "fake" uses an in-memory `FakeGPIO` object that records the modes of the pins and every change of the outputs
+
+The backend is selected by the environment variable `AIR_SAMPLER_GPIO_BACKEND` or by calling `select_gpio_backend`
+before the hardware objects are created.
+"""
+
+from array import array
+import logging
+import os
+import time
+
+GPIO_BACKEND_VARIABLE = "AIR_SAMPLER_GPIO_BACKEND"
+GPIO_BACKENDS = ("RPi", "fake")
+
+class TransitionRecorder():
+    """
+    Class for recording changes of GPIO outputs. The transitions are stored in three arrays (time, pin number and
+    level), so millions of transitions take a few megabytes.
+    """
+    __slots__ = ["clock", "times", "pin_numbers", "levels"]
+
+    def __init__(self, clock=time.monotonic):
+        """
+        :param clock: function without arguments returning the time of a transition as float, e.g. `time.monotonic`
+        or `VirtualClock.monotonic`
+        """
+        self.clock = clock
+        self.clear()
+
+    def clear(self):
+        """
+        Removes all recorded transitions.
+        """
+        self.times = array("d")
+        self.pin_numbers = array("h")
+        self.levels = array("b")
+
+    def record(self, pin_number, level):
+        """
+        :param pin_number: integer representing the GPIO pin number
+        :param level: integer representing the new output, 0 or 1
+        """
+        self.times.append(self.clock())
+        self.pin_numbers.append(pin_number)
+        self.levels.append(level)
+
+    def get_transitions(self, pin_number=None):
+        """
+        :param pin_number: integer representing a GPIO pin number, or None for transitions of all pins
+        :return: list of tuples (time, pin number, level) in the order of the transitions
+        """
+        return [transition for transition in zip(self.times, self.pin_numbers, self.levels)
+                if pin_number is None or transition[1] == pin_number]
+
+    def __len__(self):
+        return len(self.times)
+
+class FakeGPIO():
+    """
+    Class with the subset of the `RPi.GPIO` interface used by the sampler. It keeps the numbering mode, the direction
+    and level of every pin in memory, records every change of an output with a `TransitionRecorder` object and returns
+    levels of input pins that were set by `set_input` (e.g. positions of DIP switches). Callbacks added by
+    `add_event_detect` are called synchronously by `set_input` when the level of the input changes.
+    """
+    __slots__ = ["mode", "warnings", "pin_directions", "levels", "input_levels", "recorder", "event_callbacks"]
+
+    BOARD = 10
+    BCM = 11
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self, recorder=None):
+        """
+        :param recorder: `TransitionRecorder` object, a new recorder using `time.monotonic` if None
+        """
+        self.recorder = TransitionRecorder() if recorder is None else recorder
+        self.mode = None
+        self.warnings = True
+        self.pin_directions = {}
+        self.levels = {}
+        self.input_levels = {}
+        self.event_callbacks = {}
+
+    def setmode(self, mode):
+        if self.mode is not None and mode != self.mode:
+            raise ValueError("A different mode has already been set!")
+        self.mode = mode
+
+    def getmode(self):
+        return self.mode
+
+    def setwarnings(self, warnings):
+        self.warnings = bool(warnings)
+
+    def setup(self, channel, direction, pull_up_down=PUD_OFF, initial=-1):
+        if self.mode is None:
+            raise RuntimeError("Please set pin numbering mode using GPIO.setmode(GPIO.BOARD) or GPIO.setmode(GPIO.BCM)")
+        for pin_number in _get_pin_numbers(channel):
+            self.pin_directions[pin_number] = direction
+            if direction == self.OUT and initial != -1:
+                self.__set_level(pin_number, int(bool(initial)))
+            elif direction == self.OUT:
+                # like `RPi.GPIO`, the output keeps its level unless `initial` is given
+                self.__set_level(pin_number, self.levels.get(pin_number, self.LOW))
+            else:
+                self.levels[pin_number] = self.HIGH if pull_up_down == self.PUD_UP else self.LOW
+
+    def output(self, channel, value):
+        pin_numbers = _get_pin_numbers(channel)
+        # like `RPi.GPIO`, a list of pins is written with one value or with a list of values of the same length
+        values = list(value) if isinstance(value, (list, tuple)) else [value] * len(pin_numbers)
+        if len(values) != len(pin_numbers):
+            raise RuntimeError("Number of channels != number of values")
+        for pin_number, pin_value in zip(pin_numbers, values):
+            if self.pin_directions.get(pin_number) != self.OUT:
+                raise RuntimeError("The GPIO channel has not been set up as an OUTPUT")
+            self.__set_level(pin_number, int(bool(pin_value)))
+
+    def input(self, channel):
+        if channel not in self.pin_directions:
+            raise RuntimeError("You must setup() the GPIO channel first")
+        if self.pin_directions[channel] == self.IN and channel in self.input_levels:
+            return self.input_levels[channel]
+        return self.levels[channel]
+
+    def add_event_detect(self, channel, edge, callback=None, bouncetime=None):
+        if self.pin_directions.get(channel) != self.IN:
+            raise RuntimeError("You must setup() the GPIO channel as an input first")
+        if channel in self.event_callbacks:
+            raise RuntimeError("Conflicting edge detection already enabled for this GPIO channel")
+        self.event_callbacks[channel] = (edge, [] if callback is None else [callback])
+
+    def add_event_callback(self, channel, callback):
+        if channel not in self.event_callbacks:
+            raise RuntimeError("Add event detection using add_event_detect first before adding a callback")
+        self.event_callbacks[channel][1].append(callback)
+
+    def remove_event_detect(self, channel):
+        self.event_callbacks.pop(channel, None)
+
+    def cleanup(self, channel=None):
+        pin_numbers = list(self.pin_directions) if channel is None else _get_pin_numbers(channel)
+        for pin_number in pin_numbers:
+            self.pin_directions.pop(pin_number, None)
+            self.event_callbacks.pop(pin_number, None)
+        if channel is None:
+            self.mode = None
+
+    def set_input(self, pin_number, level):
+        """
+        Sets the level that `input` returns for an input pin instead of the level of its pull-up or pull-down
+        resistor, e.g. to simulate the position of a DIP switch.
+        :param pin_number: integer representing the GPIO pin number
+        :param level: integer representing the level, 0 or 1, or None to use the resistor again
+        """
+        old_level = self.input(pin_number) if pin_number in self.pin_directions else None
+        if level is None:
+            self.input_levels.pop(pin_number, None)
+        else:
+            self.input_levels[pin_number] = int(bool(level))
+        new_level = self.input(pin_number) if pin_number in self.pin_directions else None
+        if pin_number in self.event_callbacks and old_level != new_level:
+            edge, callbacks = self.event_callbacks[pin_number]
+            if edge == self.BOTH or edge == (self.RISING if new_level else self.FALLING):
+                for callback in callbacks:
+                    callback(pin_number)
+
+    def get_level(self, pin_number):
+        """
+        :param pin_number: integer representing the GPIO pin number
+        :return: integer representing the current output level of the pin or the level of its resistor, 0 or 1, or None
+        if the pin was never set up
+        """
+        return self.levels.get(pin_number)
+
+    def get_direction(self, pin_number):
+        """
+        :param pin_number: integer representing the GPIO pin number
+        :return: `OUT` or `IN`, or None if the pin isn't set up
+        """
+        return self.pin_directions.get(pin_number)
+
+    def __set_level(self, pin_number, level):
+        if self.levels.get(pin_number) != level:
+            self.levels[pin_number] = level
+            self.recorder.record(pin_number, level)
+
+class _SelectedGPIO():
+    """
+    Class forwarding attribute access to the selected backend, so modules can import `GPIO` before the backend is
+    selected.
+    """
+    __slots__ = []
+
+    def __getattr__(self, name):
+        return getattr(get_gpio_backend(), name)
+
+_backend = None
+
+def _get_pin_numbers(channel):
+    """
+    :param channel: integer, list or tuple of integers representing GPIO pin numbers
+    :return: list of integers representing GPIO pin numbers
+    """
+    return list(channel) if isinstance(channel, (list, tuple)) else [channel]
+
+def select_gpio_backend(name, recorder=None):
+    """
+    :param name: string representing the backend, must be "RPi" or "fake"
+    :param recorder: `TransitionRecorder` object used by the "fake" backend, a new recorder using `time.monotonic` if
+    None
+    :return: the selected backend, `RPi.GPIO` module or `FakeGPIO` object
+    """
+    global _backend
+    assert(name in GPIO_BACKENDS)
+    if name == "RPi":
+        import RPi.GPIO
+        _backend = RPi.GPIO
+    else:
+        _backend = FakeGPIO(recorder)
+    logging.info("gpio_backend.py: selected GPIO backend {}".format(name))
+    return _backend
+
+def get_gpio_backend():
+    """
+    :return: the selected backend, selected by `AIR_SAMPLER_GPIO_BACKEND` (default "RPi") if none was selected yet
+    """
+    if _backend is None:
+        select_gpio_backend(os.environ.get(GPIO_BACKEND_VARIABLE, "RPi"))
+    return _backend
+
+GPIO = _SelectedGPIO()
+
+
+if __name__ == "__main__":
+    fake_gpio = select_gpio_backend("fake")
+    GPIO.setmode(GPIO.BCM)
+    GPIO.setup(17, GPIO.OUT)
+    GPIO.output(17, 1)
+    GPIO.output(17, 0)
+    GPIO.setup(26, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+    fake_gpio.set_input(26, 0)
+    print("Transitions: ", fake_gpio.recorder.get_transitions())
+    print("Input of GPIO 26: ", GPIO.input(26))
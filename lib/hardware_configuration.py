@@ -222,6 +222,15 @@ class HardwareConfiguration():
         """
         return self.diode_pin_number
 
+    def get_output_pin_numbers(self):
+        """
+        :return: list of integers representing the GPIO pin numbers of the pump, the valves (in the order of the bag
+        numbers) and the diode
+        """
+        valve_pin_numbers = self.bag_numbers_to_valve_pin_numbers_dict
+        return [self.pump_pin_number] + [valve_pin_numbers[bag] for bag in sorted(valve_pin_numbers)] \
+            + [self.diode_pin_number]
+
 
 if __name__ == "__main__":
     file_path = "../tests/valid_hardware_configuration_file.txt"
@@ -232,4 +241,5 @@ if __name__ == "__main__":
                   hardware_config.get_numbering_mode(),
                   hardware_config.get_bag_numbers_to_valve_pin_numbers_dict(),
                   hardware_config.get_pump_pin_number(),
-                  hardware_config.get_diode_pin_number()))
\ No newline at end of file
+                  hardware_config.get_diode_pin_number()))
+    print("Output pins: {}".format(hardware_config.get_output_pin_numbers()))
\ No newline at end of file
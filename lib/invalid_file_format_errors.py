@@ -42,7 +42,8 @@ class ScheduleFileError(Exception):
     """
     def __init__(self, file_path, message):
         """
-        :param file_path: string representing a path to a schedule file
+        :param file_path: string representing a path to a schedule file, or None when the error is raised for one line
+        of the file and reported with its line number
         :param message: string representing an error message
         """
         self.file_path = file_path
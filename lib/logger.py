@@ -1,14 +1,16 @@
 """
 Package for logging information to the log file.
 """
-import usb_drive
-import diode
+from usb_drive import *
+from diode import *
 
+import asyncio
+import os
 import sys
 import logging
 import settings
 import linecache
-import time
+import runtime
 
 def log_uncaught_exception(exception_type, exception_object, traceback):
     """
@@ -36,15 +38,9 @@ def log_uncaught_exception(exception_type, exception_object, traceback):
     diode = Diode(18,
                   "BCM",
                   logger)
-    while True:
-        # if the usb was reinserted, restart the program
-        if usb.was_reinserted():
-            os.execl(sys.executable, sys.executable, *sys.argv)
-        # blink diode
-        diode.turn_diode_on()
-        time.sleep(0.5)
-        diode.turn_diode_off()
-        time.sleep(0.5)
+    # blink diode until the usb is reinserted, then restart the program
+    asyncio.run(runtime.blink_until_reinserted(usb, diode))
+    os.execl(sys.executable, sys.executable, *sys.argv)
 
 if __name__ == "__main__":
     sys.excepthook = log_uncaught_exception
@@ -1,34 +1,53 @@
 from datetime import datetime
+from functools import partial
+from itertools import chain
+import asyncio
 import time
 import logging
 import sys
-import threading
 import sys
 from os.path import join
 
 from sampler_schedule import *
+from event_timeline import *
+from scheduler import *
+from actuation_latency import *
+from checkpoint_journal import *
+from runtime import *
 from sampler import *
 from pump_event import *
 from configuration import *
+from hardware_configuration import *
 from usb_drive import *
 from logger import *
 from diode import *
 from settings import *
+import schedule_log
 
-def update_schedules_and_configuration(usb, ID, logger):
+def read_schedules_and_configuration(usb, ID, logger, user_logger, validation_workers=1):
     """
-    Update valve schedule, pump schedule and the configuration of sampler based on its ID number and the files on the
-    inserted USB drive.
+    Reads and validates the configuration and schedule files of the sampler based on its ID number. GPIO pins aren't
+    used, so the files can be read while the sampler keeps sampling.
     :param usb: `USB_drive` object (exactly one USB must be inserted)
     :param ID: Integer that represents the ID number of the sampler
-    :return: Iterator over list of `valve_event` objects, iterator over list of `pump_event` objects, `Sampler` object
+    :param user_logger: `logging.Logger` object that errors in the files are written to the file for the user with. Its
+    handlers are replaced, so it must only be used by the thread calling this function
+    :param validation_workers: integer representing the maximum number of processes that validate the schedule file,
+    see `SamplerSchedule`
+    :return: `Configuration` object, `SamplerSchedule` object, string representing the path to the file with errors
+    for the user
     """
     path_to_schedule_file = usb.get_path_for_schedule_file(ID)
     path_to_configuration_file = usb.get_path_for_configuration_file(ID)
+    # compiled copy of the schedule file on the SD card, it is opened instead of parsing an unchanged schedule file
+    path_to_compiled_schedule_file = "/home/pi/." + str(ID) + "_schedule.bin"
 
     file_name = str(ID) + "_errors.txt"
     file_path = join(usb.get_path_to_usb(), file_name)
-    user_logger = logging.getLogger("user logger")
+    # errors are only written to the file on the USB drive that is currently inserted
+    for handler in user_logger.handlers[:]:
+        user_logger.removeHandler(handler)
+        handler.close()
     user_file_handler = logging.FileHandler(file_path, mode = "w")
     user_logger.addHandler(user_file_handler)
     
@@ -53,132 +72,227 @@ def update_schedules_and_configuration(usb, ID, logger):
                                                 configuration.get_pump_stops_after(),
                                                 configuration.get_pump_time_off_tolerance(),
                                                 logger,
-                                                user_logger)
+                                                user_logger,
+                                                path_to_compiled_schedule_file,
+                                                validation_workers)
     except:
         raise ValueError("Invalid schedule file.")
+    return configuration, schedules_for_sampler, file_path
 
-    # apply configuration to `Sampler` and `Diode` objects
-    sampler = Sampler(configuration.get_pump_pin_number(),
-                      configuration.get_bag_numbers_to_valve_pin_numbers_dict(),
-                      configuration.get_numbering_mode(),
+def remove_empty_error_file(file_path):
+    """
+    Deletes the file with errors for the user if no error was written to it.
+    :param file_path: string representing the path to the file with errors for the user
+    """
+    if os.stat(file_path).st_size == 0:
+        os.remove(file_path)
+
+def create_sampler_and_diode(configuration, hardware_configuration, logger):
+    """
+    Applies the configuration and the hardware configuration to `Sampler` and `Diode` objects.
+    :param configuration: `Configuration` object
+    :param hardware_configuration: `HardwareConfiguration` object with the GPIO pins of the pump, the valves and the
+    diode
+    :return: `Sampler` object, `Diode` object
+    """
+    sampler = Sampler(hardware_configuration.get_pump_pin_number(),
+                      hardware_configuration.get_bag_numbers_to_valve_pin_numbers_dict(),
+                      hardware_configuration.get_numbering_mode(),
                       logger)
-    diode = Diode(configuration.get_diode_pin_number(),
-                  configuration.get_numbering_mode(),
+    diode = Diode(hardware_configuration.get_diode_pin_number(),
+                  hardware_configuration.get_numbering_mode(),
                   logger)
     diode.set_diode_light_duration(configuration.get_diode_light_duration())
+    # from now on, a reset only drives the pins of the pump, the valves and the diode low
+    set_gpio_reset_plan(hardware_configuration)
+    return sampler, diode
+
+def update_schedules_and_configuration(usb, ID, logger, hardware_configuration, interrupted_sample_policy="skip",
+                                       last_checkpoint=None, validation_workers=1):
+    """
+    Update valve schedule, pump schedule and the configuration of sampler based on its ID number and the files on the
+    inserted USB drive.
+    :param usb: `USB_drive` object (exactly one USB must be inserted)
+    :param ID: Integer that represents the ID number of the sampler
+    :param hardware_configuration: `HardwareConfiguration` object with the GPIO pins of the pump, the valves and the
+    diode
+    :param interrupted_sample_policy: string representing how the sample in progress is handled, see
+    `SamplerSchedule.iter_resumed_actuator_events`
+    :param last_checkpoint: `Checkpoint` object journaled before the program started, or None
+    :param validation_workers: integer representing the maximum number of processes that validate the schedule file,
+    see `SamplerSchedule`
+    :return: Iterator over `ValveEvent` and `PumpEvent` objects merged into one stream, `Sampler` object, `Diode`
+    object, `SamplerSchedule` object
+    """
+    user_logger = logging.getLogger("user logger")
+    configuration, schedules_for_sampler, file_path = read_schedules_and_configuration(usb, ID, logger, user_logger,
+                                                                                       validation_workers)
+    sampler, diode = create_sampler_and_diode(configuration, hardware_configuration, logger)
 
     current_time = datetime.now()
     
-    list_of_valve_events = schedules_for_sampler.get_current_valve_schedule(current_time)
-    list_of_pump_events = schedules_for_sampler.get_current_pump_schedule(current_time)
+    # create iterator over `ValveEvent` and `PumpEvent` objects, note that it includes only future events and the events
+    # of the sample in progress, not past events
+    actuator_events = schedules_for_sampler.iter_resumed_actuator_events(current_time, interrupted_sample_policy,
+                                                                         last_checkpoint)
+    first_actuator_event = next(actuator_events, None)
     # raise exception if there are no samples to be taken in the future
-    if not list_of_valve_events and not list_of_pump_events:
+    if first_actuator_event is None:
         user_logger.info("There are no samples that are scheduled to be taken in the future. "
                          "That may be because the schedule file is empty or because the samples "
                          "were all scheduled to be taken in the past.")
         raise ValueError("There are no samples that are scheduled to be taken in the future.")
-    # create iterator over lists of `valve_event` objects and `pump_event` objects
-    # note that lists include only future events, not past events
-    valves_schedule = iter(list_of_valve_events)
-    pump_schedule = iter(list_of_pump_events)
+    actuator_events = chain([first_actuator_event], actuator_events)
 
     # delete user log file if it is empty
-    if os.stat(file_path).st_size == 0:
-        os.remove(file_path)
+    remove_empty_error_file(file_path)
 
-    return valves_schedule, pump_schedule, sampler, diode
-
-# create logger object for logging events and errors
-current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-file_path = "/home/pi/Desktop/sampler_logs/" + current_time + ".log"
-logger = logging.getLogger("main logger")
-logging.basicConfig(format="%(asctime)s %(message)s",
-                    filemode="w",
-                    level=logging.DEBUG)
-file_handler = logging.FileHandler(file_path)
-logger.addHandler(file_handler)
-
-logger.info("main.py: program started")
-
-disable_gpio_warnings()
-reset_gpio_pins()
-
-# handle uncaught exception and safely exit the program
-sys.excepthook = log_uncaught_exception
-
-# get ID number of sampler from the `.ID.txt` file
-path_to_ID_number_file = "/home/pi/.ID.txt"
-with open(path_to_ID_number_file, "r") as file:
-    content = file.read()
-ID_number = int(content)
-logger.info("main.py: set ID number of sampler to {}".format(str(ID_number)))
-
-# wait for USB to be inserted
-usb = USB_drive(logger)
-while True:
-    if usb.is_inserted():
-        valves_schedule, pump_schedule, sampler, diode = update_schedules_and_configuration(usb, ID_number, logger)
-        # get next valve and pump event from the iterators
-        try:
-            valve_event = next(valves_schedule)
-            pump_event = next(pump_schedule)
-        except StopIteration:
-            logger.error("main.py: no current pump or valve events to execute, exiting the program")
-            reset_gpio_pins()
-            turn_Pi_off()
-        break
-    time.sleep(1)
-
-# turn diode on to indicate schedule and configuration file were read correctly
-diode_light_thread = threading.Thread(target=diode.turn_diode_on_for, args=(diode.get_diode_light_duration_in_seconds(),))
-diode_light_thread.start()
-
-pump_schedule_finished = False
-valve_schedule_finished = False
-while True:
-    # when usb is reinserted, immediately finish the current sample (turn the pump off, close all valves) and update the
-    # schedules and configuration
-    if usb.was_reinserted():
-        sampler.turn_pump_off()
-        sampler.close_all_valves()
-        valves_schedule, pump_schedule, sampler = update_schedules_and_configuration(usb, ID_number, logger)
-        try:
-            valve_event = next(valves_schedule)
-            pump_event = next(pump_schedule)
-        except StopIteration:
-            logger.error("main.py: no current pump or valve events to execute, exiting the program")
-            reset_gpio_pins()
-            turn_Pi_off()
-        break
-        diode_light_thread = threading.Thread(target=diode.turn_diode_on, args=(diode.get_diode_time_on_in_seconds(),))
-        diode_light_thread.start()
-    # get current time without microseconds
-    current_time = datetime.now().replace(microsecond=0)
-    if current_time == pump_event.get_pump_time():
-        if pump_event.get_pump_action() == "turn pump on":
-            sampler.turn_pump_on()
-        elif pump_event.get_pump_action() == "turn pump off":
-            sampler.turn_pump_off()
-        try:
-            pump_event = next(pump_schedule)
-        except StopIteration:
-            pump_schedule_finished = True
-            pass
-    if current_time == valve_event.get_valve_time():
-        if valve_event.get_valve_action() == "open valve":
-            sampler.open_valve(valve_event.get_valve_number())
-        elif valve_event.get_valve_action() == "close valve":
-            sampler.close_valve(valve_event.get_valve_number())
-        try:
-            valve_event = next(valves_schedule)
-        except StopIteration:
-            valve_schedule_finished = True
-            pass
-        
-    if valve_schedule_finished and pump_schedule_finished:
-        reset_gpio_pins()
+    return actuator_events, sampler, diode, schedules_for_sampler
+
+def read_new_schedules_and_configuration(usb, ID, logger, running_schedules_for_sampler, validation_workers=1):
+    """
+    Reads and validates the files on the reinserted USB drive and compares the new schedule with the running one. It
+    runs in a worker thread while the running schedule keeps being executed, and raises an exception if a file is
+    invalid. It doesn't use module variables, which are replaced by `swap_schedules_and_configuration` in the thread of
+    the event loop, and writes errors for the user with its own logger, so it doesn't touch the handlers of the
+    "user logger".
+    :param usb: `USB_drive` object (exactly one USB must be inserted)
+    :param ID: Integer that represents the ID number of the sampler
+    :param running_schedules_for_sampler: `SamplerSchedule` object of the running schedule
+    :param validation_workers: integer representing the maximum number of processes that validate the schedule file,
+    see `SamplerSchedule`
+    :return: tuple (`Configuration` object, `SamplerSchedule` object, `ScheduleDiff` object) that is passed to
+    `swap_schedules_and_configuration`
+    """
+    configuration, new_schedules_for_sampler, file_path = read_schedules_and_configuration(
+        usb, ID, logger, logging.getLogger("reload user logger"), validation_workers)
+    remove_empty_error_file(file_path)
+    schedule_diff = new_schedules_for_sampler.get_schedule_diff(running_schedules_for_sampler)
+    logger.info("main.py: schedule file changes: {}".format(schedule_diff.get_summary()))
+    return configuration, new_schedules_for_sampler, schedule_diff
+
+def swap_schedules_and_configuration(new_schedules_and_configuration):
+    """
+    Replaces the running schedule with the schedule read by `read_new_schedules_and_configuration`. The sample in
+    progress keeps running when it is unchanged in the new schedule, otherwise it is finished immediately (turn the pump
+    off, close all valves).
+    :param new_schedules_and_configuration: tuple returned by `read_new_schedules_and_configuration`
+    :return: `Diode` object created from the new configuration
+    """
+    global sampler, diode, schedules_for_sampler
+    configuration, new_schedules_for_sampler, schedule_diff = new_schedules_and_configuration
+    old_schedules_for_sampler = schedules_for_sampler
+    old_sampler = sampler
+    new_sampler, diode = create_sampler_and_diode(configuration, hardware_configuration, logger)
+    spliced_schedules = None
+    if old_sampler.has_same_pins(new_sampler):
+        spliced_schedules = new_schedules_for_sampler.get_spliced_schedules(old_schedules_for_sampler,
+                                                                            schedule_diff,
+                                                                            datetime.now())
+    if spliced_schedules is None:
+        old_sampler.turn_pump_off()
+        old_sampler.close_all_valves()
+        sampler = new_sampler
+        actuator_events = new_schedules_for_sampler.iter_current_actuator_events(datetime.now())
+    else:
+        # keep the objects that know which valve is open and whether the pump is on
+        sampler = old_sampler
+        actuator_events = merge_actuator_events(*spliced_schedules)
+    schedules_for_sampler = new_schedules_for_sampler
+    # the next reload compares the files with the new running schedule
+    sampler_runtime.read_schedule = partial(read_new_schedules_and_configuration, usb, ID_number, logger,
+                                            schedules_for_sampler, validation_workers)
+    scheduler.set_actuator_events(actuator_events, sampler)
+    if scheduler.get_next_event() is None:
+        logger.error("main.py: no current pump or valve events to execute, exiting the program")
+    return diode
+
+
+if __name__ == "__main__":
+    # create logger object for logging events and errors
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    file_path = "/home/pi/Desktop/sampler_logs/" + current_time + ".log"
+    logger = logging.getLogger("main logger")
+    logging.basicConfig(format="%(asctime)s %(message)s",
+                        filemode="w",
+                        level=logging.DEBUG)
+    file_handler = logging.FileHandler(file_path)
+    logger.addHandler(file_handler)
+    # the log contains summaries of large schedules, set to True to write complete schedules to a separate file
+    write_complete_schedules = False
+    if write_complete_schedules:
+        schedule_log.enable_full_schedule_dumps("/home/pi/Desktop/sampler_logs/" + current_time + "_schedules.log")
+    # how the sample in progress when the program starts (e.g. after the Pi lost power) is handled, "resume" fills the
+    # bag until its stop time, "truncate" ends the sample and "skip" also skips bags whose pump should already be on
+    interrupted_sample_policy = "resume"
+    # pump and valve pins are only written when their state changes, set to a number of seconds to also write the state
+    # again periodically, e.g. if a glitch on the GPIO pins is suspected
+    actuator_reconcile_interval = None
+    # maximum number of processes that validate a schedule file. Files smaller than
+    # `SamplerSchedule._min_parallel_file_size` (8 MB) are always validated by one process, only larger files are split
+    # between the processes. Parallel validation was only measured on a single core, where it is slower, so run
+    # `schedule_benchmark.py validation` on the Pi before raising it
+    validation_workers = 1
+
+    logger.info("main.py: program started")
+
+    disable_gpio_warnings()
+    reset_gpio_pins()
+
+    # handle uncaught exception and safely exit the program
+    sys.excepthook = log_uncaught_exception
+
+    # get ID number of sampler from the `.ID.txt` file
+    path_to_ID_number_file = "/home/pi/.ID.txt"
+    with open(path_to_ID_number_file, "r") as file:
+        content = file.read()
+    ID_number = int(content)
+    logger.info("main.py: set ID number of sampler to {}".format(str(ID_number)))
+
+    # GPIO pins of the pump, the valves and the diode from the hardware configuration file on the SD card, the pins
+    # don't change when another USB drive is inserted
+    path_to_hardware_configuration_file = "/home/pi/.hardware_configuration.txt"
+    hardware_configuration = HardwareConfiguration(path_to_hardware_configuration_file, logger)
+
+    # journal of executed actuator events on the SD card, its last checkpoint shows the state of the sampler when the
+    # program stopped (e.g. when the Pi lost power)
+    path_to_checkpoint_journal = "/home/pi/." + str(ID_number) + "_checkpoint.bin"
+    last_checkpoint = read_last_checkpoint(path_to_checkpoint_journal)
+    if last_checkpoint is not None:
+        logger.info("main.py: checkpoint before the program started: {}".format(last_checkpoint.get_summary()))
+    # the reset of the GPIO pins above isn't journaled, so the last checkpoint keeps showing the state when the program
+    # stopped until the resumed events are executed, and the sample is resumed the same way if the Pi loses power again
+    checkpoint_journal = CheckpointJournal(path_to_checkpoint_journal, logger)
+
+    # wait for USB to be inserted
+    usb = USB_drive(logger)
+    while True:
+        if usb.is_inserted():
+            actuator_events, sampler, diode, schedules_for_sampler = \
+                update_schedules_and_configuration(usb, ID_number, logger, hardware_configuration,
+                                                   interrupted_sample_policy, last_checkpoint, validation_workers)
+            break
+        time.sleep(1)
+
+    if last_checkpoint is not None:
+        schedule_log.log_schedule(logger, "main.py: bags scheduled to start filling while the program wasn't running",
+                                  schedules_for_sampler.get_bag_schedule_between(last_checkpoint.get_event_time(),
+                                                                                 datetime.now()).iter_bag_events(),
+                                  lambda bag_event: [bag_event.get_bag_number(), str(bag_event.get_bag_time_on())])
+
+    # execute the actuator events at their times, the scheduler sleeps until the next event is due. The runtime turns
+    # the diode on to indicate schedule and configuration file were read correctly and wakes the scheduler up when usb
+    # is reinserted
+    scheduler = Scheduler(actuator_events, sampler, logger, actuation_latency=ActuationLatency(logger),
+                          checkpoint_journal=checkpoint_journal)
+    sampler_runtime = SamplerRuntime(scheduler, usb, diode, logger,
+                                     partial(read_new_schedules_and_configuration, usb, ID_number, logger,
+                                             schedules_for_sampler, validation_workers),
+                                     swap_schedules_and_configuration)
+    sampler_runtime.reconcile_interval = actuator_reconcile_interval
+    reason = asyncio.run(sampler_runtime.run())
+    if reason == "finished":
         logger.info("main.py: program finished executing the schedule")
         turn_Pi_off()
-    # run the while loop once a second
-    time.sleep(1)
-    
\ No newline at end of file
+    else:
+        logger.info("main.py: program stopped before finishing the schedule")
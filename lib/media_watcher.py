@@ -0,0 +1,154 @@
+"""
+Package for watching the folder where USB drives are mounted with the Linux inotify interface. The kernel reports when a
+folder is created or removed in the watched folder, so insertions are noticed without listing the folder periodically.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+
+# flags from <sys/inotify.h>
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+_EVENT_HEADER = struct.Struct("iIII")
+_READ_SIZE = 4096
+
+# `ctypes.CDLL` object of the C library, loaded by the first `MediaWatcher` because finding the library starts a
+# process, or the `OSError` raised when inotify isn't available
+_libc = None
+
+class MediaWatcher():
+    """
+    Class for receiving the names of folders created or removed in one folder, e.g. "/media/pi". The file descriptor
+    is non-blocking and can be registered with an asyncio event loop (`loop.add_reader`).
+
+    The kernel removes the watch when the watched folder is deleted or unmounted, after that no events are received.
+    `is_watching` returns False from then on, and a new object has to be created to watch the folder again.
+    """
+    __slots__ = ["path", "logger", "file_descriptor", "watching"]
+
+    def __init__(self, path, logger):
+        """
+        :param path: string representing the path to the watched folder
+        :param logger: `logging.Logger` object used for logging actions of the object
+        :raise OSError: when inotify isn't available (e.g. not on Linux) or the folder can't be watched
+        """
+        self.set_logger(logger)
+        self.path = path
+        self.file_descriptor = None
+        self.watching = False
+        libc = _load_libc()
+        file_descriptor = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if file_descriptor < 0:
+            raise _get_os_error(path)
+        mask = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF
+        if libc.inotify_add_watch(file_descriptor, os.fsencode(path), mask) < 0:
+            error = _get_os_error(path)
+            os.close(file_descriptor)
+            raise error
+        self.file_descriptor = file_descriptor
+        self.watching = True
+        self.logger.info("media_watcher.py: watching {} with inotify".format(path))
+
+    def set_logger(self, logger):
+        """
+        :param logger: `logging.Logger` object used for logging actions of the object
+        """
+        assert(isinstance(logger, logging.Logger))
+        self.logger = logger
+
+    def fileno(self):
+        """
+        :return: integer representing the inotify file descriptor
+        """
+        return self.file_descriptor
+
+    def is_watching(self):
+        """
+        :return: True until the kernel removed the watch (e.g. the watched folder was deleted), otherwise False
+        """
+        return self.watching
+
+    def read_changes(self):
+        """
+        Reads all pending events without blocking.
+        :return: list of tuples (string "inserted" or "removed", folder name), the folder name is None if events were
+        lost and the watched folder has to be listed again
+        """
+        changes = []
+        while True:
+            try:
+                buffer = os.read(self.file_descriptor, _READ_SIZE)
+            except BlockingIOError:
+                return changes
+            offset = 0
+            while offset < len(buffer):
+                _, mask, _, name_length = _EVENT_HEADER.unpack_from(buffer, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(buffer[offset:offset + name_length].rstrip(b"\0"))
+                offset += name_length
+                if mask & (IN_DELETE_SELF | IN_IGNORED):
+                    if self.watching:
+                        self.logger.warning("media_watcher.py: the watch of {} was removed".format(self.path))
+                    self.watching = False
+                if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_IGNORED):
+                    changes.append(("removed", None))
+                elif mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    changes.append(("inserted", name))
+                elif mask & IN_ISDIR and mask & (IN_DELETE | IN_MOVED_FROM):
+                    changes.append(("removed", name))
+
+    def close(self):
+        if self.file_descriptor is not None:
+            os.close(self.file_descriptor)
+            self.file_descriptor = None
+
+def _load_libc():
+    """
+    Loads the C library once, later calls return the same object or raise the same error.
+    :return: `ctypes.CDLL` object of the C library with the inotify functions
+    :raise OSError: when the C library doesn't provide inotify
+    """
+    global _libc
+    if _libc is None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            if not hasattr(libc, "inotify_init1"):
+                raise OSError(errno.ENOSYS, "inotify is not available")
+            libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+            _libc = libc
+        except OSError as error:
+            _libc = error
+    if isinstance(_libc, OSError):
+        raise _libc
+    return _libc
+
+def _get_os_error(path):
+    """
+    :param path: string representing the path that the failed call used
+    :return: `OSError` object created from the `errno` of the last C library call
+    """
+    error_number = ctypes.get_errno()
+    return OSError(error_number, os.strerror(error_number), path)
+
+
+if __name__ == "__main__":
+    import select
+    import sys
+    logging.basicConfig(format="%(asctime)s %(message)s", level=logging.DEBUG)
+    media_watcher = MediaWatcher(sys.argv[1] if len(sys.argv) > 1 else "/media/pi", logging.getLogger("logger"))
+    while True:
+        select.select([media_watcher], [], [])
+        print(media_watcher.read_changes())
@@ -0,0 +1,67 @@
+"""
+Store the result of parsing a schedule file together with the identity of the file it was parsed from.
+"""
+
+import hashlib
+import os
+
+class ParsedSchedule():
+    """
+    Class for storing the sorted, validated bag schedule parsed from a schedule file together with the identity of the
+    file (path, size, modification time and content hash). The object is immutable, so it can be shared by all
+    `SamplerSchedule` objects reading the same version of the file. Pump intervals depend on the pump parameters of
+    each `SamplerSchedule` object and are stored separately.
+    """
+    __slots__ = ["file_path", "file_size", "file_mtime", "content_hash", "bag_schedule"]
+
+    def __init__(self, file_path, file_size, file_mtime, content_hash, bag_schedule):
+        """
+        :param file_path: string representing the path to the schedule file
+        :param file_size: integer representing the size of the schedule file in bytes
+        :param file_mtime: integer representing the modification time of the schedule file in nanoseconds
+        :param content_hash: string representing the hexadecimal SHA-256 digest of the schedule file
+        :param bag_schedule: `ColumnarSchedule` object sorted by the time the bags start filling
+        """
+        for name, value in zip(self.__slots__, (file_path, file_size, file_mtime, content_hash, bag_schedule)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ParsedSchedule objects can't be changed")
+
+    def __delattr__(self, name):
+        raise AttributeError("ParsedSchedule objects can't be changed")
+
+    def get_bag_schedule(self):
+        """
+        :return: `ColumnarSchedule` object sorted by the time the bags start filling
+        """
+        return self.bag_schedule
+
+    def get_content_hash(self):
+        """
+        :return: string representing the hexadecimal SHA-256 digest of the schedule file
+        """
+        return self.content_hash
+
+    @staticmethod
+    def hash_file(file_path, block_size=1 << 16):
+        """
+        Computes the content hash of a file without loading the whole file into memory.
+        :param file_path: string representing the path to the file
+        :param block_size: integer representing the number of bytes read at once
+        :return: string representing the hexadecimal SHA-256 digest of the file
+        """
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for block in iter(lambda: file.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+
+if __name__ == "__main__":
+    file_path = "../tests/valid_schedule.txt"
+    file_stat = os.stat(file_path)
+    parsed_schedule = ParsedSchedule(file_path, file_stat.st_size, file_stat.st_mtime_ns,
+                                     ParsedSchedule.hash_file(file_path), None)
+    print("Content hash: ", parsed_schedule.get_content_hash())
+    print("Matches file: ", parsed_schedule.get_content_hash() == ParsedSchedule.hash_file(file_path))
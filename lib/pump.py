@@ -2,7 +2,7 @@
 Package for pump.
 """
 
-import RPi.GPIO as GPIO
+from gpio_backend import GPIO
 import time
 import logging
 
@@ -12,6 +12,9 @@ import validate
 class Pump():
     """
     Class for setting a pump.
+
+    The state of the pump is cached, so turning on a pump that is on or turning off a pump that is off doesn't write the
+    GPIO pin. The state is unknown (None) until the pin is written for the first time.
     """
     __slots__ = ["pump_pin_number", "pump_on", "mode", "logger"]
 
@@ -48,21 +51,37 @@ class Pump():
         Sets the specified GPIO pin as an output pin.
         """
         GPIO.setup(self.pump_pin_number, GPIO.OUT)
-        self.pump_on = False
+        self.pump_on = None
 
     def start_pumping(self):
+        """
+        :return: float representing the time of `time.monotonic()` when the GPIO pin was written, or None if the pump
+        was already on and the pin wasn't written
+        """
+        if self.pump_on == True:
+            return None
         GPIO.output(self.pump_pin_number, 1)
+        write_time = time.monotonic()
         self.pump_on = True
         self.logger.info("pump.py: pump started pumping")
+        return write_time
 
     def stop_pumping(self):
+        """
+        :return: float representing the time of `time.monotonic()` when the GPIO pin was written, or None if the pump
+        was already off and the pin wasn't written
+        """
+        if self.pump_on == False:
+            return None
         GPIO.output(self.pump_pin_number, 0)
+        write_time = time.monotonic()
         self.pump_on = False
         self.logger.info("pump.py: pump stopped pumping")
+        return write_time
 
     def is_pumping(self):
         """
-        :return: True when the pump is pumping, False when pump is not pumping
+        :return: True when the pump is pumping, False when pump is not pumping, None when the state is unknown
         """
         return self.pump_on
 
@@ -52,6 +52,30 @@ class PumpEvent():
         """
         return (self.pump_time, self.pump_action)
 
+    def get_time(self):
+        """
+        :return: `datetime` object representing the time when the event takes place, common to all actuator events
+        """
+        return self.pump_time
+
+    def get_action(self):
+        """
+        :return: string representing the action of the event, common to all actuator events
+        """
+        return self.pump_action
+
+    def execute(self, sampler):
+        """
+        Turns the pump on or off.
+        :param sampler: `Sampler` object
+        :return: float representing the time of `time.monotonic()` when the GPIO pin was written, or None if the sampler
+        doesn't report it
+        """
+        if self.pump_action == "turn pump on":
+            return sampler.turn_pump_on()
+        else:
+            return sampler.turn_pump_off()
+
     def print_pump_event(self):
         print(self.pump_time, "\t", self.pump_action)
 
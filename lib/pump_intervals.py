@@ -0,0 +1,161 @@
+"""
+Store intervals when the pump is on.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+from pump_event import *
+from event_times import *
+import schedule_time
+
+def merge_pump_intervals(bag_times, start_before, stop_after, off_time_tolerance):
+    """
+    Creates intervals when the pump is on one at a time, so the bag events don't have to be held in memory. The pump
+    starts `start_before` milliseconds before a bag starts filling and stops `stop_after` milliseconds after the bag
+    stops filling. Intervals that overlap or are separated by at most `off_time_tolerance` milliseconds are merged.
+    :param bag_times: iterable of tuples of integers representing the times the bags start and stop filling, sorted by
+    the time the bags start filling
+    :param start_before: integer representing the number of milliseconds the pump starts before the valve opens
+    :param stop_after: integer representing the number of milliseconds the pump keeps pumping after the valve closes
+    :param off_time_tolerance: integer representing the number of milliseconds. If pump is supposed to turn off for
+    less than specified number of milliseconds, it will continue pumping.
+    :return: generator of tuples of integers representing the times the pump turns on and off
+    """
+    merged_time_on = merged_time_off = None
+    for start_time, stop_time in bag_times:
+        time_on = start_time - start_before
+        time_off = stop_time + stop_after
+        if merged_time_off is not None and time_on - merged_time_off <= off_time_tolerance:
+            merged_time_off = max(merged_time_off, time_off)
+            continue
+        if merged_time_off is not None:
+            yield merged_time_on, merged_time_off
+        merged_time_on, merged_time_off = time_on, time_off
+    if merged_time_off is not None:
+        yield merged_time_on, merged_time_off
+
+class PumpIntervals():
+    """
+    Class for storing sorted, non-overlapping intervals when the pump is on as two columns of integers representing the
+    times the pump turns on and off in milliseconds since `schedule_time.SCHEDULE_EPOCH`. Every interval produces two
+    pump events, "turn pump on" and "turn pump off", so the events are numbered 0, 1, ... in time order.
+
+    Views created by `view` share the columns with the original object, so taking part of a schedule doesn't copy it.
+    """
+    __slots__ = ["times_on", "times_off", "first_time_on"]
+
+    def __init__(self, times_on, times_off, first_time_on=None):
+        """
+        :param times_on: column of integers representing the times the pump turns on
+        :param times_off: column of integers representing the times the pump turns off
+        :param first_time_on: integer representing the time the pump turns on in the first interval, or None to use the
+        first item of `times_on`. It is used when the schedule starts in the middle of an interval.
+        """
+        assert(len(times_on) == len(times_off))
+        if isinstance(times_on, array):
+            times_on, times_off = memoryview(times_on).toreadonly(), memoryview(times_off).toreadonly()
+        self.times_on = times_on
+        self.times_off = times_off
+        self.first_time_on = first_time_on
+
+    def __len__(self):
+        return len(self.times_on)
+
+    def is_complete(self):
+        """
+        :return: True if the times of all intervals are stored in the columns, False if the first interval starts at
+        `self.first_time_on`
+        """
+        return self.first_time_on is None
+
+    def get_time_on(self, index):
+        """
+        :param index: integer representing the position of the interval
+        :return: integer representing the time the pump turns on
+        """
+        if index == 0 and self.first_time_on is not None:
+            return self.first_time_on
+        return int(self.times_on[index])
+
+    def get_time_off(self, index):
+        """
+        :param index: integer representing the position of the interval
+        :return: integer representing the time the pump turns off
+        """
+        return int(self.times_off[index])
+
+    def view(self, first, last=None, first_time_on=None):
+        """
+        :param first: integer representing the position of the first interval in the view
+        :param last: integer representing the position after the last interval in the view, or None for all intervals
+        :param first_time_on: integer representing the time the pump turns on in the first interval of the view, or None
+        :return: `PumpIntervals` object sharing the columns with this object
+        """
+        if last is None:
+            last = len(self)
+        if first_time_on is None and first == 0 and self.first_time_on is not None and last > 0:
+            first_time_on = self.first_time_on
+        return PumpIntervals(self.times_on[first:last], self.times_off[first:last], first_time_on)
+
+    def get_intervals_starting_at(self, time_on):
+        """
+        Creates intervals when the pump is on for the part of the schedule that starts at `time_on`. The first interval
+        is the interval containing `time_on`, but it starts at `time_on`.
+        :param time_on: integer representing the time the pump turns on for one of the bag events of the schedule
+        :return: `PumpIntervals` object sharing the columns with this object
+        """
+        index = bisect_right(EventTimes(len(self), self.get_time_on), time_on) - 1
+        assert(index >= 0)
+        return self.view(index, first_time_on=time_on)
+
+    def get_event_time(self, event_index):
+        """
+        :param event_index: integer representing the position of the pump event
+        :return: integer representing the time of the pump event
+        """
+        if event_index % 2:
+            return self.get_time_off(event_index // 2)
+        return self.get_time_on(event_index // 2)
+
+    def get_event_times(self):
+        """
+        :return: `EventTimes` object representing the sorted times of all pump events
+        """
+        return EventTimes(2 * len(self), self.get_event_time)
+
+    def get_event_index_after(self, time):
+        """
+        :param time: integer representing a time in milliseconds
+        :return: integer representing the position of the first pump event after `time`
+        """
+        return bisect_right(self.get_event_times(), time)
+
+    def get_event_index_range(self, start_time, stop_time):
+        """
+        :param start_time: integer representing the start of the time window in milliseconds (included)
+        :param stop_time: integer representing the end of the time window in milliseconds (excluded)
+        :return: tuple of integers representing the position of the first pump event in the window and the position
+        after the last pump event in the window
+        """
+        event_times = self.get_event_times()
+        return bisect_left(event_times, start_time), bisect_left(event_times, stop_time)
+
+    def iter_pump_events(self, first_event=0, last_event=None):
+        """
+        :param first_event: integer representing the position of the first pump event
+        :param last_event: integer representing the position after the last pump event, or None for all events
+        :return: generator of `PumpEvent` objects
+        """
+        if last_event is None:
+            last_event = 2 * len(self)
+        for event_index in range(first_event, last_event):
+            yield PumpEvent(schedule_time.milliseconds_to_datetime(self.get_event_time(event_index)),
+                            "turn pump off" if event_index % 2 else "turn pump on")
+
+
+if __name__ == "__main__":
+    pump_intervals = PumpIntervals(array("q", [100, 300]), array("q", [200, 400]))
+    [event.print_pump_event() for event in pump_intervals.iter_pump_events()]
+    print("Events in [150, 350): ", pump_intervals.get_event_index_range(150, 350))
+    [event.print_pump_event() for event in pump_intervals.get_intervals_starting_at(150).iter_pump_events()]
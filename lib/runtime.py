@@ -0,0 +1,323 @@
+"""
+Package for running the subsystems of the sampler as asyncio tasks in one thread.
+"""
+
+from datetime import datetime
+import asyncio
+import logging
+import os
+import signal
+
+from diode_driver import *
+import settings
+
+class SamplerRuntime():
+    """
+    Class for running the sampler. Actuator dispatch, USB drive watching, the status diode patterns, the GPS reader, log
+    flushing and the export of actuation latencies run as asyncio tasks in one thread, so they wait for their next
+    action instead of polling in threads.
+
+    When the USB drive is reinserted, the new files are read and validated in a worker thread while the running
+    schedule keeps being executed. The new actuator events replace the running ones between two events only after the
+    files were read successfully, so an invalid file on the USB drive never stops the sampling in progress.
+
+    A background task that raises an exception (e.g. watching the USB drive or syncing the checkpoint journal) is
+    logged and stops the runtime, so the sampler never keeps running with a subsystem that silently stopped.
+
+    When the runtime stops for any reason (the schedule is finished, the program is stopped or a task raised an
+    exception), all other tasks are cancelled and the GPIO pins are left in a safe state: the pump is off and all
+    valves are closed. Only a finished schedule is journaled with the actuators off, after any other stop the last
+    checkpoint still shows the sample in progress, so the next start handles it by its interrupted sample policy.
+    """
+    __slots__ = ["scheduler", "usb", "diode", "diode_driver", "logger", "read_schedule", "swap_schedule", "gps",
+                 "reload_task", "reload_pending", "task_descriptions", "usb_poll_interval",
+                 "log_flush_interval", "gps_read_interval", "latency_export_interval", "checkpoint_sync_interval",
+                 "reconcile_interval"]
+
+    def __init__(self, scheduler, usb, diode, logger, read_schedule, swap_schedule, gps=None):
+        """
+        :param scheduler: `Scheduler` object that executes the actuator events
+        :param usb: `USB_drive` object
+        :param diode: `Diode` object that indicates the state of the sampler
+        :param logger: `logging.Logger` object used for logging actions of the object
+        :param read_schedule: function without arguments that is called in a worker thread after the USB drive was
+        reinserted. It reads and validates the new files without using GPIO pins and raises an exception if they are
+        invalid.
+        :param swap_schedule: function that is called with the value returned by `read_schedule` in the thread of the
+        event loop. It updates the actuator events of `scheduler` and returns the new `Diode` object. It may replace
+        `read_schedule`, e.g. to compare the next files with the new schedule.
+        :param gps: `GPS` object or None if the position isn't logged
+        """
+        self.set_logger(logger)
+        self.scheduler = scheduler
+        self.usb = usb
+        self.diode = diode
+        # created by `run` in the thread of the event loop
+        self.diode_driver = None
+        self.read_schedule = read_schedule
+        self.swap_schedule = swap_schedule
+        self.gps = gps
+        self.reload_task = None
+        self.reload_pending = False
+        # descriptions of the running background tasks used in log messages, keyed by the `asyncio.Task` objects
+        self.task_descriptions = {}
+        self.usb_poll_interval = 1
+        self.log_flush_interval = 60
+        self.gps_read_interval = 600
+        self.latency_export_interval = 3600
+        self.checkpoint_sync_interval = 5
+        # None disables re-asserting the actuator state, the pins are then only written when the state changes
+        self.reconcile_interval = None
+
+    def set_logger(self, logger):
+        """
+        :param logger: `logging.Logger` object used for logging actions of the object
+        """
+        assert(isinstance(logger, logging.Logger))
+        self.logger = logger
+
+    async def run(self):
+        """
+        Runs the sampler until the schedule is finished or the program is stopped by SIGTERM or SIGINT.
+        :return: string representing the reason why the runtime stopped, "finished" or "shutdown"
+        """
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signal_number, self.scheduler.request_shutdown)
+        self.diode_driver = DiodeDriver(self.diode, self.logger)
+        self.__show_diode_light()
+        self.__start_task(self.diode_driver.run(), "the status diode")
+        self.__start_task(self.__watch_usb(), "watching the USB drive")
+        self.__start_task(self.__flush_logs(), "flushing the log files")
+        if self.gps is not None:
+            self.__start_task(self.__read_gps(), "reading the geographic position")
+        if self.scheduler.actuation_latency is not None:
+            self.__start_task(self.__export_latencies(), "exporting the actuation latencies")
+        if self.scheduler.checkpoint_journal is not None:
+            self.__start_task(self.__sync_checkpoints(), "syncing the checkpoint journal")
+        if self.reconcile_interval is not None:
+            self.__start_task(self.__reconcile_actuators(), "reconciling the actuators")
+        reason = None
+        try:
+            reason = await self.__dispatch_actuator_events()
+            self.logger.info("runtime.py: runtime stopped ({})".format(reason))
+            return reason
+        finally:
+            if self.reload_task is not None:
+                # reading the files of a large schedule can take many seconds, the files are abandoned instead of
+                # waiting for them with the pump possibly on. The worker thread finishes in the background.
+                self.task_descriptions[self.reload_task] = "reloading the schedule"
+            await self.__cancel_tasks()
+            for signal_number in (signal.SIGTERM, signal.SIGINT):
+                loop.remove_signal_handler(signal_number)
+            self.__leave_gpio_pins_safe(reason == "finished")
+            if self.scheduler.actuation_latency is not None:
+                self.scheduler.actuation_latency.log_histograms()
+
+    def __start_task(self, coroutine, description):
+        """
+        Runs `coroutine` as a background task that stops the runtime if it raises an exception.
+        :param coroutine: coroutine object that runs until it is cancelled
+        :param description: string describing the task in log messages
+        """
+        task = asyncio.ensure_future(coroutine)
+        task.add_done_callback(self.__stop_on_task_failure)
+        self.task_descriptions[task] = description
+
+    def __stop_on_task_failure(self, task):
+        """
+        Logs the exception of a background task that failed and requests the scheduler to shut down.
+        :param task: `asyncio.Task` object that is done
+        """
+        if task.cancelled() or task.exception() is None:
+            return
+        self.logger.error("runtime.py: {} failed, stopping the runtime".format(self.task_descriptions[task]),
+                          exc_info=task.exception())
+        self.scheduler.request_shutdown()
+
+    async def __cancel_tasks(self):
+        """
+        Cancels the background tasks that are still running, waits until they finish and logs the exceptions they
+        raised while being cancelled. Tasks that failed earlier were already logged by `__stop_on_task_failure`.
+        """
+        running_tasks = [task for task in self.task_descriptions if not task.done()]
+        for task in running_tasks:
+            task.remove_done_callback(self.__stop_on_task_failure)
+            task.cancel()
+        results = await asyncio.gather(*running_tasks, return_exceptions=True)
+        for task, result in zip(running_tasks, results):
+            if isinstance(result, Exception):
+                self.logger.error("runtime.py: {} failed while stopping".format(self.task_descriptions[task]),
+                                  exc_info=result)
+        self.task_descriptions.clear()
+
+    async def __dispatch_actuator_events(self):
+        """
+        Executes actuator events with `self.scheduler` and starts reloading the schedule whenever the USB drive is
+        reinserted.
+        :return: string representing the reason why the scheduler stopped, "finished" or "shutdown"
+        """
+        while True:
+            reason = await self.scheduler.run_async()
+            if reason != "reload":
+                return reason
+            if self.reload_task is None:
+                self.reload_task = asyncio.ensure_future(self.__reload_schedule())
+            else:
+                # the USB drive was reinserted while its files were read, read them again afterwards
+                self.reload_pending = True
+
+    async def __reload_schedule(self):
+        """
+        Reads the files on the reinserted USB drive in a worker thread and swaps the actuator events if they are valid.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                self.reload_pending = False
+                try:
+                    new_schedule = await loop.run_in_executor(None, self.read_schedule)
+                except Exception as exception:
+                    self.logger.error("runtime.py: the files on the USB drive are invalid, the running schedule keeps "
+                                      "running: {}".format(exception))
+                else:
+                    if not self.reload_pending:
+                        self.__swap_schedule(new_schedule)
+                if not self.reload_pending:
+                    return
+        finally:
+            self.reload_task = None
+
+    def __swap_schedule(self, new_schedule):
+        """
+        Replaces the running actuator events. The scheduler doesn't execute an event until this method returns, so the
+        swap is atomic.
+        :param new_schedule: value returned by `self.read_schedule`
+        """
+        try:
+            diode = self.swap_schedule(new_schedule)
+        except Exception as exception:
+            self.logger.exception("runtime.py: applying the new schedule and configuration failed, the running "
+                                  "schedule keeps running: {}".format(exception))
+            return
+        self.diode = diode
+        self.diode_driver.set_diode(diode)
+        self.logger.info("runtime.py: schedule and configuration reloaded")
+        self.__show_diode_light()
+
+    def __show_diode_light(self):
+        """
+        Turns the diode on for its light duration to indicate that the schedule and configuration files were read.
+        """
+        self.diode_driver.play(solid_pattern(self.diode.get_diode_light_duration_in_seconds()))
+
+    async def __watch_usb(self):
+        """
+        Wakes up the scheduler to reload the schedule when the USB drive is reinserted.
+        """
+        await self.usb.watch_async(self.scheduler.request_reload, self.__log_usb_removal, self.usb_poll_interval)
+
+    def __log_usb_removal(self):
+        self.logger.info("runtime.py: USB drive removed, the current schedule keeps running")
+
+    async def __flush_logs(self):
+        """
+        Periodically writes the log files to the SD card, so at most `log_flush_interval` seconds of log messages are
+        lost when the Pi loses power.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.log_flush_interval)
+            await loop.run_in_executor(None, flush_log_files, self.logger)
+
+    async def __read_gps(self):
+        """
+        Periodically logs the geographic position. Reading the serial port blocks, so it is done in a worker thread.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                position = await loop.run_in_executor(None, self.gps.get_geographic_position)
+                self.logger.info("runtime.py: geographic position {}".format(position.get_coordinates_and_time()))
+            except Exception as exception:
+                self.logger.warning("runtime.py: reading geographic position failed: {}".format(exception))
+            await asyncio.sleep(self.gps_read_interval)
+
+    async def __export_latencies(self):
+        """
+        Periodically logs the histograms of actuation latencies recorded by the scheduler.
+        """
+        while True:
+            await asyncio.sleep(self.latency_export_interval)
+            self.scheduler.actuation_latency.log_histograms()
+
+    async def __sync_checkpoints(self):
+        """
+        Syncs the checkpoint journal to the SD card at most every `checkpoint_sync_interval` seconds and only if events
+        were executed, so events executed at about the same time are synced together.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.checkpoint_sync_interval)
+            if self.scheduler.checkpoint_journal.has_unsynced_records():
+                await loop.run_in_executor(None, self.scheduler.checkpoint_journal.sync)
+
+    async def __reconcile_actuators(self):
+        """
+        Periodically writes the cached state of the pump and the valves to their GPIO pins again. It runs between two
+        actuator events in the thread of the event loop, so it never delays or races with an event.
+        """
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            self.scheduler.sampler.reconcile()
+
+    def __leave_gpio_pins_safe(self, finished):
+        """
+        Turns the pump off, closes all valves and turns the diode off, and syncs the checkpoint journal.
+        :param finished: True if the schedule is finished, the state of the actuators is then recorded in the
+        checkpoint journal. Otherwise the sample in progress isn't journaled as finished, so it can be resumed.
+        """
+        try:
+            self.scheduler.sampler.turn_pump_off()
+            self.scheduler.sampler.close_all_valves()
+            self.diode.turn_diode_off()
+        finally:
+            settings.reset_gpio_pins()
+            if self.scheduler.checkpoint_journal is not None:
+                if finished:
+                    self.scheduler.checkpoint_journal.record_actuators_off(datetime.now())
+                self.scheduler.checkpoint_journal.sync()
+
+def flush_log_files(logger):
+    """
+    Flushes the file handlers of `logger` and of the root logger and forces the files to be written to the disk.
+    :param logger: `logging.Logger` object
+    """
+    for handler in logger.handlers + logging.getLogger().handlers:
+        if isinstance(handler, logging.FileHandler) and handler.stream is not None:
+            handler.flush()
+            os.fsync(handler.stream.fileno())
+
+async def blink_until_reinserted(usb, diode, blink_interval=0.5):
+    """
+    Blinks the diode to indicate an error until a USB drive is reinserted or one of the tasks fails.
+    :param usb: `USB_drive` object
+    :param diode: `Diode` object
+    :param blink_interval: number of seconds the diode stays on and off
+    """
+    diode_driver = DiodeDriver(diode, diode.logger)
+    diode_driver.play(error_blink_pattern(blink_interval))
+    reinserted = asyncio.Event()
+    tasks = [asyncio.ensure_future(reinserted.wait()), asyncio.ensure_future(diode_driver.run()),
+             asyncio.ensure_future(usb.watch_async(reinserted.set))]
+    try:
+        # a failed task would leave the diode dark or the USB drive unwatched, the program is restarted instead of
+        # waiting for a reinsertion that is never noticed
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                diode.logger.error("runtime.py: blinking until the USB drive is reinserted failed", exc_info=result)
@@ -2,12 +2,13 @@
 Package for sampler that contains pump and valves.
 """
 
-import RPi.GPIO as GPIO
 import time
 import logging
 
 from pump import *
 from valve import *
+from valve_bank import *
+from gpio_backend import GPIO
 
 class Sampler():
     """
@@ -50,29 +51,78 @@ class Sampler():
         self.bag_to_valve_objects_dict = {}
         for bag in bag_to_valve_pin_numbers_dict.keys():
             self.bag_to_valve_objects_dict[bag] = Valve(bag_to_valve_pin_numbers_dict[bag], self.mode, self.logger)
+        self.valve_bank = ValveBank(self.bag_to_valve_objects_dict, self.mode, self.logger)
 
     def open_valve(self, bag_number):
         """
         Opens valve that controls bag with the specified `bag_number`.
         :param bag_number: integer representing a bag number
+        :return: float representing the time of `time.monotonic()` when the GPIO pin was written, or None if the valve
+        was already in that state
         """
-        self.bag_to_valve_objects_dict[bag_number].open_valve()
+        return self.bag_to_valve_objects_dict[bag_number].open_valve()
 
     def close_valve(self, bag_number):
         """
         Closes valve that controls bag with the specified `bag_number`.
         :param bag_number: integer representing a bag number
+        :return: float representing the time of `time.monotonic()` when the GPIO pin was written, or None if the valve
+        was already in that state
         """
-        self.bag_to_valve_objects_dict[bag_number].close_valve()
+        return self.bag_to_valve_objects_dict[bag_number].close_valve()
         
+    def has_same_pins(self, sampler):
+        """
+        :param sampler: `Sampler` object
+        :return: True if `sampler` controls the pump and the valves of the same bags through the same GPIO pins in the
+        same numbering mode, otherwise False
+        """
+        return self.mode == sampler.mode \
+            and self.pump.pump_pin_number == sampler.pump.pump_pin_number \
+            and {bag: valve.valve_pin_number for bag, valve in self.bag_to_valve_objects_dict.items()} \
+            == {bag: valve.valve_pin_number for bag, valve in sampler.bag_to_valve_objects_dict.items()}
+
+    def set_open_valves(self, bag_numbers):
+        """
+        Opens the valves of the bags in `bag_numbers` and closes all other valves with one GPIO call.
+        :param bag_numbers: iterable of integers representing bag numbers
+        :return: float representing the time of `time.monotonic()` when the GPIO pins were written, or None if no
+        valve changed
+        """
+        return self.valve_bank.apply_target_state(bag_numbers)
+
     def close_all_valves(self):
-        [valve.close_valve() for valve in self.bag_to_valve_objects_dict.values()]
+        """
+        Closes all valves that aren't known to be closed with one GPIO call.
+        :return: float representing the time of `time.monotonic()` when the GPIO pins were written, or None if no
+        valve changed
+        """
+        return self.valve_bank.close_all_valves()
 
     def turn_pump_on(self):
-        self.pump.start_pumping()
+        return self.pump.start_pumping()
 
     def turn_pump_off(self):
-        self.pump.stop_pumping()
+        return self.pump.stop_pumping()
+
+    def reconcile(self):
+        """
+        Writes the cached state of the pump and the valves to their GPIO pins again with one GPIO call, e.g. to correct
+        an output that was changed by a glitch. Pins whose state is unknown aren't written.
+        :return: float representing the time of `time.monotonic()` when the GPIO pins were written, or None if no
+        state is known
+        """
+        actuators = [(self.pump.pump_pin_number, self.pump.is_pumping())] \
+            + [(valve.valve_pin_number, valve.valve_is_open())
+               for _, valve in sorted(self.bag_to_valve_objects_dict.items())]
+        actuators = [(pin_number, state) for pin_number, state in actuators if state is not None]
+        if not actuators:
+            return None
+        GPIO.output([pin_number for pin_number, _ in actuators], [int(state) for _, state in actuators])
+        write_time = time.monotonic()
+        self.logger.debug("sampler.py: re-asserted state of GPIO numbers {} {}".format(
+            [pin_number for pin_number, _ in actuators], self.mode))
+        return write_time
 
 
 if __name__ == "__main__":
@@ -2,14 +2,202 @@
 Store information about sampler schedule.
 """
 
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from itertools import chain, islice
+import codecs
+import heapq
 import os
 import logging
+import re
+import struct
+import tempfile
 
 from pump_event import *
 from valve_event import *
 from bag_event import *
 from invalid_file_format_errors import *
+from parsed_schedule import *
+from columnar_schedule import *
+from schedule_diff import *
+from event_timeline import *
+import compiled_schedule
+import schedule_log
+import schedule_time
+
+# binary record (bag number, start time, stop time) used for sorted runs that are written to temporary files
+_RUN_RECORD = struct.Struct("<Hqq")
+# time in zero-padded `YYYY-MM-DD hh:mm:ss` format with optional milliseconds (`.f` to `.fff`), `datetime.strptime`
+# only accepts ASCII digits as well
+_ZERO_PADDED_TIME = re.compile(r"\s*(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d)(?:\.(\d{1,3}))?\s*", re.ASCII)
+# parts of a recurrence rule, e.g. `every 01:00:00` followed by `720 times` or `until 2020-04-05 11:00:00`
+_RECURRENCE_INTERVAL = re.compile(r"\s*every\s+(\d+):([0-5]\d):([0-5]\d)(?:\.(\d{1,3}))?\s*", re.ASCII)
+_RECURRENCE_COUNT = re.compile(r"\s*(\d+)\s+times?\s*", re.ASCII)
+_RECURRENCE_UNTIL = re.compile(r"\s*until\s+(.*)", re.ASCII)
+
+# ways of handling the sample that was interrupted when the sampler stopped, see `iter_resumed_actuator_events`
+INTERRUPTED_SAMPLE_POLICIES = ("resume", "truncate", "skip")
+
+# encodings in which a byte `\n` always ends a line, so the file can be split into chunks at any `\n` byte
+_CHUNKABLE_ENCODINGS = ("utf-8", "ascii")
+
+def _iter_chunk_lines(file_path, start, stop, encoding):
+    """
+    Reads the lines of a chunk of the schedule file one at a time. Line endings are translated the same way as when the
+    file is read in text mode.
+    :param file_path: string representing the path to the schedule file
+    :param start: integer representing the position of the first byte of the chunk, 0 or a byte after `\n`
+    :param stop: integer representing the position after the last byte of the chunk
+    :param encoding: string representing the encoding of the schedule file
+    :return: generator of strings representing the lines of the chunk without line endings
+    """
+    with open(file_path, "rb") as schedule_file:
+        schedule_file.seek(start)
+        position = start
+        while position < stop:
+            raw_line = schedule_file.readline(stop - position)
+            if not raw_line:
+                break
+            position += len(raw_line)
+            lines = raw_line.decode(encoding).replace("\r\n", "\n").replace("\r", "\n").split("\n")
+            if lines[-1] == "":
+                lines.pop()
+            yield from lines
+
+def _read_schedule_chunk(file_path, start, stop, encoding, run_folder):
+    """
+    Parses a chunk of the schedule file in a worker process and writes its bag records sorted by start time to a run
+    file, so neither the chunk nor its bag records are held in memory.
+    :param file_path: string representing the path to the schedule file
+    :param start: integer representing the position of the first byte of the chunk, 0 or a byte after `\n`
+    :param stop: integer representing the position after the last byte of the chunk
+    :param encoding: string representing the encoding of the schedule file
+    :param run_folder: string representing the path to the folder that the run file is created in
+    :return: tuple of the header (string, or None if the chunk doesn't start the file or the file is empty), the number
+    of lines in the chunk, list of tuples (line number in the chunk, line, message) of invalid lines, list of tuples
+    (line number in the chunk, line, recurrence rule) of lines with recurrence rules and string representing the path to
+    the run file
+    """
+    line_count = 0
+
+    def iter_numbered_lines():
+        nonlocal line_count
+        for line in _iter_chunk_lines(file_path, start, stop, encoding):
+            line_count += 1
+            yield line_count, line.strip()
+
+    numbered_lines = iter_numbered_lines()
+    header = None
+    if start == 0:
+        _, header = next(numbered_lines, (0, None))
+    invalid_lines, recurrence_rules = [], []
+    bag_records = SamplerSchedule.sort_bag_records(
+        SamplerSchedule.parse_bag_records(numbered_lines, invalid_lines, recurrence_rules),
+        SamplerSchedule._sort_run_length)
+    run_file_descriptor, run_file_path = tempfile.mkstemp(dir=run_folder)
+    with open(run_file_descriptor, "wb") as run_file:
+        _write_run(run_file, bag_records)
+    return header, line_count, invalid_lines, recurrence_rules, run_file_path
+
+def _write_run(run_file, bag_records, records_per_write=4096):
+    """
+    Writes bag records to a file as fixed-size binary records.
+    :param run_file: file object opened for writing in binary mode
+    :param bag_records: iterable of tuples (bag number, start time, stop time)
+    :param records_per_write: integer representing the number of records written to the file at once
+    """
+    bag_records = iter(bag_records)
+    for block in iter(lambda: list(islice(bag_records, records_per_write)), []):
+        run_file.write(b"".join(_RUN_RECORD.pack(*bag_record) for bag_record in block))
+
+def _read_run(run_file, records_per_read=4096):
+    """
+    :param run_file: file object of a file written by `_write_run` opened for reading in binary mode, it is closed
+    when all records were read
+    :param records_per_read: integer representing the number of records read from the file at once
+    :return: generator of tuples (bag number, start time, stop time) stored in `run_file`
+    """
+    with run_file:
+        for block in iter(lambda: run_file.read(_RUN_RECORD.size * records_per_read), b""):
+            yield from _RUN_RECORD.iter_unpack(block)
+
+def _iter_recurrence_rule(recurrence_rule):
+    """
+    :param recurrence_rule: tuple returned by `SamplerSchedule.convert_line_to_recurrence_rule`
+    :return: generator of tuples (bag number, start time, stop time) of the samples of `recurrence_rule` sorted by start
+    time
+    """
+    bag_number, time_on, time_off, interval, count = recurrence_rule
+    for occurrence in range(count):
+        yield bag_number, time_on + occurrence * interval, time_off + occurrence * interval
+
+def _collect_overlaps(bag_records, overlaps):
+    """
+    Passes bag records through and collects consecutive records that overlap.
+    :param bag_records: iterable of tuples (bag number, start time, stop time) sorted by start time
+    :param overlaps: list that tuples of two consecutive overlapping records are appended to
+    :return: generator of the records of `bag_records`
+    """
+    previous_record = None
+    for bag_record in bag_records:
+        if previous_record is not None and previous_record[2] > bag_record[1]:
+            overlaps.append((previous_record, bag_record))
+        previous_record = bag_record
+        yield bag_record
+
+def _format_bag_record(bag_record):
+    """
+    :param bag_record: tuple (bag number, start time, stop time) with times in milliseconds
+    :return: string representing the bag event in the format of the schedule file
+    """
+    bag_number, start_time, stop_time = bag_record
+    return BagEvent(bag_number, schedule_time.milliseconds_to_datetime(start_time),
+                    schedule_time.milliseconds_to_datetime(stop_time)).get_bag_event_as_string()
+
+def _get_sample_state(bag_number, start_time, last_checkpoint):
+    """
+    :param bag_number: integer representing the bag number of the sample whose valve should be open
+    :param start_time: integer representing the time the valve of the sample opens in milliseconds
+    :param last_checkpoint: `Checkpoint` object representing the last journaled event, or None
+    :return: string representing the state of the sample when the sampler stopped, "interrupted" if its valve was open
+    (or the state isn't known), "finished" if its valve was already closed or "not started" if its valve never opened
+    """
+    if last_checkpoint is None:
+        return "interrupted"
+    if schedule_time.datetime_to_milliseconds(last_checkpoint.get_event_time()) < start_time:
+        return "not started"
+    if last_checkpoint.get_open_bag_number() == bag_number:
+        return "interrupted"
+    return "finished"
+
+def _parse_time_with_strptime(time_string):
+    """
+    Parses a time from the schedule file with `datetime.strptime` after normalizing white spaces. It is the reference
+    for the fast path of `SamplerSchedule.convert_string_to_datetime`, which accepts exactly the same times.
+    :param time_string: string representing a time in format `YYYY-MM-DD hh:mm:ss` or `YYYY-MM-DD hh:mm:ss.fff`
+    :return: `datetime` object
+    """
+    time_string = " ".join(time_string.strip().split())
+    if "." not in time_string:
+        return datetime.strptime(time_string, "%Y-%m-%d %H:%M:%S")
+    time = datetime.strptime(time_string, "%Y-%m-%d %H:%M:%S.%f")
+    # `%f` accepts up to six decimal places, but the schedule has a precision of one millisecond
+    assert(len(time_string.rsplit(".", 1)[1]) <= 3)
+    return time
+
+def _format_bag_event(bag_event):
+    return [bag_event.get_bag_number(),
+            schedule_time.format_time(bag_event.get_bag_time_on()),
+            schedule_time.format_time(bag_event.get_bag_time_off())]
+
+def _format_valve_event(valve_event):
+    return [valve_event.get_valve_number(),
+            schedule_time.format_time(valve_event.get_valve_time()),
+            valve_event.get_valve_action()]
+
+def _format_pump_event(pump_event):
+    return [schedule_time.format_time(pump_event.get_pump_time()),
+            pump_event.get_pump_action()]
 
 class SamplerSchedule():
     """
@@ -27,18 +215,43 @@ class SamplerSchedule():
     ---------------------------------------------
     """
 
-    def __init__(self, file_path, pump_start_before, pump_end_after, pump_tolerance, logger, user_logger):
+    # `ParsedSchedule` objects shared by all `SamplerSchedule` objects, keyed by the path to the schedule file
+    _parsed_schedules = {}
+    # tuples (`ParsedSchedule` object, `PumpIntervals` object of its complete bag schedule) keyed by the path to the
+    # schedule file and the pump parameters, so objects with different pump parameters don't replace each other's
+    # pump intervals
+    _pump_intervals = {}
+    # maximum number of bag events sorted in memory at once, longer schedules are sorted in temporary files
+    _sort_run_length = 100000
+    # minimum number of bytes of the schedule file parsed by one worker process
+    _min_chunk_size = 1 << 20
+    # smaller schedule files are parsed by a single process whatever the number of validation workers. They are parsed
+    # in about two seconds, and extra workers slowed parsing down when they shared a core (see
+    # `schedule_benchmark.py validation`)
+    _min_parallel_file_size = 8 << 20
+    # maximum number of samples that all lines with recurrence rules are expanded to in total, a line bringing the total
+    # above it is reported as an invalid line
+    _max_repeated_samples = 1000000
+
+    def __init__(self, file_path, pump_start_before, pump_end_after, pump_tolerance, logger, user_logger,
+                 compiled_file_path=None, validation_workers=1):
         """
         :param file_path: string representing the path to the schedule file
         :param pump_start_before: `timedelta` object representing the number of seconds that the pump starts pumping
-        before the valve opens
+        before the valve opens, with a precision of one millisecond
         :param pump_end_after: `timedelta` object representing the number of seconds that the pump keeps pumping after
-        the valve closes
+        the valve closes, with a precision of one millisecond
         :param pump_tolerance: `timedelta` object representing the number of seconds. If pump is supposed to turn off
         for less than specified number of seconds, it will continue pumping.
         :param logger: `logging.Logger` object used for logging actions of the object
         :param user_logger: `logging.Logger` object used for logging invalid format of schedule file
         in a user-friendly way
+        :param compiled_file_path: string representing the path to the compiled schedule file or None. When the compiled
+        file was created from the current schedule file, it is opened with `mmap` instead of parsing the schedule file.
+        Otherwise it is (re)written after the schedule file is parsed.
+        :param validation_workers: integer representing the maximum number of processes that parse and validate the
+        schedule file. Files of at least `_min_parallel_file_size` bytes are split into chunks of at least
+        `_min_chunk_size` bytes that are parsed in parallel, smaller files are parsed by a single process.
         """
         self.set_logger(logger)
         self.set_user_logger(user_logger)
@@ -46,9 +259,16 @@ class SamplerSchedule():
         self.set_pump_timedelta_after_valve(pump_end_after)
         self.set_pump_off_time_tolerance(pump_tolerance)
         self.file_path = file_path
-        self.__read_bag_schedule()
-        self.__create_valve_schedule(self.complete_bag_schedule)
-        self.__create_pump_schedule(self.complete_bag_schedule)
+        self.compiled_file_path = compiled_file_path
+        assert(isinstance(validation_workers, int) and validation_workers >= 1)
+        self.validation_workers = validation_workers
+        self.parsed_schedule = None
+        self.__load_bag_schedule()
+        # the schedule that the object was created from. Other objects (e.g. for a reinserted USB drive) may reload the
+        # schedule file by the same path, so the running schedule is compared and spliced with the snapshot and never
+        # reloaded
+        self.snapshot_bag_schedule = self.bag_schedule
+        self.snapshot_pump_intervals = self.complete_pump_intervals
 
     def set_logger(self, logger):
         """
@@ -88,125 +308,379 @@ class SamplerSchedule():
         self.pump_off_time_tolerance = pump_tolerance
         self.logger.info("sampler_schedule.py: set pump time off tolerance to {}".format(self.pump_off_time_tolerance))
         
-    def __read_bag_schedule(self):
+    def __load_bag_schedule(self):
         """
-        Reads bag schedule from file and creates a list of `BagEvent` objects based on the schedule.
-        :param user_logger: `logging.Logger` object used for logging invalid format of schedule file
-        in a user-friendly way
+        Makes sure that `self.bag_schedule` and `self.complete_pump_intervals` reflect the current content of the
+        schedule file. The file is parsed only when its content hash doesn't match a previously parsed version of the
+        file. The hash is computed on every load, because the size and modification time of a file edited within the
+        time resolution of the file system (2 seconds on FAT formatted USB drives) may not change.
+        """
+        try:
+            file_stat = os.stat(self.file_path)
+            content_hash = ParsedSchedule.hash_file(self.file_path)
+        except OSError:
+            self.__log_missing_schedule_file()
+            raise ScheduleFileError(self.file_path, "Schedule file not found.")
+
+        parsed_schedule = SamplerSchedule._parsed_schedules.get(self.file_path)
+        if parsed_schedule is None or parsed_schedule.get_content_hash() != content_hash:
+            compiled = None
+            if self.compiled_file_path is not None:
+                compiled = compiled_schedule.read_compiled_schedule(self.compiled_file_path, self.file_path)
+            if compiled is not None and compiled[0].get_content_hash() == content_hash:
+                parsed_schedule, pump_parameters, pump_intervals = compiled
+                SamplerSchedule._pump_intervals[(self.file_path, pump_parameters)] = (parsed_schedule, pump_intervals)
+            else:
+                parsed_schedule = self.__read_bag_schedule(file_stat, content_hash)
+            SamplerSchedule._parsed_schedules[self.file_path] = parsed_schedule
+
+        if parsed_schedule is not self.parsed_schedule:
+            self.parsed_schedule = parsed_schedule
+            self.bag_schedule = parsed_schedule.get_bag_schedule()
+            self.complete_pump_intervals = self.__get_complete_pump_intervals()
+
+    def __get_complete_pump_intervals(self):
+        """
+        Returns the pump intervals of `self.parsed_schedule` for the pump parameters of this object. They are created
+        and written to the compiled schedule file only if no object with the same pump parameters created them yet.
+        :return: `PumpIntervals` object
+        """
+        key = (self.file_path, self.__get_pump_parameters())
+        cached = SamplerSchedule._pump_intervals.get(key)
+        if cached is not None and cached[0] is self.parsed_schedule:
+            return cached[1]
+        pump_intervals = self.__create_pump_intervals(0)
+        SamplerSchedule._pump_intervals[key] = (self.parsed_schedule, pump_intervals)
+        self.__write_compiled_schedule(pump_intervals)
+        return pump_intervals
+
+    def __write_compiled_schedule(self, pump_intervals):
+        """
+        Writes `self.parsed_schedule` to `self.compiled_file_path`. Failing to write the compiled schedule isn't an
+        error, the schedule file will be parsed again next time.
+        :param pump_intervals: `PumpIntervals` object of the complete bag schedule for the pump parameters of this
+        object
+        """
+        if self.compiled_file_path is None:
+            return
+        try:
+            compiled_schedule.write_compiled_schedule(self.compiled_file_path, self.parsed_schedule,
+                                                      self.__get_pump_parameters(), pump_intervals)
+        except OSError as error:
+            self.logger.warning("sampler_schedule.py: failed to write compiled schedule {}: {}"
+                                .format(self.compiled_file_path, error))
+
+    def __get_pump_parameters(self):
+        """
+        :return: tuple of integers representing the number of milliseconds the pump starts before the valve opens, the
+        number of milliseconds the pump keeps pumping after the valve closes and the pump time off tolerance
+        """
+        return (schedule_time.timedelta_to_milliseconds(self.pump_timedelta_before_valve),
+                schedule_time.timedelta_to_milliseconds(self.pump_timedelta_after_valve),
+                schedule_time.timedelta_to_milliseconds(self.pump_off_time_tolerance))
+
+    def __log_missing_schedule_file(self):
+        self.user_logger.info("SCHEDULE FILE")
+        self.user_logger.info("- Schedule file is missing. "
+                              "\n + Create a valid schedule file `{}` on the USB drive. "
+                              .format(self.file_path.split("/")[-1]))
+
+    def __read_bag_schedule(self, file_stat, content_hash):
+        """
+        Reads bag schedule from file and creates a `ParsedSchedule` object containing the sorted `ColumnarSchedule`
+        object based on the schedule. The bag events are sorted with an external merge sort and streamed to a compiled
+        schedule file together with the pump intervals for the pump parameters of this object. The columns are views of
+        the file mapped to memory, so the schedule is never held in memory as a whole.
+        :param file_stat: `os.stat_result` object of the schedule file
+        :param content_hash: string representing the content hash of the schedule file
+        :return: `ParsedSchedule` object
         """
-        self.complete_bag_schedule = []
         error_messages = []
 
         try:
-            with open(self.file_path) as schedule_file:
-                lines = [line.strip() for line in schedule_file]
+            schedule_file = open(self.file_path)
         except:
-            self.user_logger.info("SCHEDULE FILE")
-            self.user_logger.info("- Schedule file is missing. "
-                                  "\n + Create a valid schedule file `{}` on the USB drive. "
-                                  .format(self.file_path.split("/")[-1]))
+            self.__log_missing_schedule_file()
             raise ScheduleFileError(self.file_path, "Schedule file not found.")
 
+        compiled_file, temporary_file_path = self.__open_compiled_file()
         try:
-            if lines[0] != "Bag number, Start filling, Stop filling":
+            with schedule_file, tempfile.TemporaryDirectory() as run_folder:
+                try:
+                    chunks = self.__split_schedule_file(file_stat.st_size)
+                    if len(chunks) > 1 and codecs.lookup(schedule_file.encoding).name in _CHUNKABLE_ENCODINGS:
+                        header, bag_records, invalid_lines, recurrence_rules = self.__read_chunks_in_parallel(
+                            chunks, schedule_file.encoding, run_folder)
+                    else:
+                        # the file is processed as a pipeline of generators, so the lines are never held in memory and
+                        # at most `_sort_run_length` bag events are held in memory at once
+                        numbered_lines = enumerate((line.strip() for line in schedule_file), 1)
+                        _, header = next(numbered_lines, (0, None))
+                        invalid_lines, recurrence_rules = [], []
+                        bag_records = self.sort_bag_records(
+                            self.parse_bag_records(numbered_lines, invalid_lines, recurrence_rules),
+                            self._sort_run_length)
+                    # the samples of a recurrence rule are already sorted, so they are generated only while they are
+                    # merged with the sorted bag events
+                    repeated_samples = [_iter_recurrence_rule(recurrence_rule) for recurrence_rule
+                                        in self.__limit_recurrence_rules(recurrence_rules, invalid_lines)]
+                    bag_records = heapq.merge(bag_records, *repeated_samples, key=lambda record: record[1])
+                    overlaps = []
+                    compiled_schedule.write_sorted_bag_records(compiled_file, file_stat.st_size, file_stat.st_mtime_ns,
+                                                               content_hash, _collect_overlaps(bag_records, overlaps),
+                                                               self.__get_pump_parameters())
+                except UnicodeDecodeError:
+                    self.__log_missing_schedule_file()
+                    raise ScheduleFileError(self.file_path, "Schedule file not found.")
+
+            if header is None:
+                self.user_logger.info("SCHEDULE FILE")
+                self.user_logger.info("- Schedule file is empty")
+                raise ScheduleFileError(self.file_path, "Schedule file is empty")
+            if header != "Bag number, Start filling, Stop filling":
                 error_messages.append("- Line 1: Invalid header."
                                       "\n + Expected `Bag number, Start filling, Stop filling`")
-        except:
-            self.user_logger.info("SCHEDULE FILE")
-            self.user_logger.info("- Schedule file is empty")
-            raise ScheduleFileError(self.file_path, "Schedule file is empty")
+            for line_number, line, message in invalid_lines:
+                error_messages.append("- Line {}: Invalid line (`{}`).{}"
+                                      .format(line_number, line, "" if message is None else "\n + " + message))
 
-        for line_number, line in enumerate(lines[1:], 2):
+            # check schedule for overlaps
+            for bag_record, next_bag_record in overlaps:
+                error_messages.append("- Samples in schedule can't overlap.\n"
+                                      " + Samples below overlap\n"
+                                      "   -> `{}`\n"
+                                      "   -> `{}`"
+                                      .format(_format_bag_record(bag_record), _format_bag_record(next_bag_record)))
+            # write error messages to log files
+            if error_messages:
+                self.user_logger.info("SCHEDULE FILE")
+                for msg in error_messages:
+                    self.user_logger.info(msg)
+            
+                if any("Invalid line" in msg for msg in error_messages):
+                    self.user_logger.info("\nTo fix `Invalid line` error, check:\n"
+                                          "- if the line is in the correct format \n"
+                                          " + format: `<bag number>, <start time>, <stop time>` \n"
+                                          " + e.g. `3, 2020-03-06 11:39:15, 2020-03-06 11:39:35`\n"
+                                          "- if the bag number is valid\n"
+                                          "  + it must be a positive integer from the interval [1,13]\n"
+                                          "- if the times are valid \n"
+                                          "  + they must be `YYYY-MM-DD hh:mm:ss` or `YYYY-MM-DD hh:mm:ss.fff` format\n"
+                                          "- if the start time is earlier than stop time")
+
+                raise ScheduleFileErrors(self.file_path, error_messages)
+
+            parsed_schedule, pump_parameters, pump_intervals = compiled_schedule.map_compiled_schedule(compiled_file,
+                                                                                                       self.file_path)
+            if temporary_file_path is not None:
+                # failing to replace the compiled schedule isn't an error, the schedule file will be parsed again
+                try:
+                    os.replace(temporary_file_path, self.compiled_file_path)
+                    self.logger.info("sampler_schedule.py: wrote compiled schedule {}".format(self.compiled_file_path))
+                except OSError as error:
+                    self.logger.warning("sampler_schedule.py: failed to write compiled schedule {}: {}"
+                                        .format(self.compiled_file_path, error))
+            SamplerSchedule._pump_intervals[(self.file_path, pump_parameters)] = (parsed_schedule, pump_intervals)
+            schedule_log.log_schedule(self.logger,
+                                      "sampler_schedule.py: read bag schedule from file {}".format(self.file_path),
+                                      parsed_schedule.get_bag_schedule().iter_bag_events(), _format_bag_event)
+            return parsed_schedule
+        finally:
+            compiled_file.close()
+            if temporary_file_path is not None and os.path.exists(temporary_file_path):
+                os.remove(temporary_file_path)
+
+    def __open_compiled_file(self):
+        """
+        Opens the file that the parsed schedule is written to. It is a temporary file next to `self.compiled_file_path`
+        that replaces the compiled schedule file if the schedule is valid, or an unnamed temporary file if there is no
+        compiled schedule file or the temporary file can't be created.
+        :return: tuple (file object opened for reading and writing in binary mode, string representing the path to the
+        file or None if the file is unnamed)
+        """
+        if self.compiled_file_path is not None:
+            temporary_file_path = self.compiled_file_path + ".tmp"
+            try:
+                return open(temporary_file_path, "w+b"), temporary_file_path
+            except OSError as error:
+                self.logger.warning("sampler_schedule.py: failed to write compiled schedule {}: {}"
+                                    .format(self.compiled_file_path, error))
+        return tempfile.TemporaryFile(), None
+
+    def __split_schedule_file(self, file_size):
+        """
+        Splits the schedule file into chunks of at least `_min_chunk_size` bytes, one chunk for each validation worker.
+        Every chunk except the last one ends with a `\n` byte.
+        :param file_size: integer representing the size of the schedule file in bytes
+        :return: list of tuples of integers representing the position of the first byte of the chunk and the position
+        after the last byte of the chunk
+        """
+        chunk_count = min(self.validation_workers, file_size // self._min_chunk_size)
+        if chunk_count <= 1 or file_size < self._min_parallel_file_size:
+            return [(0, file_size)]
+        boundaries = [0]
+        with open(self.file_path, "rb") as schedule_file:
+            for chunk in range(1, chunk_count):
+                schedule_file.seek(max(boundaries[-1], file_size * chunk // chunk_count))
+                schedule_file.readline()
+                if schedule_file.tell() < file_size:
+                    boundaries.append(schedule_file.tell())
+        boundaries.append(file_size)
+        return list(zip(boundaries, boundaries[1:]))
+
+    def __read_chunks_in_parallel(self, chunks, encoding, run_folder):
+        """
+        Parses chunks of the schedule file in worker processes and merges their sorted run files. Invalid lines are
+        numbered and ordered the same way as when the file is parsed by a single process.
+        :param chunks: list of tuples returned by `__split_schedule_file`
+        :param encoding: string representing the encoding of the schedule file
+        :param run_folder: string representing the path to the folder that the workers create their run files in
+        :return: tuple of the header (string, or None if the file is empty), iterable of tuples (bag number, start time,
+        stop time) sorted by the time the bags start filling, list of tuples (line number, line, message) of invalid
+        lines and list of tuples (line number, line, recurrence rule) of lines with recurrence rules
+        """
+        with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+            results = list(executor.map(_read_schedule_chunk, *zip(*[(self.file_path, start, stop, encoding, run_folder)
+                                                                     for start, stop in chunks])))
+        header = results[0][0]
+        invalid_lines, recurrence_rules = [], []
+        runs = []
+        first_line_number = 0
+        for _, line_count, chunk_invalid_lines, chunk_recurrence_rules, run_file_path in results:
+            invalid_lines.extend((first_line_number + line_number, line, message)
+                                 for line_number, line, message in chunk_invalid_lines)
+            recurrence_rules.extend((first_line_number + line_number, line, recurrence_rule)
+                                    for line_number, line, recurrence_rule in chunk_recurrence_rules)
+            first_line_number += line_count
+            runs.append(_read_run(open(run_file_path, "rb")))
+        self.logger.info("sampler_schedule.py: parsed schedule file {} in {} chunks"
+                         .format(self.file_path, len(chunks)))
+        # `heapq.merge` prefers earlier chunks when keys are equal, so bag events keep their order from the file
+        return header, heapq.merge(*runs, key=lambda record: record[1]), invalid_lines, recurrence_rules
+
+    def __limit_recurrence_rules(self, recurrence_rules, invalid_lines):
+        """
+        Counts the samples of the recurrence rules in the order of the lines, without generating them. A line that
+        brings the total number of repeated samples above `_max_repeated_samples` is an invalid line.
+        :param recurrence_rules: list of tuples (line number, line, recurrence rule) in the order of the lines
+        :param invalid_lines: list of tuples (line number, line, message) of invalid lines, lines rejected by the limit
+        are added to it and it is sorted by line number
+        :return: list of recurrence rules within the limit
+        """
+        accepted_rules = []
+        repeated_samples = 0
+        for line_number, line, recurrence_rule in recurrence_rules:
+            count = recurrence_rule[-1]
+            if repeated_samples + count > self._max_repeated_samples:
+                invalid_lines.append((line_number, line,
+                                      "Samples in the schedule file are repeated {} times up to this line, they can be "
+                                      "repeated at most {} times.".format(repeated_samples + count,
+                                                                          self._max_repeated_samples)))
+                continue
+            repeated_samples += count
+            accepted_rules.append(recurrence_rule)
+        invalid_lines.sort(key=lambda invalid_line: invalid_line[0])
+        return accepted_rules
+
+    @staticmethod
+    def parse_bag_records(numbered_lines, invalid_lines, recurrence_rules):
+        """
+        Converts lines of the schedule file to bag records. Comments and blank lines are skipped. Lines with recurrence
+        rules aren't expanded, their rules are collected instead.
+        :param numbered_lines: iterable of tuples containing the line number and the stripped line
+        :param invalid_lines: list that tuples (line number, line, message) of invalid lines are appended to, the
+        message is the message of a `ScheduleFileError` raised for the line or None
+        :param recurrence_rules: list that tuples (line number, line, recurrence rule) of lines with recurrence rules
+        are appended to, see `convert_line_to_recurrence_rule`
+        :return: generator of tuples (bag number, start time, stop time) with times in milliseconds in the order of the
+        lines in the file
+        """
+        for line_number, line in numbered_lines:
             # if first character of `line` is `#`, the whole line is considered to be a comment and is skipped
             if line.startswith("#"):
                 continue
             if line == "":
                 continue
             try:
-                bag_event = self.convert_line_to_bag_event(line)
-                self.complete_bag_schedule.append(bag_event)
+                if line.count(",") == 4:
+                    recurrence_rules.append((line_number, line, SamplerSchedule.convert_line_to_recurrence_rule(line)))
+                    continue
+                bag_record = SamplerSchedule.convert_line_to_bag_record(line)
+            except ScheduleFileError as error:
+                invalid_lines.append((line_number, line, error.message))
+                continue
             except:
-                error_messages.append("- Line {}: Invalid line (`{}`)."
-                                      .format(line_number, line))
-
-        # sort `self.complete_bag_schedule` by `time_on` in increasing order
-        self.complete_bag_schedule.sort(key=lambda event: event.get_bag_time_on())
-        # check schedule for overlaps
-        for i in range(0, len(self.complete_bag_schedule) - 1):
-            if self.complete_bag_schedule[i].get_bag_time_off() > self.complete_bag_schedule[i + 1].get_bag_time_on():
-                error_messages.append("- Samples in schedule can't overlap.\n"
-                                      " + Samples below overlap\n"
-                                      "   -> `{}`\n"
-                                      "   -> `{}`"
-                                      .format(self.complete_bag_schedule[i].get_bag_event_as_string(),
-                                              self.complete_bag_schedule[i + 1].get_bag_event_as_string()))
-        # write error messages to log files
-        if error_messages:
-            self.user_logger.info("SCHEDULE FILE")
-            for msg in error_messages:
-                self.user_logger.info(msg)
-            
-            if any("Invalid line" in msg for msg in error_messages):
-                self.user_logger.info("\nTo fix `Invalid line` error, check:\n"
-                                      "- if the line is in the correct format \n"
-                                      " + format: `<bag number>, <start time>, <stop time>` \n"
-                                      " + e.g. `3, 2020-03-06 11:39:15, 2020-03-06 11:39:35`\n"
-                                      "- if the bag number is valid\n"
-                                      "  + it must be a positive integer from the interval [1,13]\n"
-                                      "- if the times are valid \n"
-                                      "  + they must be `YYYY-MM-DD hh:mm:ss` format\n"
-                                      "- if the start time is earlier than stop time")
-
-            raise ScheduleFileErrors(self.file_path, error_messages)
-
-        self.logger.info("sampler_schedule.py: read bag schedule from file {}: {}"
-                         .format(self.file_path,
-                                 [bag_event.get_bag_event_as_string() + "\n"
-                                  for bag_event in self.complete_bag_schedule]))
-
-    def __create_valve_schedule(self, bag_schedule):
-        """
-        Creates a list of `ValveEvent` objects based on `bag_schedule`
-        :param bag_schedule: list of `BagEvent` objects
-        :return: list of `ValveEvent objects`
-        """
-        valve_schedule = []
-        for bag_event in bag_schedule:
-            valve_schedule.append(ValveEvent(bag_event.get_bag_time_on(), bag_event.get_bag_number(),  "open valve"))
-            valve_schedule.append(ValveEvent(bag_event.get_bag_time_off(), bag_event.get_bag_number(), "close valve"))
-        # sort the list according to time
-        valve_schedule.sort(key=lambda event: event.get_valve_time())
-        return valve_schedule
-
-    def __create_pump_schedule(self, bag_schedule):
-        """
-        Creates a list of `PumpEvent` objects based on `bag_schedule`.
-        :param bag_schedule: list of `BagEvent` objects
-        :return: list of `PumpEvent` objects
-        """
-        pump_schedule = []
-        if not bag_schedule:
-            return pump_schedule
-        # create a list of time intervals when the pump is on, the intervals are in format [time_pump_on, time_pump_off]
-        unmerged_pump_on_intervals = [[bag_event.get_bag_time_on() - self.pump_timedelta_before_valve, bag_event.get_bag_time_off()
-                                       + self.pump_timedelta_after_valve] for bag_event in bag_schedule]
-        # sort the list of time intervals by the time pump turns on
-        unmerged_pump_on_intervals.sort(key=lambda interval: interval[0])
-
-        # merge all time intervals that overlap or the difference between one interval's time off and the another
-        # interval's time on is less or equal to `self.pump_off_time_tolerance`
-        merged_pump_on_intervals = [unmerged_pump_on_intervals[0]]
-        for current_interval in unmerged_pump_on_intervals:
-            previous_interval = merged_pump_on_intervals[-1]
-            if current_interval[0] - previous_interval[1] <= self.pump_off_time_tolerance:
-                previous_interval[1] = max(previous_interval[1], current_interval[1])
-            else:
-                merged_pump_on_intervals.append(current_interval)
-        # create schedule for pump
-        for interval in merged_pump_on_intervals:
-            pump_schedule.append(PumpEvent(interval[0], "turn pump on"))
-            pump_schedule.append(PumpEvent(interval[1], "turn pump off"))
-        return pump_schedule
+                invalid_lines.append((line_number, line, None))
+                continue
+            yield bag_record
+
+    @staticmethod
+    def sort_bag_records(bag_records, run_length):
+        """
+        Sorts bag records by the time the bag starts filling using an external merge sort. At most `run_length` records
+        are sorted in memory at once, longer inputs are sorted in runs that are written to temporary files and merged.
+        The sort is stable, so records that start at the same time keep their order from `bag_records`.
+        :param bag_records: iterable of tuples (bag number, start time, stop time) with times in milliseconds
+        :param run_length: positive integer representing the maximum number of records sorted in memory at once
+        :return: iterable of tuples (bag number, start time, stop time) sorted by the time the bag starts filling
+        """
+        assert(isinstance(run_length, int) and run_length > 0)
+        sort_key = lambda record: record[1]
+        bag_records = iter(bag_records)
+        run_files = []
+        run = list(islice(bag_records, run_length))
+        while run:
+            run.sort(key=sort_key)
+            next_run = list(islice(bag_records, run_length))
+            if not next_run and not run_files:
+                # the whole schedule fits into one run, there is no need to use temporary files
+                return run
+            run_file = tempfile.TemporaryFile()
+            _write_run(run_file, run)
+            run_file.seek(0)
+            run_files.append(run_file)
+            run = next_run
+        # `heapq.merge` prefers earlier runs when keys are equal, which keeps the sort stable
+        return heapq.merge(*[_read_run(run_file) for run_file in run_files], key=sort_key)
+
+    def __create_pump_intervals(self, start):
+        """
+        Creates intervals when the pump is on based on `self.bag_schedule`.
+        :param start: integer representing the position of the first bag event in `self.bag_schedule`
+        :return: `PumpIntervals` object
+        """
+        return self.bag_schedule.get_pump_intervals(*self.__get_pump_parameters(), start)
+
+    def __get_current_pump_intervals(self, start, bag_schedule=None, pump_intervals=None):
+        """
+        Creates intervals when the pump is on for bag events starting with the `start`-th event. Bag events don't
+        overlap, so the intervals are the part of the complete pump intervals that starts with the interval of the
+        `start`-th bag event, only the first interval starts when the pump turns on for the `start`-th bag event.
+        :param start: integer representing the position of the first bag event in `bag_schedule`
+        :param bag_schedule: `ColumnarSchedule` object, `self.bag_schedule` if None
+        :param pump_intervals: `PumpIntervals` object of `bag_schedule`, `self.complete_pump_intervals` if None
+        :return: `PumpIntervals` object sharing the columns with `pump_intervals`
+        """
+        if bag_schedule is None:
+            bag_schedule, pump_intervals = self.bag_schedule, self.complete_pump_intervals
+        if start == len(bag_schedule):
+            return pump_intervals.view(len(pump_intervals))
+        time_on = int(bag_schedule.start_times[start]) \
+            - schedule_time.timedelta_to_milliseconds(self.pump_timedelta_before_valve)
+        return pump_intervals.get_intervals_starting_at(time_on)
+
+    def __get_current_index(self, current_time, bag_schedule):
+        """
+        Doesn't load the schedule file, the caller loads it and passes the loaded schedule, so the position and the
+        events taken from it belong to the same version of the file.
+        :param current_time: `datetime` object
+        :param bag_schedule: `ColumnarSchedule` object
+        :return: integer representing the position of the first bag event in `bag_schedule` with starting time after
+        `current_time` + `self.pump_timedelta_before_valve`
+        """
+        return bag_schedule.get_index_after(
+            schedule_time.datetime_to_milliseconds(current_time)
+            + schedule_time.timedelta_to_milliseconds(self.pump_timedelta_before_valve))
 
     def get_complete_bag_schedule(self):
         """
@@ -214,41 +688,34 @@ class SamplerSchedule():
         regardless of their starting time.
         :return: list of all `BagEvent` objects from the file
         """
-        self.__read_bag_schedule()
-        self.logger.info("sampler_schedule.py: generated complete bag schedule: {}"
-                         .format([[bag_event.get_bag_number(),
-                                   bag_event.get_bag_time_on().strftime("%Y-%m-%d %H:%M:%S"),
-                                   bag_event.get_bag_time_off().strftime("%Y-%m-%d %H:%M:%S")]
-                                  for bag_event in self.complete_bag_schedule]))
-        return self.complete_bag_schedule
+        self.__load_bag_schedule()
+        complete_bag_schedule = list(self.bag_schedule.iter_bag_events())
+        schedule_log.log_schedule(self.logger, "sampler_schedule.py: generated complete bag schedule",
+                                  complete_bag_schedule, _format_bag_event)
+        return complete_bag_schedule
 
     def get_complete_valve_schedule(self):
         """
         Creates a list of `ValveEvent` objects that contains all `ValveEvent` objects generated based on the
-        `self.complete_bag_schedule`, the complete list of `BagEvent` objects.
+        `self.bag_schedule`, the complete bag schedule.
         :return: list of all `ValveEvent` objects
         """
-        self.__read_bag_schedule()
-        complete_valve_schedule = self.__create_valve_schedule(self.complete_bag_schedule)
-        self.logger.info("sampler_schedule.py: generated complete valve schedule: {}"
-                         .format([[valve_event.get_valve_number(),
-                                   valve_event.get_valve_time().strftime("%Y-%m-%d %H:%M:%S"),
-                                   valve_event.get_valve_action()]
-                                  for valve_event in complete_valve_schedule]))
+        self.__load_bag_schedule()
+        complete_valve_schedule = list(self.bag_schedule.iter_valve_events())
+        schedule_log.log_schedule(self.logger, "sampler_schedule.py: generated complete valve schedule",
+                                  complete_valve_schedule, _format_valve_event)
         return complete_valve_schedule
 
     def get_complete_pump_schedule(self):
         """
         Creates a list of `PumpEvent` objects that contains all `PumpEvent` objects generated based on the
-        `self.complete_bag_schedule`, the complete list of `BagEvent` objects.
+        `self.bag_schedule`, the complete bag schedule.
         :return: list of all `PumpEvent` objects
         """
-        self.__read_bag_schedule()
-        complete_pump_schedule = self.__create_pump_schedule(self.complete_bag_schedule)
-        self.logger.info("sampler_schedule.py: generated complete pump schedule:{}"
-                         .format([[pump_event.get_pump_time().strftime("%Y-%m-%d %H:%M:%S"),
-                                   pump_event.get_pump_action()]
-                                  for pump_event in complete_pump_schedule]))
+        self.__load_bag_schedule()
+        complete_pump_schedule = list(self.complete_pump_intervals.iter_pump_events())
+        schedule_log.log_schedule(self.logger, "sampler_schedule.py: generated complete pump schedule",
+                                  complete_pump_schedule, _format_pump_event)
         return complete_pump_schedule
 
     def get_current_bag_schedule(self, current_time):
@@ -258,16 +725,11 @@ class SamplerSchedule():
         :param current_time: `datetime` object
         :return: list of `BagEvent` objects with starting time after `current_time` + `self.pump_timedelta_before_valve`
         """
-        self.__read_bag_schedule()
-        current_bag_schedule = []
-        for bag_event in self.complete_bag_schedule:
-            if bag_event.get_bag_time_on() - self.pump_timedelta_before_valve > current_time:
-                current_bag_schedule.append(bag_event)
-        self.logger.info("sampler_schedule.py: generated current bag schedule: {}"
-                         .format([[bag_event.get_bag_number(),
-                                   bag_event.get_bag_time_on().strftime("%Y-%m-%d %H:%M:%S"),
-                                   bag_event.get_bag_time_off().strftime("%Y-%m-%d %H:%M:%S")]
-                                  for bag_event in current_bag_schedule]))
+        self.__load_bag_schedule()
+        bag_schedule = self.bag_schedule
+        current_bag_schedule = list(bag_schedule.iter_bag_events(self.__get_current_index(current_time, bag_schedule)))
+        schedule_log.log_schedule(self.logger, "sampler_schedule.py: generated current bag schedule",
+                                  current_bag_schedule, _format_bag_event)
         return current_bag_schedule
 
     def get_current_valve_schedule(self, current_time):
@@ -277,14 +739,12 @@ class SamplerSchedule():
         :param current_time: `datetime` object
         :return: list of `ValveEvent` objects with starting time after `current_time` + `self.pump_timedelta_before_valve`
         """
-        self.__read_bag_schedule()
-        current_bag_schedule = self.get_current_bag_schedule(current_time)
-        current_valve_schedule = self.__create_valve_schedule(current_bag_schedule)
-        self.logger.info("sampler_schedule.py: generated current valve schedule: {}"
-                         .format([[valve_event.get_valve_number(),
-                                   valve_event.get_valve_time().strftime("%Y-%m-%d %H:%M:%S"),
-                                   valve_event.get_valve_action()]
-                                  for valve_event in current_valve_schedule]))
+        self.__load_bag_schedule()
+        bag_schedule = self.bag_schedule
+        current_valve_schedule = list(bag_schedule.iter_valve_events(
+            2 * self.__get_current_index(current_time, bag_schedule)))
+        schedule_log.log_schedule(self.logger, "sampler_schedule.py: generated current valve schedule",
+                                  current_valve_schedule, _format_valve_event)
         return current_valve_schedule
 
     def get_current_pump_schedule(self, current_time):
@@ -293,15 +753,183 @@ class SamplerSchedule():
         :param current_time: `datetime` object
         :return: list of `PumpEvent` objects with starting time after `current_time`
         """
-        self.__read_bag_schedule()
-        current_bag_schedule = self.get_current_bag_schedule(current_time)
-        current_pump_schedule = self.__create_pump_schedule(current_bag_schedule)
-        self.logger.info("sampler_schedule.py: generated current pump schedule: {}"
-                         .format([[pump_event.get_pump_time().strftime("%Y-%m-%d %H:%M:%S"),
-                                   pump_event.get_pump_action()]
-                                  for pump_event in current_pump_schedule]))
+        self.__load_bag_schedule()
+        bag_schedule, pump_intervals = self.bag_schedule, self.complete_pump_intervals
+        current_pump_intervals = self.__get_current_pump_intervals(self.__get_current_index(current_time, bag_schedule),
+                                                                   bag_schedule, pump_intervals)
+        current_pump_schedule = list(current_pump_intervals.iter_pump_events())
+        schedule_log.log_schedule(self.logger, "sampler_schedule.py: generated current pump schedule",
+                                  current_pump_schedule, _format_pump_event)
         return current_pump_schedule
 
+    def iter_complete_actuator_events(self):
+        """
+        :return: generator of all `ValveEvent` and `PumpEvent` objects merged into one stream, see
+        `event_timeline.merge_actuator_events`
+        """
+        self.__load_bag_schedule()
+        return merge_actuator_events(self.bag_schedule.iter_valve_events(),
+                                     self.complete_pump_intervals.iter_pump_events())
+
+    def iter_current_actuator_events(self, current_time):
+        """
+        Creates the events of `get_current_valve_schedule` and `get_current_pump_schedule` lazily as one stream.
+        :param current_time: `datetime` object
+        :return: generator of `ValveEvent` and `PumpEvent` objects merged into one stream, see
+        `event_timeline.merge_actuator_events`
+        """
+        self.__load_bag_schedule()
+        bag_schedule, pump_intervals = self.bag_schedule, self.complete_pump_intervals
+        index = self.__get_current_index(current_time, bag_schedule)
+        current_pump_intervals = self.__get_current_pump_intervals(index, bag_schedule, pump_intervals)
+        self.logger.info("sampler_schedule.py: generated current actuator events: {} valve events and {} pump events"
+                         .format(2 * (len(bag_schedule) - index), 2 * len(current_pump_intervals)))
+        return merge_actuator_events(bag_schedule.iter_valve_events(2 * index),
+                                     current_pump_intervals.iter_pump_events())
+
+    def iter_resumed_actuator_events(self, current_time, interrupted_sample_policy, last_checkpoint=None):
+        """
+        Creates the actuator events for a sampler that starts at `current_time` in the middle of the schedule, e.g.
+        after the Pi lost power. Bags that haven't started filling are all sampled, the pump turns on immediately for a
+        bag whose pump should already be on. The sample whose valve should be open at `current_time` is handled by the
+        policy:
+            + "resume": the valve of the bag opens immediately and the bag is filled until its scheduled stop time
+            + "truncate": the sample ends at `current_time`, a "close valve" event of the bag is executed immediately
+            + "skip": same as `iter_current_actuator_events`, the sample in progress and bags whose pump should already
+              be on are skipped
+
+        `last_checkpoint` is the state of the actuators journaled before the sampler stopped. It decides which of the
+        events of the sample were executed:
+            + the last journaled event is at or after the time the valve opens and the journaled open valve is the
+              valve of the sample: the sample was interrupted, it is handled by the policy
+            + the last journaled event is at or after the time the valve opens, but the valve isn't open: the sample
+              was already finished (e.g. truncated), its valve stays closed with both policies
+            + the last journaled event is before the time the valve opens: the valve never opened, "resume" opens it
+              and "truncate" skips the sample without closing the closed valve
+        Without a checkpoint, the sample is handled as interrupted. The pump follows the pump schedule in all cases, so
+        it turns on immediately if it should be on, whether or not it was journaled on.
+        :param current_time: `datetime` object
+        :param interrupted_sample_policy: string representing the policy, must be in `INTERRUPTED_SAMPLE_POLICIES`
+        :param last_checkpoint: `Checkpoint` object representing the last journaled event, or None
+        :return: generator of `ValveEvent` and `PumpEvent` objects merged into one stream
+        """
+        assert(interrupted_sample_policy in INTERRUPTED_SAMPLE_POLICIES)
+        if interrupted_sample_policy == "skip":
+            return self.iter_current_actuator_events(current_time)
+        self.__load_bag_schedule()
+        bag_schedule, pump_intervals = self.bag_schedule, self.complete_pump_intervals
+        current_milliseconds = schedule_time.datetime_to_milliseconds(current_time)
+        index = bag_schedule.get_index_after(current_milliseconds)
+        valve_events = [bag_schedule.iter_valve_events(2 * index)]
+        pump_events = [self.__get_current_pump_intervals(index, bag_schedule, pump_intervals).iter_pump_events()]
+        if index > 0 and current_milliseconds < bag_schedule.stop_times[index - 1]:
+            bag_number = int(bag_schedule.bag_numbers[index - 1])
+            sample_state = _get_sample_state(bag_number, int(bag_schedule.start_times[index - 1]), last_checkpoint)
+            self.logger.info("sampler_schedule.py: sample of bag {} was {}, policy `{}`"
+                             .format(bag_number, sample_state, interrupted_sample_policy))
+            if interrupted_sample_policy == "resume" and sample_state != "finished":
+                index -= 1
+                valve_events = [[ValveEvent(current_time, bag_number, "open valve")],
+                                bag_schedule.iter_valve_events(2 * index + 1)]
+                pump_events = [
+                    self.__get_current_pump_intervals(index, bag_schedule, pump_intervals).iter_pump_events()]
+            elif interrupted_sample_policy == "truncate" and sample_state == "interrupted":
+                valve_events.insert(0, [ValveEvent(current_time, bag_number, "close valve")])
+        return merge_actuator_events(chain(*valve_events), chain(*pump_events))
+
+    def get_bag_schedule_between(self, start_time, stop_time):
+        """
+        :param start_time: `datetime` object representing the start of the time window (included)
+        :param stop_time: `datetime` object representing the end of the time window (excluded)
+        :return: `ColumnarSchedule` object containing bag events that start in the window, sharing the columns with the
+        complete bag schedule
+        """
+        self.__load_bag_schedule()
+        return self.bag_schedule.get_window(schedule_time.datetime_to_milliseconds(start_time),
+                                            schedule_time.datetime_to_milliseconds(stop_time))
+
+    def iter_valve_events_between(self, start_time, stop_time):
+        """
+        :param start_time: `datetime` object representing the start of the time window (included)
+        :param stop_time: `datetime` object representing the end of the time window (excluded)
+        :return: generator of `ValveEvent` objects that take place in the window
+        """
+        self.__load_bag_schedule()
+        first_event, last_event = self.bag_schedule.get_valve_event_index_range(
+            schedule_time.datetime_to_milliseconds(start_time), schedule_time.datetime_to_milliseconds(stop_time))
+        return self.bag_schedule.iter_valve_events(first_event, last_event)
+
+    def iter_pump_events_between(self, start_time, stop_time):
+        """
+        :param start_time: `datetime` object representing the start of the time window (included)
+        :param stop_time: `datetime` object representing the end of the time window (excluded)
+        :return: generator of `PumpEvent` objects that take place in the window
+        """
+        self.__load_bag_schedule()
+        first_event, last_event = self.complete_pump_intervals.get_event_index_range(
+            schedule_time.datetime_to_milliseconds(start_time), schedule_time.datetime_to_milliseconds(stop_time))
+        return self.complete_pump_intervals.iter_pump_events(first_event, last_event)
+
+    def get_snapshot_bag_schedule(self):
+        """
+        :return: `ColumnarSchedule` object representing the bag schedule that the object was created from, it isn't
+        reloaded when the schedule file changes
+        """
+        return self.snapshot_bag_schedule
+
+    def get_in_progress_index(self, current_time):
+        """
+        A sample is in progress from the time the pump turns on for the bag until the valve of the bag closes.
+        :param current_time: `datetime` object
+        :return: integer representing the position of the bag event in the snapshot bag schedule whose sample is in
+        progress at `current_time`, or None if no sample is in progress
+        """
+        current_milliseconds = schedule_time.datetime_to_milliseconds(current_time)
+        index = self.snapshot_bag_schedule.get_index_after(
+            current_milliseconds + schedule_time.timedelta_to_milliseconds(self.pump_timedelta_before_valve)) - 1
+        if index >= 0 and current_milliseconds < self.snapshot_bag_schedule.stop_times[index]:
+            return index
+        return None
+
+    def get_schedule_diff(self, old_schedule):
+        """
+        Compares the snapshot bag schedules, so neither schedule file is read again. The running schedule may have been
+        read from the same path as this schedule, reloading it would compare this schedule with itself.
+        :param old_schedule: `SamplerSchedule` object representing the schedule that is replaced by this schedule
+        :return: `ScheduleDiff` object representing the bag events removed, inserted or changed by this schedule
+        """
+        return diff_bag_schedules(old_schedule.get_snapshot_bag_schedule(), self.snapshot_bag_schedule)
+
+    def get_spliced_schedules(self, old_schedule, schedule_diff, current_time):
+        """
+        Splices this schedule into the valve and pump schedules of `old_schedule` that are being executed. When the
+        sample in progress at `current_time` is unchanged in this schedule, it keeps running: the returned schedules
+        start with its remaining events and continue with the events of this schedule after it. Both schedules are
+        spliced from their snapshot bag schedules, like in `get_schedule_diff`.
+        :param old_schedule: `SamplerSchedule` object representing the schedule that is being executed
+        :param schedule_diff: `ScheduleDiff` object returned by `get_schedule_diff(old_schedule)`
+        :param current_time: `datetime` object
+        :return: tuple of a list of `ValveEvent` objects and a list of `PumpEvent` objects with times at or after
+        `current_time`, or None if no sample is in progress or the sample in progress was removed or changed
+        """
+        old_index = old_schedule.get_in_progress_index(current_time)
+        if old_index is None:
+            return None
+        index = schedule_diff.get_new_index(old_index)
+        if index is None:
+            return None
+        bag_schedule = self.snapshot_bag_schedule
+        # events in the current millisecond haven't been executed yet
+        current_milliseconds = schedule_time.datetime_to_milliseconds(current_time) - 1
+        first_valve_event = max(2 * index, bag_schedule.get_valve_event_index_after(current_milliseconds))
+        spliced_valve_schedule = list(bag_schedule.iter_valve_events(first_valve_event))
+        pump_intervals = self.__get_current_pump_intervals(index, bag_schedule, self.snapshot_pump_intervals)
+        spliced_pump_schedule = list(pump_intervals.iter_pump_events(
+            pump_intervals.get_event_index_after(current_milliseconds)))
+        self.logger.info("sampler_schedule.py: spliced {} valve events and {} pump events into the running schedule"
+                         .format(len(spliced_valve_schedule), len(spliced_pump_schedule)))
+        return spliced_valve_schedule, spliced_pump_schedule
+
     @staticmethod
     def convert_line_to_bag_event(line):
         """
@@ -310,19 +938,101 @@ class SamplerSchedule():
         "3,  2020-03-06 11:38:00,  2020-03-06 11:38:30"
         :return: `BagEvent` object
         """
+        bag_number, time_on, time_off = SamplerSchedule.convert_line_to_bag_record(line)
+        return BagEvent(bag_number,
+                        schedule_time.milliseconds_to_datetime(time_on),
+                        schedule_time.milliseconds_to_datetime(time_off))
+
+    @staticmethod
+    def convert_line_to_bag_record(line):
+        """
+        Converts one line from the schedule file to a bag record.
+        :param line: string representing one line from the schedule file, must be in format
+        "3,  2020-03-06 11:38:00,  2020-03-06 11:38:30"
+        :return: tuple (bag number, start time, stop time) with times in milliseconds since
+        `schedule_time.SCHEDULE_EPOCH`
+        """
         bag_info, time_on_info, time_off_info, *rest = line.split(",")
         # check if line contains only three values
         assert(not rest)
         # convert `bag_info` to integer
         bag_number = int(bag_info.strip())
-        # convert `time_on_info` to datetime object
-        time_on_info = " ".join(time_on_info.strip().split())
-        time_off_info = " ".join(time_off_info.strip().split())
-        time_on = datetime.strptime(time_on_info, "%Y-%m-%d %H:%M:%S")
-        time_off = datetime.strptime(time_off_info, "%Y-%m-%d %H:%M:%S")
+        assert(BagEvent.is_valid_bag_number(bag_number))
+        # convert `time_on_info` and `time_off_info` to datetime objects
+        time_on = SamplerSchedule.convert_string_to_datetime(time_on_info)
+        time_off = SamplerSchedule.convert_string_to_datetime(time_off_info)
         # check if `time_on` is earlier than `time_off`
         assert(time_on < time_off)
-        return BagEvent(bag_number, time_on, time_off)
+        return (bag_number, schedule_time.datetime_to_milliseconds(time_on),
+                schedule_time.datetime_to_milliseconds(time_off))
+
+    @staticmethod
+    def convert_line_to_recurrence_rule(line):
+        """
+        Converts one line with a recurrence rule from the schedule file. The rule repeats the sample every given
+        interval, either a given number of times or until a given time (included). The samples aren't generated, so
+        memory used by the line doesn't depend on their number.
+        :param line: string representing one line from the schedule file, must be in format
+        "3,  2020-03-06 11:00:00,  2020-03-06 11:30:00,  every 01:00:00,  720 times" or
+        "3,  2020-03-06 11:00:00,  2020-03-06 11:30:00,  every 01:00:00,  until 2020-04-05 11:00:00"
+        :return: tuple of integers (bag number, start time and stop time of the first sample in milliseconds, interval
+        in milliseconds, number of samples)
+        """
+        fields = line.split(",")
+        assert(len(fields) == 5)
+        bag_number, time_on, time_off = SamplerSchedule.convert_line_to_bag_record(",".join(fields[:3]))
+        interval = SamplerSchedule.convert_string_to_interval(fields[3])
+        count_match = _RECURRENCE_COUNT.fullmatch(fields[4])
+        if count_match:
+            count = int(count_match.group(1))
+        else:
+            until = schedule_time.datetime_to_milliseconds(
+                SamplerSchedule.convert_string_to_datetime(_RECURRENCE_UNTIL.fullmatch(fields[4]).group(1)))
+            assert(until >= time_on)
+            count = (until - time_on) // interval + 1
+        assert(count >= 1)
+        # occurrences that overlap each other would be reported as overlapping samples one by one, so they are rejected
+        # with the line instead
+        assert(count == 1 or time_off - time_on <= interval)
+        # the last occurrence must be a valid time as well
+        schedule_time.milliseconds_to_datetime(time_off + (count - 1) * interval)
+        return bag_number, time_on, time_off, interval, count
+
+    @staticmethod
+    def convert_string_to_interval(interval_string):
+        """
+        :param interval_string: string representing the interval of a recurrence rule in format `every hh:mm:ss` or
+        `every hh:mm:ss.fff`, hours don't have to be padded with zeros and may be greater than 23, e.g.
+        " every 168:00:00"
+        :return: positive integer representing the interval in milliseconds
+        """
+        hours, minutes, seconds, milliseconds = _RECURRENCE_INTERVAL.fullmatch(interval_string).groups()
+        interval = (int(hours) * 3600 + int(minutes) * 60 + int(seconds)) * 1000 \
+            + int((milliseconds or "").ljust(3, "0"))
+        assert(interval > 0)
+        return interval
+
+    @staticmethod
+    def convert_string_to_datetime(time_string):
+        """
+        Converts time from the schedule file to `datetime` object. The seconds may be followed by one to three decimal
+        places, so times have a precision of one millisecond. Times in the zero-padded `YYYY-MM-DD hh:mm:ss` format are
+        parsed directly from their fixed-width fields. Any other time (e.g. with extra white spaces or without padding)
+        falls back to `_parse_time_with_strptime`, so exactly the same times are accepted as with `datetime.strptime`.
+        :param time_string: string representing a time in format `YYYY-MM-DD hh:mm:ss` or `YYYY-MM-DD hh:mm:ss.fff`,
+        e.g. " 2020-03-06 11:38:00" or " 2020-03-06 11:38:00.250"
+        :return: `datetime` object
+        """
+        match = _ZERO_PADDED_TIME.fullmatch(time_string)
+        if match:
+            year, month, day, hour, minute, second, milliseconds = match.groups()
+            try:
+                return datetime(int(year), int(month), int(day), int(hour), int(minute), int(second),
+                                int((milliseconds or "").ljust(3, "0")) * 1000)
+            except ValueError:
+                # let `datetime.strptime` decide about out of range values
+                pass
+        return _parse_time_with_strptime(time_string)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,187 @@
+"""
+Package for measuring how fast schedule files are parsed.
+
+Benchmarks:
+    + "times": parses generated schedule times with `SamplerSchedule.convert_string_to_datetime` and with the parser
+      using `datetime.strptime` it replaced
+    + "memory": generates schedule files with the given numbers of lines and parses every file in a new process. The
+      peak resident set size of the process is compared with its size before parsing and with the size of the columns
+      of the parsed schedule and its pump intervals, which are mapped from the compiled schedule file (Linux only)
+    + "validation": generates schedule files with the given numbers of lines and parses every file with one to
+      `<workers>` validation workers, regardless of `SamplerSchedule._min_parallel_file_size`
+
+Usage (the number of times, the number of workers and the numbers of lines are optional):
+    python3 schedule_benchmark.py times [<number of times>]
+    python3 schedule_benchmark.py memory [<number of lines> ...]
+    python3 schedule_benchmark.py validation [<workers> [<number of lines> ...]]
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from sampler_schedule import *
+import sampler_schedule
+
+def get_benchmark_times(number_of_times):
+    """
+    :param number_of_times: integer representing the number of times
+    :return: list of strings representing times in the format of the schedule file, every tenth with milliseconds
+    """
+    start_time = datetime(2020, 3, 6, 11, 38, 0)
+    return [schedule_time.format_time(start_time + timedelta(seconds=37 * index, milliseconds=250 * (index % 10 == 0)))
+            for index in range(number_of_times)]
+
+def measure_parser(parser, time_strings, repetitions=5):
+    """
+    :param parser: function converting a string to a `datetime` object
+    :param time_strings: list of strings representing times
+    :param repetitions: integer representing how many times the strings are parsed, the fastest run is used
+    :return: float representing the number of microseconds per parsed time
+    """
+    durations = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        for time_string in time_strings:
+            parser(time_string)
+        durations.append(time.perf_counter() - start)
+    return min(durations) / len(time_strings) * 1000000
+
+def run_times_benchmark(number_of_times):
+    """
+    Prints the time per parsed time of both parsers.
+    :param number_of_times: integer representing the number of times
+    """
+    time_strings = get_benchmark_times(number_of_times)
+    fast_path = measure_parser(SamplerSchedule.convert_string_to_datetime, time_strings)
+    strptime_path = measure_parser(sampler_schedule._parse_time_with_strptime, time_strings)
+    print("convert_string_to_datetime: {:.2f} us per time".format(fast_path))
+    print("datetime.strptime:          {:.2f} us per time ({:.1f}x slower)".format(strptime_path,
+                                                                                   strptime_path / fast_path))
+
+def write_benchmark_schedule(file_path, number_of_lines):
+    """
+    Writes a valid schedule file without overlaps. Every two lines are swapped, so the schedule has to be sorted.
+    :param file_path: string representing the path to the schedule file
+    :param number_of_lines: integer representing the number of bag events
+    """
+    start_time = datetime(2020, 3, 6, 11, 38, 0)
+    with open(file_path, "w") as schedule_file:
+        schedule_file.write("Bag number, Start filling, Stop filling\n")
+        for index in range(number_of_lines):
+            position = index ^ 1 if index ^ 1 < number_of_lines else index
+            time_on = start_time + timedelta(minutes=position)
+            schedule_file.write("{},  {},  {}\n".format(position % 8 + 1, schedule_time.format_time(time_on),
+                                                        schedule_time.format_time(time_on + timedelta(seconds=30))))
+
+def _get_peak_memory():
+    """
+    :return: integer representing the peak resident set size of the process in bytes (`ru_maxrss` is in kilobytes on
+    Linux)
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _parse_benchmark_schedule(file_path):
+    """
+    Parses the schedule file in a worker process of `measure_memory`.
+    :return: tuple of integers (peak resident set size before parsing in bytes, peak resident set size after parsing
+    in bytes, number of bag events, bytes of the columns of the bag schedule and the pump intervals)
+    """
+    logger = logging.getLogger("logger")
+    memory_before = _get_peak_memory()
+    schedule = SamplerSchedule(file_path, timedelta(seconds=5), timedelta(seconds=5), timedelta(seconds=10), logger,
+                               logger)
+    memory_after = _get_peak_memory()
+    bag_schedule, pump_intervals = schedule.get_snapshot_bag_schedule(), schedule.snapshot_pump_intervals
+    columns = [bag_schedule.bag_numbers, bag_schedule.start_times, bag_schedule.stop_times, pump_intervals.times_on,
+               pump_intervals.times_off]
+    return memory_before, memory_after, len(bag_schedule), sum(memoryview(column).nbytes for column in columns)
+
+def measure_memory(file_path):
+    """
+    :param file_path: string representing the path to the schedule file
+    :return: tuple of integers, see `_parse_benchmark_schedule`
+    """
+    # a new process for every measurement, so the peak of a previous parse isn't included
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(_parse_benchmark_schedule, file_path).result()
+
+def run_memory_benchmark(numbers_of_lines):
+    """
+    Prints the peak resident set size of parsing schedule files of different sizes.
+    :param numbers_of_lines: list of integers representing the numbers of lines of the schedule files
+    """
+    for number_of_lines in numbers_of_lines:
+        with tempfile.TemporaryDirectory() as folder:
+            file_path = os.path.join(folder, "90_schedule.txt")
+            write_benchmark_schedule(file_path, number_of_lines)
+            file_size = os.path.getsize(file_path)
+            start = time.perf_counter()
+            memory_before, memory_after, number_of_events, column_bytes = measure_memory(file_path)
+            assert(number_of_events == number_of_lines)
+            print("{} lines ({:.0f} MB): peak RSS {:.0f} MB, {:.0f} MB above start, {:.0f} MB of mapped columns, "
+                  "{:.1f} s".format(number_of_lines, file_size / 1e6, memory_after / 1e6,
+                                    (memory_after - memory_before) / 1e6, column_bytes / 1e6,
+                                    time.perf_counter() - start))
+
+def measure_validation(file_path, validation_workers, repetitions=3):
+    """
+    :param file_path: string representing the path to the schedule file
+    :param validation_workers: integer representing the maximum number of worker processes
+    :param repetitions: integer representing how many times the file is parsed, the fastest run is used
+    :return: float representing the number of seconds it took to parse and validate the schedule file
+    """
+    logger = logging.getLogger("logger")
+    durations = []
+    for _ in range(repetitions):
+        SamplerSchedule._parsed_schedules.clear()
+        start = time.perf_counter()
+        SamplerSchedule(file_path, timedelta(seconds=5), timedelta(seconds=5), timedelta(seconds=10), logger, logger,
+                        validation_workers=validation_workers)
+        durations.append(time.perf_counter() - start)
+    SamplerSchedule._parsed_schedules.clear()
+    return min(durations)
+
+def run_validation_benchmark(max_workers, numbers_of_lines):
+    """
+    Prints the time of parsing schedule files of different sizes with different numbers of validation workers.
+    :param max_workers: integer representing the largest number of validation workers
+    :param numbers_of_lines: list of integers representing the numbers of lines of the schedule files
+    """
+    min_parallel_file_size = SamplerSchedule._min_parallel_file_size
+    SamplerSchedule._min_parallel_file_size = 0
+    try:
+        print("{} CPU cores".format(os.cpu_count()))
+        for number_of_lines in numbers_of_lines:
+            with tempfile.TemporaryDirectory() as folder:
+                file_path = os.path.join(folder, "90_schedule.txt")
+                write_benchmark_schedule(file_path, number_of_lines)
+                serial_duration = None
+                for validation_workers in range(1, max_workers + 1):
+                    duration = measure_validation(file_path, validation_workers)
+                    serial_duration = serial_duration or duration
+                    print("{} lines ({:.1f} MB), {} workers: {:.3f} s, speedup {:.2f}".format(
+                        number_of_lines, os.path.getsize(file_path) / 1e6, validation_workers, duration,
+                        serial_duration / duration))
+    finally:
+        SamplerSchedule._min_parallel_file_size = min_parallel_file_size
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("times", "memory", "validation") \
+            or (sys.argv[1] == "times" and len(sys.argv) > 3):
+        print(__doc__)
+        sys.exit(1)
+    if sys.argv[1] == "times":
+        run_times_benchmark(int(sys.argv[2]) if len(sys.argv) == 3 else 100000)
+    elif sys.argv[1] == "memory":
+        run_memory_benchmark([int(argument) for argument in sys.argv[2:]] or [1000000])
+    else:
+        run_validation_benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1,
+                                 [int(argument) for argument in sys.argv[3:]] or [50000, 200000, 1000000])
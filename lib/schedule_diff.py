@@ -0,0 +1,171 @@
+"""
+Package containing methods for comparing two bag schedules and finding bag events that were removed, inserted or
+changed.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from columnar_schedule import *
+
+class ScheduleDiff():
+    """
+    Class for storing the differences between an old and a new bag schedule. Bag events are matched by the time the bags
+    start filling. A bag event is changed when a bag event with the same start time has a different bag number or stop
+    time, removed when only the old schedule contains its start time and inserted when only the new schedule does.
+    """
+    __slots__ = ["old_schedule", "new_schedule", "removed_indices", "inserted_indices", "changed_indices"]
+
+    def __init__(self, old_schedule, new_schedule, removed_indices, inserted_indices, changed_indices):
+        """
+        :param old_schedule: `ColumnarSchedule` object representing the old bag schedule
+        :param new_schedule: `ColumnarSchedule` object representing the new bag schedule
+        :param removed_indices: list of integers representing the positions of removed bag events in `old_schedule`
+        :param inserted_indices: list of integers representing the positions of inserted bag events in `new_schedule`
+        :param changed_indices: list of tuples of integers representing the positions of changed bag events in
+        `old_schedule` and `new_schedule`
+        """
+        self.old_schedule = old_schedule
+        self.new_schedule = new_schedule
+        self.removed_indices = removed_indices
+        self.inserted_indices = inserted_indices
+        self.changed_indices = changed_indices
+
+    def is_empty(self):
+        """
+        :return: True if the schedules contain the same bag events, otherwise False
+        """
+        return not self.removed_indices and not self.inserted_indices and not self.changed_indices
+
+    def get_removed_bag_events(self):
+        """
+        :return: list of `BagEvent` objects that are only in the old schedule
+        """
+        return [self.old_schedule.get_bag_event(index) for index in self.removed_indices]
+
+    def get_inserted_bag_events(self):
+        """
+        :return: list of `BagEvent` objects that are only in the new schedule
+        """
+        return [self.new_schedule.get_bag_event(index) for index in self.inserted_indices]
+
+    def get_changed_bag_events(self):
+        """
+        :return: list of tuples of `BagEvent` objects representing the old and the new version of changed bag events
+        """
+        return [(self.old_schedule.get_bag_event(old_index), self.new_schedule.get_bag_event(new_index))
+                for old_index, new_index in self.changed_indices]
+
+    def get_new_index(self, old_index):
+        """
+        :param old_index: integer representing the position of a bag event in the old schedule
+        :return: integer representing the position of the same bag event in the new schedule, or None if the bag event
+        was removed or changed
+        """
+        start_time = int(self.old_schedule.start_times[old_index])
+        new_index = self.new_schedule.get_index_after(start_time) - 1
+        if new_index >= 0 and _get_record(self.new_schedule, new_index) == _get_record(self.old_schedule, old_index):
+            return new_index
+        return None
+
+    def get_summary(self):
+        """
+        :return: string representing the number of removed, inserted and changed bag events
+        """
+        return "{} removed, {} inserted, {} changed bag events".format(len(self.removed_indices),
+                                                                      len(self.inserted_indices),
+                                                                      len(self.changed_indices))
+
+def _get_record(schedule, index):
+    """
+    :param schedule: `ColumnarSchedule` object
+    :param index: integer representing the position of a bag event in `schedule`
+    :return: tuple of integers (bag number, start time, stop time)
+    """
+    return int(schedule.bag_numbers[index]), int(schedule.start_times[index]), int(schedule.stop_times[index])
+
+def _get_common_prefix_length(old_schedule, new_schedule, old_stop, new_stop):
+    """
+    :return: integer representing the number of equal bag events at the start of both schedules, considering only
+    the first `old_stop` events of `old_schedule` and the first `new_stop` events of `new_schedule`
+    """
+    length = min(old_stop, new_stop)
+    if numpy is not None:
+        is_different = numpy.zeros(length, dtype=bool)
+        for column in ("bag_numbers", "start_times", "stop_times"):
+            is_different |= getattr(old_schedule, column)[:length] != getattr(new_schedule, column)[:length]
+        return int(numpy.argmax(is_different)) if is_different.any() else length
+    index = 0
+    while index < length and _get_record(old_schedule, index) == _get_record(new_schedule, index):
+        index += 1
+    return index
+
+def _get_common_suffix_length(old_schedule, new_schedule, old_start, new_start):
+    """
+    :return: integer representing the number of equal bag events at the end of both schedules, considering only the
+    events after the `old_start`-th event of `old_schedule` and the `new_start`-th event of `new_schedule`
+    """
+    length = min(len(old_schedule) - old_start, len(new_schedule) - new_start)
+    if numpy is not None:
+        is_different = numpy.zeros(length, dtype=bool)
+        for column in ("bag_numbers", "start_times", "stop_times"):
+            is_different |= getattr(old_schedule, column)[len(old_schedule) - length:][::-1] \
+                != getattr(new_schedule, column)[len(new_schedule) - length:][::-1]
+        return int(numpy.argmax(is_different)) if is_different.any() else length
+    index = 0
+    while index < length and _get_record(old_schedule, len(old_schedule) - 1 - index) \
+            == _get_record(new_schedule, len(new_schedule) - 1 - index):
+        index += 1
+    return index
+
+def diff_bag_schedules(old_schedule, new_schedule):
+    """
+    Compares two validated bag schedules. The equal events at the start and at the end of the schedules are skipped
+    first, so only the part of the schedules between the first and the last difference is compared event by event.
+    :param old_schedule: `ColumnarSchedule` object representing the old bag schedule
+    :param new_schedule: `ColumnarSchedule` object representing the new bag schedule
+    :return: `ScheduleDiff` object
+    """
+    removed_indices, inserted_indices, changed_indices = [], [], []
+    # an unchanged schedule file is served from the same parsed model
+    if old_schedule is new_schedule:
+        return ScheduleDiff(old_schedule, new_schedule, removed_indices, inserted_indices, changed_indices)
+
+    old_index = new_index = _get_common_prefix_length(old_schedule, new_schedule,
+                                                      len(old_schedule), len(new_schedule))
+    suffix_length = _get_common_suffix_length(old_schedule, new_schedule, old_index, new_index)
+    old_stop = len(old_schedule) - suffix_length
+    new_stop = len(new_schedule) - suffix_length
+
+    # bag events of a validated schedule don't overlap, so no two bag events start at the same time
+    while old_index < old_stop and new_index < new_stop:
+        old_start_time = old_schedule.start_times[old_index]
+        new_start_time = new_schedule.start_times[new_index]
+        if old_start_time < new_start_time:
+            removed_indices.append(old_index)
+            old_index += 1
+        elif new_start_time < old_start_time:
+            inserted_indices.append(new_index)
+            new_index += 1
+        else:
+            if _get_record(old_schedule, old_index) != _get_record(new_schedule, new_index):
+                changed_indices.append((old_index, new_index))
+            old_index += 1
+            new_index += 1
+    removed_indices.extend(range(old_index, old_stop))
+    inserted_indices.extend(range(new_index, new_stop))
+    return ScheduleDiff(old_schedule, new_schedule, removed_indices, inserted_indices, changed_indices)
+
+
+if __name__ == "__main__":
+    old_schedule = ColumnarSchedule.from_sorted_records(
+        [(3, 1583494620, 1583494650), (1, 1583494695, 1583494720), (2, 1583494755, 1583494775)])
+    new_schedule = ColumnarSchedule.from_sorted_records(
+        [(3, 1583494620, 1583494650), (4, 1583494695, 1583494720), (2, 1583494780, 1583494790)])
+    schedule_diff = diff_bag_schedules(old_schedule, new_schedule)
+    print(schedule_diff.get_summary())
+    [event.print_bag_event() for event in schedule_diff.get_removed_bag_events()]
+    [event.print_bag_event() for event in schedule_diff.get_inserted_bag_events()]
+    print("New index of the first event: ", schedule_diff.get_new_index(0))
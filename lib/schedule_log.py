@@ -0,0 +1,110 @@
+"""
+Package containing methods for logging bag, valve and pump schedules. Schedules are only formatted when the message is
+actually written, large schedules are logged as a summary and complete schedules can be written to a separate file.
+"""
+
+import hashlib
+import logging
+
+# schedules with more events are logged as a summary
+MAX_LOGGED_EVENTS = 10
+# name of the logger that writes complete schedules, see `enable_full_schedule_dumps`
+SCHEDULE_DUMP_LOGGER_NAME = "schedule dump logger"
+
+_dump_logger = logging.getLogger(SCHEDULE_DUMP_LOGGER_NAME)
+_dump_logger.propagate = False
+_dump_logger.setLevel(logging.INFO)
+
+class ScheduleDump():
+    """
+    Class for formatting a schedule when a log message that contains it is written.
+    """
+    __slots__ = ["events", "format_event", "formatted_events"]
+
+    def __init__(self, events, format_event):
+        """
+        :param events: iterable of `BagEvent`, `ValveEvent` or `PumpEvent` objects, iterated at most once
+        :param format_event: function that converts an event to a list of values that are logged
+        """
+        self.events = events
+        self.format_event = format_event
+        self.formatted_events = None
+
+    def get_formatted_events(self):
+        """
+        :return: list of lists of values representing the events, created only once
+        """
+        if self.formatted_events is None:
+            self.formatted_events = [self.format_event(event) for event in self.events]
+        return self.formatted_events
+
+    def get_hash(self):
+        """
+        :return: string representing the hexadecimal SHA-256 digest of the complete schedule as written by
+        `get_complete_dump`
+        """
+        return hashlib.sha256(self.get_complete_dump().encode()).hexdigest()
+
+    def get_summary(self):
+        """
+        :return: string representing the schedule, or the number of events, the first and the last event and the hash
+        of the schedule if it contains more than `MAX_LOGGED_EVENTS` events
+        """
+        formatted_events = self.get_formatted_events()
+        if len(formatted_events) <= MAX_LOGGED_EVENTS:
+            return str(formatted_events)
+        return "{} events, first: {}, last: {}, SHA-256: {}".format(len(formatted_events), formatted_events[0],
+                                                                    formatted_events[-1], self.get_hash())
+
+    def get_complete_dump(self):
+        """
+        :return: string representing all events of the schedule, one event per line
+        """
+        return "\n".join(str(formatted_event) for formatted_event in self.get_formatted_events())
+
+    def __str__(self):
+        return self.get_summary()
+
+class _CompleteDump():
+    """
+    Class for writing all events of a `ScheduleDump` object when a log message that contains it is written.
+    """
+    __slots__ = ["schedule_dump"]
+
+    def __init__(self, schedule_dump):
+        self.schedule_dump = schedule_dump
+
+    def __str__(self):
+        return self.schedule_dump.get_complete_dump()
+
+def log_schedule(logger, message, events, format_event):
+    """
+    Logs the summary of a schedule to `logger` at INFO level and the complete schedule to the schedule dump logger at
+    DEBUG level. The events are formatted only if one of the messages is written.
+    :param logger: `logging.Logger` object
+    :param message: string representing the message that precedes the schedule
+    :param events: iterable of `BagEvent`, `ValveEvent` or `PumpEvent` objects
+    :param format_event: function that converts an event to a list of values that are logged
+    """
+    schedule_dump = ScheduleDump(events, format_event)
+    logger.info("%s: %s", message, schedule_dump)
+    _dump_logger.debug("%s:\n%s", message, _CompleteDump(schedule_dump))
+
+def enable_full_schedule_dumps(file_path):
+    """
+    Writes complete schedules to a separate file. By default, only the summaries logged by `log_schedule` are written.
+    :param file_path: string representing the path to the file
+    """
+    file_handler = logging.FileHandler(file_path)
+    file_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    _dump_logger.addHandler(file_handler)
+    _dump_logger.setLevel(logging.DEBUG)
+    logging.info("schedule_log.py: complete schedules are written to {}".format(file_path))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s %(message)s", level=logging.DEBUG)
+    logger = logging.getLogger("main logger")
+    enable_full_schedule_dumps("/tmp/schedule_dump.log")
+    log_schedule(logger, "schedule_log.py: small schedule", list(range(3)), lambda event: [event])
+    log_schedule(logger, "schedule_log.py: large schedule", list(range(100)), lambda event: [event])
@@ -0,0 +1,71 @@
+"""
+Package containing methods for converting schedule times to and from integer representations. Schedule times have a
+precision of one millisecond, so they are stored as integers representing milliseconds.
+"""
+
+from datetime import datetime, timedelta
+import re
+
+# schedule times are naive local times, so they are counted from a naive epoch to avoid time zone and DST conversions
+SCHEDULE_EPOCH = datetime(1970, 1, 1)
+ONE_MILLISECOND = timedelta(milliseconds=1)
+# number of seconds with at most three decimal places, e.g. `5` or `0.25`
+_SECONDS = re.compile(r"\s*(\d+)(?:\.(\d{1,3}))?\s*", re.ASCII)
+
+def datetime_to_milliseconds(time):
+    """
+    :param time: `datetime` object, microseconds below a whole millisecond are truncated
+    :return: integer representing the number of milliseconds between `SCHEDULE_EPOCH` and `time`
+    """
+    return (time - SCHEDULE_EPOCH) // ONE_MILLISECOND
+
+def truncate_to_milliseconds(time):
+    """
+    :param time: `datetime` object
+    :return: `datetime` object representing `time` without the microseconds below a whole millisecond
+    """
+    return time.replace(microsecond=time.microsecond // 1000 * 1000)
+
+def milliseconds_to_datetime(milliseconds):
+    """
+    :param milliseconds: integer representing the number of milliseconds since `SCHEDULE_EPOCH`
+    :return: `datetime` object
+    """
+    return SCHEDULE_EPOCH + timedelta(milliseconds=milliseconds)
+
+def timedelta_to_milliseconds(duration):
+    """
+    :param duration: `timedelta` object representing a whole number of milliseconds
+    :return: integer representing the number of milliseconds in `duration`
+    """
+    return duration // ONE_MILLISECOND
+
+def string_to_timedelta(number_of_seconds):
+    """
+    :param number_of_seconds: string representing a non-negative number of seconds with at most three decimal places,
+    e.g. "5" or "0.25"
+    :return: `timedelta` object
+    :raise ValueError: when `number_of_seconds` isn't in the required format
+    """
+    match = _SECONDS.fullmatch(number_of_seconds)
+    if match is None:
+        raise ValueError("invalid number of seconds `{}`".format(number_of_seconds))
+    seconds, fraction = match.groups()
+    return timedelta(seconds=int(seconds), milliseconds=int((fraction or "").ljust(3, "0")))
+
+def format_time(time):
+    """
+    :param time: `datetime` object
+    :return: string representing `time` in format `YYYY-MM-DD hh:mm:ss`, followed by `.fff` if `time` isn't a whole
+    second
+    """
+    if time.microsecond:
+        return time.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    return time.strftime("%Y-%m-%d %H:%M:%S")
+
+if __name__ == "__main__":
+    time = datetime(2020, 3, 6, 11, 38, 15, 250000)
+    milliseconds = datetime_to_milliseconds(time)
+    print("Milliseconds since epoch: ", milliseconds)
+    print("Converted back: ", format_time(milliseconds_to_datetime(milliseconds)))
+    print("Lead time: ", string_to_timedelta("0.25"))
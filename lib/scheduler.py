@@ -0,0 +1,245 @@
+"""
+Package for executing actuator events at their scheduled times.
+"""
+
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import threading
+
+from clock import *
+
+class Scheduler():
+    """
+    Class for executing a stream of actuator events (`ValveEvent` and `PumpEvent` objects sorted by time) with a
+    `Sampler` object. Instead of checking the time periodically, the scheduler sleeps until the next event is due. Other
+    threads (or signal handlers) can wake it up early to reload the schedule or to stop it. The scheduler either runs in
+    its own thread (`run`) or as a task of an asyncio event loop (`run_async`). The time is read from a clock object,
+    a `VirtualClock` replays a schedule without waiting in real time.
+
+    The time until the next event is converted to an absolute deadline of the monotonic clock when the current time is
+    read, so the time spent executing due events isn't added to the wait and events are executed within milliseconds
+    of their scheduled times.
+
+    Events that are due are always executed, including events whose time already passed (e.g. because executing an
+    earlier event took long), so no event is skipped.
+    """
+    __slots__ = ["actuator_events", "next_event", "sampler", "logger", "max_sleep", "actuation_latency", "clock",
+                 "checkpoint_journal",
+                 "wake_up_event", "async_wake_up_event", "loop", "reload_requested", "shutdown_requested"]
+
+    # the scheduler wakes up at least this often, so a change of the system time (e.g. when the Pi synchronizes its
+    # clock after boot) delays an event by at most `max_sleep`
+    DEFAULT_MAX_SLEEP = timedelta(hours=1)
+
+    def __init__(self, actuator_events, sampler, logger, max_sleep=DEFAULT_MAX_SLEEP, actuation_latency=None,
+                 clock=None, checkpoint_journal=None):
+        """
+        :param actuator_events: iterator over actuator events sorted by time
+        :param sampler: `Sampler` object that executes the events
+        :param logger: `logging.Logger` object used for logging actions of the object
+        :param max_sleep: `timedelta` object representing the longest time the scheduler sleeps without checking the
+        time
+        :param actuation_latency: `ActuationLatency` object that records the timing of executed events, or None if the
+        timing isn't recorded
+        :param clock: `SystemClock` or `VirtualClock` object that the time is read from, `SystemClock` if None
+        :param checkpoint_journal: `CheckpointJournal` object that records executed events, or None
+        """
+        self.set_logger(logger)
+        self.set_max_sleep(max_sleep)
+        self.actuation_latency = actuation_latency
+        self.clock = SystemClock() if clock is None else clock
+        self.checkpoint_journal = checkpoint_journal
+        self.wake_up_event = threading.Event()
+        self.async_wake_up_event = None
+        self.loop = None
+        self.reload_requested = False
+        self.shutdown_requested = False
+        self.set_actuator_events(actuator_events, sampler)
+
+    def set_logger(self, logger):
+        """
+        :param logger: `logging.Logger` object used for logging actions of the object
+        """
+        assert(isinstance(logger, logging.Logger))
+        self.logger = logger
+
+    def set_max_sleep(self, max_sleep):
+        """
+        :param max_sleep: `timedelta` object representing the longest time the scheduler sleeps without checking the
+        time
+        """
+        assert(isinstance(max_sleep, timedelta) and max_sleep > timedelta(0))
+        self.max_sleep = max_sleep
+
+    def set_actuator_events(self, actuator_events, sampler):
+        """
+        Replaces the stream of actuator events, e.g. after the schedule was reloaded. A running scheduler is woken up, so
+        it waits for the first event of the new stream.
+        :param actuator_events: iterator over actuator events sorted by time
+        :param sampler: `Sampler` object that executes the events
+        """
+        self.actuator_events = actuator_events
+        self.sampler = sampler
+        self.next_event = next(self.actuator_events, None)
+        self.__wake_up()
+
+    def get_next_event(self):
+        """
+        :return: the next actuator event that will be executed, or None if all events were executed
+        """
+        return self.next_event
+
+    def request_reload(self):
+        """
+        Wakes up the scheduler and makes `run` return "reload". Can be called from any thread.
+        """
+        self.reload_requested = True
+        self.__wake_up()
+
+    def request_shutdown(self):
+        """
+        Wakes up the scheduler and makes `run` return "shutdown". Can be called from any thread or a signal handler.
+        """
+        self.shutdown_requested = True
+        self.__wake_up()
+
+    def __wake_up(self):
+        self.wake_up_event.set()
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.async_wake_up_event.set)
+
+    def __get_stop_reason(self):
+        """
+        :return: string "shutdown" or "reload" if it was requested, otherwise None
+        """
+        if self.shutdown_requested:
+            return "shutdown"
+        if self.reload_requested:
+            self.reload_requested = False
+            return "reload"
+        return None
+
+    def execute_due_events(self, current_time):
+        """
+        Executes all events with time at or before `current_time` in the order of the stream.
+        :param current_time: `datetime` object
+        :return: integer representing the number of executed events
+        """
+        executed_events = 0
+        while self.next_event is not None and self.next_event.get_time() <= current_time:
+            delay = current_time - self.next_event.get_time()
+            if delay >= timedelta(seconds=1):
+                self.logger.warning("scheduler.py: event `{}` at {} executed {} late"
+                                    .format(self.next_event.get_action(), self.next_event.get_time(), delay))
+            self.__execute_event(self.next_event)
+            executed_events += 1
+            self.next_event = next(self.actuator_events, None)
+        return executed_events
+
+    def __execute_event(self, event):
+        """
+        Executes `event`, records its timing if `self.actuation_latency` is set and appends it to
+        `self.checkpoint_journal` if it is set.
+        :param event: `ValveEvent` or `PumpEvent` object
+        """
+        if self.actuation_latency is None:
+            event.execute(self.sampler)
+        else:
+            self.__execute_timed_event(event)
+        if self.checkpoint_journal is not None:
+            self.checkpoint_journal.record_event(event)
+
+    def __execute_timed_event(self, event):
+        """
+        Executes `event` and records its timing with `self.actuation_latency`.
+        :param event: `ValveEvent` or `PumpEvent` object
+        """
+        dispatch_time = self.clock.monotonic()
+        scheduled_time = dispatch_time - (self.clock.now() - event.get_time()).total_seconds()
+        write_time = event.execute(self.sampler)
+        if write_time is None:
+            write_time = self.clock.monotonic()
+        self.actuation_latency.record_event(event, scheduled_time, dispatch_time, write_time)
+
+    def __read_clock(self):
+        """
+        :return: tuple (`datetime` object representing the current time, float representing the monotonic time read
+        together with it)
+        """
+        return self.clock.now(), self.clock.monotonic()
+
+    def get_time_until_next_event(self, current_time):
+        """
+        :param current_time: `datetime` object
+        :return: `timedelta` object representing the time until the next event (at least zero, at most `max_sleep`),
+        or `max_sleep` if there are no more events
+        """
+        if self.next_event is None:
+            return self.max_sleep
+        return max(timedelta(0), min(self.max_sleep, self.next_event.get_time() - current_time))
+
+    def get_deadline(self, current_time, current_monotonic_time):
+        """
+        :param current_time: `datetime` object
+        :param current_monotonic_time: float representing the time of the monotonic clock read together with
+        `current_time`
+        :return: float representing the time of the monotonic clock when the scheduler wakes up for the next event
+        """
+        return current_monotonic_time + self.get_time_until_next_event(current_time).total_seconds()
+
+    def run(self):
+        """
+        Executes events until all of them are executed or until the scheduler is woken up by `request_reload` or
+        `request_shutdown`. The waiting uses a deadline of the monotonic clock, the time of the next event is checked
+        again after every wake up.
+        :return: string representing the reason why the scheduler stopped, "finished", "reload" or "shutdown"
+        """
+        while True:
+            # clear the event before checking the flags, so a request made after the check interrupts the wait below
+            self.wake_up_event.clear()
+            reason = self.__get_stop_reason()
+            if reason is not None:
+                return reason
+            current_time, current_monotonic_time = self.__read_clock()
+            self.execute_due_events(current_time)
+            if self.next_event is None:
+                return "finished"
+            self.clock.wait_until(self.wake_up_event, self.get_deadline(current_time, current_monotonic_time))
+
+    async def run_async(self):
+        """
+        Same as `run`, but waits without blocking the asyncio event loop it runs in.
+        :return: string representing the reason why the scheduler stopped, "finished", "reload" or "shutdown"
+        """
+        self.loop = asyncio.get_running_loop()
+        self.async_wake_up_event = asyncio.Event()
+        while True:
+            self.async_wake_up_event.clear()
+            reason = self.__get_stop_reason()
+            if reason is not None:
+                return reason
+            current_time, current_monotonic_time = self.__read_clock()
+            self.execute_due_events(current_time)
+            if self.next_event is None:
+                return "finished"
+            await self.clock.wait_until_async(self.async_wake_up_event,
+                                              self.get_deadline(current_time, current_monotonic_time))
+
+
+if __name__ == "__main__":
+    from pump_event import *
+
+    class PrintingSampler():
+        def turn_pump_on(self):
+            print(datetime.now(), "\t turn pump on")
+
+        def turn_pump_off(self):
+            print(datetime.now(), "\t turn pump off")
+
+    logging.basicConfig(format="%(asctime)s %(message)s", level=logging.DEBUG)
+    start_time = datetime.now().replace(microsecond=0) + timedelta(seconds=1)
+    pump_events = iter([PumpEvent(start_time, "turn pump on"),
+                        PumpEvent(start_time + timedelta(milliseconds=250), "turn pump off")])
+    scheduler = Scheduler(pump_events, PrintingSampler(), logging.getLogger("logger"))
+    print("Stopped: ", scheduler.run())
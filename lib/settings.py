@@ -2,12 +2,55 @@
 Package containing methods for setting Pi and its GPIOs.
 """
 
-import RPi.GPIO as GPIO
+from gpio_backend import GPIO
 import logging
 import validate
 
 from subprocess import call
 
+# pins driven low by `reset_gpio_pins` when no hardware configuration was read, BCM numbers 0-27
+ALL_GPIO_PIN_NUMBERS = list(range(0, 28))
+
+class GPIOResetPlan():
+    """
+    Class for storing the GPIO pins that `reset_gpio_pins` drives low. The plan of a hardware configuration contains
+    only the pins of the pump, the valves and the diode, so pins of unrelated HATs and the DIP switch inputs are left
+    alone and the pump is turned off first.
+    """
+    __slots__ = ["mode", "pin_numbers"]
+
+    def __init__(self, mode, pin_numbers):
+        """
+        :param mode: string representing Pi's numbering mode of `pin_numbers`, must be "BCM" or "BOARD"
+        :param pin_numbers: list of integers representing valid GPIO pin numbers in the order they are reset
+        """
+        assert(mode == "BCM" or mode == "BOARD")
+        assert(all(validate.is_valid_GPIO_pin_number(pin_number, mode) for pin_number in pin_numbers))
+        self.mode = mode
+        self.pin_numbers = list(pin_numbers)
+
+    def execute(self):
+        """
+        Sets the pins of the plan as outputs driven low with one GPIO call.
+        """
+        set_board_numbering_mode(self.mode)
+        GPIO.setup(self.pin_numbers, GPIO.OUT, initial=GPIO.LOW)
+
+_FULL_RESET_PLAN = GPIOResetPlan("BCM", ALL_GPIO_PIN_NUMBERS)
+_reset_plan = None
+
+def set_gpio_reset_plan(hardware_configuration):
+    """
+    Makes `reset_gpio_pins` reset only the pins used by the hardware configuration.
+    :param hardware_configuration: `HardwareConfiguration` object, or None to reset all pins again
+    """
+    global _reset_plan
+    if hardware_configuration is None:
+        _reset_plan = None
+    else:
+        _reset_plan = GPIOResetPlan(hardware_configuration.get_numbering_mode(),
+                                    hardware_configuration.get_output_pin_numbers())
+
 def set_board_numbering_mode(mode):
     """
     Sets board numbering mode to either "BCM" (the GPIO is identified by the number that is used by Broadcom, the
@@ -29,14 +72,33 @@ def disable_gpio_warnings():
 
 def reset_gpio_pins():
     """
-    Sets all GPIO pins as output and sets the outputs to False.
+    Sets the GPIO pins of the hardware configuration set by `set_gpio_reset_plan` as output and sets the outputs to
+    False. All GPIO pins are reset if no hardware configuration was set or if the pins were set up in another numbering
+    mode than the mode of the configuration.
     """
     disable_gpio_warnings()
-    set_board_numbering_mode("BCM")
-    for pin_number in range(0, 28):
-        GPIO.setup(pin_number, GPIO.OUT)
-        GPIO.output(pin_number, 0)
-    logging.info("settings.py: set all GPIOs as output pin and set the outputs to False")
+    plan = _reset_plan
+    if plan is not None and GPIO.getmode() not in (None, _get_gpio_mode(plan.mode)):
+        logging.warning("settings.py: GPIO numbering mode differs from the hardware configuration, resetting all GPIOs")
+        plan = None
+    if plan is None:
+        # the numbering mode can't be changed once it is set, so the BCM numbers of all pins are used only if no other
+        # mode was set
+        if GPIO.getmode() not in (None, GPIO.BCM):
+            GPIO.cleanup()
+        _FULL_RESET_PLAN.execute()
+        logging.info("settings.py: set all GPIOs as output pin and set the outputs to False")
+    else:
+        plan.execute()
+        logging.info("settings.py: set GPIOs {} {} as output pins and set the outputs to False"
+                     .format(plan.pin_numbers, plan.mode))
+
+def _get_gpio_mode(mode):
+    """
+    :param mode: string representing Pi's numbering mode, must be "BCM" or "BOARD"
+    :return: `GPIO.BCM` or `GPIO.BOARD`
+    """
+    return GPIO.BCM if mode == "BCM" else GPIO.BOARD
 
 
 def reset_gpio_pin(pin_number, mode):
@@ -0,0 +1,139 @@
+"""
+Package for replaying a schedule against virtual time. The simulation drives `SamplerSchedule` and `Scheduler` like
+`main.py` does, but with a `VirtualClock` and a `Sampler` on the fake GPIO backend, whose recorder stamps every GPIO
+transition with the virtual time. A schedule of several months is replayed in seconds.
+
+Usage (the trace file is optional):
+    python3 simulation.py <schedule file> <configuration file> [<trace file>]
+"""
+
+from datetime import datetime, timedelta
+from itertools import chain
+import logging
+import sys
+import time
+
+from clock import *
+from gpio_backend import *
+from sampler import *
+from sampler_schedule import *
+from scheduler import *
+
+_BCM_PIN_NUMBERS = range(0, 28)
+
+def get_simulated_pin_numbers(bag_numbers):
+    """
+    Assigns BCM pin numbers to the pump and the valves of the bags in a schedule, the fake GPIO backend doesn't
+    depend on the wiring of a real sampler.
+    :param bag_numbers: iterable of integers representing bag numbers
+    :return: integer representing the pump pin number, dictionary containing bag numbers (integers) as keys and valve
+    pin numbers (integers) as values
+    """
+    bag_numbers = sorted(set(bag_numbers))
+    assert(len(bag_numbers) < len(_BCM_PIN_NUMBERS))
+    return _BCM_PIN_NUMBERS[0], dict(zip(bag_numbers, _BCM_PIN_NUMBERS[1:]))
+
+class Simulation():
+    """
+    Class for replaying the actuator events of a `SamplerSchedule` object with a `Scheduler` object and a
+    `VirtualClock` object. The events are executed by a `Sampler` object on a `FakeGPIO` object, the trace is read from
+    the transitions of its recorder.
+    """
+    __slots__ = ["schedules_for_sampler", "logger", "clock", "fake_gpio", "pump_pin_number", "pin_to_bag_numbers_dict",
+                 "sampler", "scheduler", "executed_events", "wall_time"]
+
+    def __init__(self, schedules_for_sampler, logger, start_time=None):
+        """
+        :param schedules_for_sampler: `SamplerSchedule` object
+        :param logger: `logging.Logger` object used by the scheduler
+        :param start_time: `datetime` object representing the virtual time when the sampler starts, only future events
+        are executed as in `main.py`. If None, the simulation starts at the first event of the complete schedule.
+        """
+        self.schedules_for_sampler = schedules_for_sampler
+        self.logger = logger
+        if start_time is None:
+            actuator_events = schedules_for_sampler.iter_complete_actuator_events()
+            first_event = next(actuator_events, None)
+            start_time = datetime.now() if first_event is None else first_event.get_time()
+            actuator_events = chain([] if first_event is None else [first_event], actuator_events)
+        else:
+            actuator_events = schedules_for_sampler.iter_current_actuator_events(start_time)
+        self.clock = VirtualClock(start_time)
+        self.fake_gpio = select_gpio_backend("fake", TransitionRecorder(self.clock.monotonic))
+        GPIO.setmode(GPIO.BCM)
+        self.pump_pin_number, bag_to_valve_pin_numbers_dict = get_simulated_pin_numbers(
+            schedules_for_sampler.get_snapshot_bag_schedule().bag_numbers)
+        self.pin_to_bag_numbers_dict = {pin_number: bag for bag, pin_number in bag_to_valve_pin_numbers_dict.items()}
+        self.sampler = Sampler(self.pump_pin_number, bag_to_valve_pin_numbers_dict, "BCM", logger)
+        # setting up the pins drives them low, the trace starts with the first event
+        self.fake_gpio.recorder.clear()
+        self.scheduler = Scheduler(actuator_events, self.sampler, logger, clock=self.clock)
+        self.executed_events = 0
+        self.wall_time = 0.0
+
+    def run(self):
+        """
+        Executes all actuator events in virtual time.
+        :return: string representing the reason why the scheduler stopped, see `Scheduler.run`
+        """
+        wall_start = time.perf_counter()
+        reason = self.scheduler.run()
+        self.wall_time = time.perf_counter() - wall_start
+        self.executed_events = len(self.fake_gpio.recorder)
+        return reason
+
+    def get_trace(self):
+        """
+        :return: list of tuples (`datetime` object, string representing the action, bag number or None) in the order
+        of the GPIO transitions
+        """
+        trace = []
+        for transition_time, pin_number, level in self.fake_gpio.recorder.get_transitions():
+            transition_time = self.clock.start_time + timedelta(seconds=transition_time)
+            if pin_number == self.pump_pin_number:
+                trace.append((transition_time, "turn pump on" if level else "turn pump off", None))
+            else:
+                trace.append((transition_time, "open valve" if level else "close valve",
+                              self.pin_to_bag_numbers_dict[pin_number]))
+        return trace
+
+    def write_trace(self, file_path):
+        """
+        Writes one transition per line, so the traces of two versions of the program can be compared with `diff`.
+        :param file_path: string representing the path to the trace file
+        """
+        with open(file_path, "w") as trace_file:
+            for transition_time, action, bag_number in self.get_trace():
+                trace_file.write("{}\t{}\t{}\n".format(transition_time.isoformat(sep=" "), action,
+                                                       "" if bag_number is None else bag_number))
+
+    def get_summary(self):
+        """
+        :return: string representing the number of executed events, the simulated time span and the dispatch
+        throughput
+        """
+        events_per_second = self.executed_events / self.wall_time if self.wall_time > 0 else float("inf")
+        return "{} events over {} of virtual time in {:.3f} s ({:.0f} events per second)".format(
+            self.executed_events, self.clock.now() - self.clock.start_time, self.wall_time, events_per_second)
+
+
+if __name__ == "__main__":
+    from configuration import *
+
+    if len(sys.argv) not in (3, 4):
+        print(__doc__)
+        sys.exit(1)
+    logging.basicConfig(format="%(asctime)s %(message)s", level=logging.WARNING)
+    logger = logging.getLogger("logger")
+    configuration = Configuration(sys.argv[2], logger, logger)
+    schedules_for_sampler = SamplerSchedule(sys.argv[1],
+                                            configuration.get_pump_starts_before(),
+                                            configuration.get_pump_stops_after(),
+                                            configuration.get_pump_time_off_tolerance(),
+                                            logger,
+                                            logger)
+    simulation = Simulation(schedules_for_sampler, logger)
+    print("Stopped: ", simulation.run())
+    print(simulation.get_summary())
+    if len(sys.argv) == 4:
+        simulation.write_trace(sys.argv[3])
@@ -3,12 +3,20 @@ Package for a USB drive.
 """
 
 from os import listdir
-from os.path import isfile, join
+from os.path import isfile, ismount, join
+import asyncio
 import logging
+import time
+
+from media_watcher import *
 
 class USB_drive():
     """
     Class for reading the configuration and schedule files.
+
+    The name of the inserted USB drive and the list of its files are cached when the drive is found, so the paths to
+    the files are created without accessing the file system. `watch_async` updates the cache when the drive is inserted
+    or removed.
     """
 
     def __init__(self, logger, path = "/media/pi"):
@@ -18,6 +26,12 @@ class USB_drive():
         self.set_logger(logger)
         self.path = path
         self.inserted = False
+        self.usb_name = None
+        self.file_names = set()
+        # message of the last failure to list the mount folder, so a failure that lasts is logged only once
+        self.listing_error = None
+        # number of seconds to wait for a new USB drive to be mounted after its folder was created
+        self.mount_timeout = 5
         self.is_inserted()
 
     def set_logger(self, logger):
@@ -29,18 +43,49 @@ class USB_drive():
 
     def is_inserted(self):
         """
-        :return: True when exactly one USB drive is inserted, False when no USB drive is inserted
+        :return: True when exactly one USB drive is inserted, False when no USB drive is inserted. When more than one
+        USB drive is inserted or the mount folder can't be listed, the failure is logged and False is returned.
         """
-        inserted_USBs = [usb for usb in listdir(self.path)]
-        assert(len(inserted_USBs) == 0 or len(inserted_USBs) == 1)
-        if len(inserted_USBs) == 0:
-            self.usb_name = None
-            self.inserted = False
+        try:
+            inserted_USBs = listdir(self.path)
+        except OSError as error:
+            self.__log_listing_error("can't list {} ({})".format(self.path, error))
+            inserted_USBs = []
         else:
-            self.usb_name = inserted_USBs[0]
-            self.inserted = True
+            if len(inserted_USBs) > 1:
+                self.__log_listing_error("{} USB drives are inserted ({}), only one USB drive can be inserted"
+                                         .format(len(inserted_USBs), ", ".join(sorted(inserted_USBs))))
+                inserted_USBs = []
+            else:
+                self.__log_listing_error(None)
+        if len(inserted_USBs) == 0:
+            self.__set_usb_name(None)
+        elif inserted_USBs[0] != self.usb_name:
+            self.__set_usb_name(inserted_USBs[0])
         return self.inserted
 
+    def __log_listing_error(self, message):
+        """
+        Logs a failure to list the mount folder when it differs from the previous one.
+        :param message: string representing the failure, or None if the folder was listed successfully
+        """
+        if message is not None and message != self.listing_error:
+            self.logger.error("usb_drive.py: {}".format(message))
+        self.listing_error = message
+
+    def __set_usb_name(self, usb_name):
+        """
+        Updates the cached name and list of files of the inserted USB drive.
+        :param usb_name: string representing the name of the folder of the USB drive, None if no USB drive is inserted
+        """
+        self.usb_name = usb_name
+        self.inserted = usb_name is not None
+        if usb_name is None:
+            self.file_names = set()
+        else:
+            usb_path = join(self.path, usb_name)
+            self.file_names = {file for file in listdir(usb_path) if isfile(join(usb_path, file))}
+
     def was_reinserted(self):
         """
         :return: True when a USB drive previously wasn't inserted and now is inserted, False otherwise
@@ -53,12 +98,97 @@ class USB_drive():
         else:
             return False
 
+    async def watch_async(self, on_reinsertion, on_removal=None, poll_interval=1):
+        """
+        Calls `on_reinsertion` when a USB drive is inserted and `on_removal` when it is removed, never returns. The
+        mount folder is watched with inotify, so an insertion is noticed within milliseconds and the folder is only
+        listed when it changes. If inotify isn't available or the folder can't be watched (e.g. it was deleted and the
+        kernel removed the watch), the folder is listed every `poll_interval` seconds and watching it is tried again.
+        :param on_reinsertion: function without arguments that is called when a USB drive is reinserted
+        :param on_removal: function without arguments that is called when the USB drive is removed, or None
+        :param poll_interval: number of seconds between two checks when the folder isn't watched
+        """
+        watch_error = None
+        while True:
+            try:
+                media_watcher = MediaWatcher(self.path, self.logger)
+            except OSError as error:
+                if str(error) != watch_error:
+                    self.logger.warning("usb_drive.py: can't watch {} ({}), checking it every {} s instead"
+                                        .format(self.path, error, poll_interval))
+                    watch_error = str(error)
+                self.__notify_change(self.inserted, on_reinsertion, on_removal)
+                await asyncio.sleep(poll_interval)
+                continue
+            watch_error = None
+            await self.__watch_media_folder(media_watcher, on_reinsertion, on_removal)
+            self.logger.warning("usb_drive.py: stopped watching {}, watching it again".format(self.path))
+
+    async def __watch_media_folder(self, media_watcher, on_reinsertion, on_removal):
+        """
+        Calls `on_reinsertion` and `on_removal` for changes reported by `media_watcher` until the kernel removes its
+        watch. `media_watcher` is closed before returning.
+        :param media_watcher: `MediaWatcher` object watching `self.path`
+        """
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        loop.add_reader(media_watcher.fileno(), changed.set)
+        try:
+            # the USB drive might have been inserted or removed before the watch was added
+            self.__notify_change(self.inserted, on_reinsertion, on_removal)
+            while media_watcher.is_watching():
+                await changed.wait()
+                changed.clear()
+                for change, usb_name in media_watcher.read_changes():
+                    if change == "removed" and usb_name is not None:
+                        # the folder may already be created again, so the removal is applied without listing it
+                        if usb_name == self.usb_name:
+                            self.__set_usb_name(None)
+                            self.__notify_change(True, on_reinsertion, on_removal, list_folder=False)
+                        continue
+                    if change == "inserted":
+                        await self.__wait_until_mounted(join(self.path, usb_name))
+                    self.__notify_change(self.inserted, on_reinsertion, on_removal)
+        finally:
+            loop.remove_reader(media_watcher.fileno())
+            media_watcher.close()
+
+    def __notify_change(self, previously_was_inserted, on_reinsertion, on_removal, list_folder=True):
+        """
+        Lists the mount folder again and calls `on_reinsertion` or `on_removal` if the USB drive was inserted or removed.
+        :param previously_was_inserted: True if a USB drive was inserted before, otherwise False
+        :param list_folder: False if the cached state is already up to date
+        """
+        now_is_inserted = self.is_inserted() if list_folder else self.inserted
+        if previously_was_inserted == False and now_is_inserted == True:
+            self.logger.info("usb_drive.py: a new USB was inserted")
+            on_reinsertion()
+        elif previously_was_inserted == True and now_is_inserted == False:
+            self.logger.info("usb_drive.py: the USB was removed")
+            if on_removal is not None:
+                on_removal()
+
+    async def __wait_until_mounted(self, usb_path):
+        """
+        Waits until the file system of a new USB drive is mounted, the folder of the drive is created before that.
+        :param usb_path: string representing the path to the folder of the USB drive
+        """
+        deadline = time.monotonic() + self.mount_timeout
+        while time.monotonic() < deadline:
+            try:
+                if ismount(usb_path) or listdir(usb_path):
+                    return
+            except OSError:
+                return
+            await asyncio.sleep(0.01)
+        self.logger.warning("usb_drive.py: {} wasn't mounted within {} s".format(usb_path, self.mount_timeout))
+
     def get_list_of_files(self):
         """
         :return: list of files on the inserted USB drive
         """
-        assert(self.is_inserted())
-        return [file for file in listdir(join(self.path, self.usb_name)) if isfile(join(self.path, self.usb_name, file))]
+        assert(self.inserted)
+        return sorted(self.file_names)
 
     def get_path_for_configuration_file(self, ID):
         """
@@ -67,10 +197,10 @@ class USB_drive():
         :return: string representing the path to the configuration file "<path_to_USB>/<ID>_config.txt>
         E.g."/media/pi/my_usb/90_config.txt"
         """
-        assert(self.is_inserted())
+        assert(self.inserted)
         configuration_file = str(ID) + "_config.txt"
         path_to_configuration_file = join(self.path, self.usb_name, configuration_file)
-        assert(isfile(path_to_configuration_file))
+        assert(configuration_file in self.file_names)
         return path_to_configuration_file
 
     def get_path_for_schedule_file(self, ID):
@@ -80,10 +210,10 @@ class USB_drive():
         :return: string representing the path to the schedule file "<path_to_USB>/<ID>_schedule.txt>
         E.g."/media/pi/my_usb/90_schedule.txt"
         """
-        assert(self.is_inserted())
+        assert(self.inserted)
         schedule_file = str(ID) + "_schedule.txt"
         path_to_schedule_file = join(self.path, self.usb_name, schedule_file)
-        assert(isfile(path_to_schedule_file))
+        assert(schedule_file in self.file_names)
         return path_to_schedule_file
 
     def get_path_to_usb(self):
@@ -91,7 +221,7 @@ class USB_drive():
         Creates path to the USB drive
         :return: string representing the path to the USB drive
         """
-        assert(self.is_inserted())
+        assert(self.inserted)
         return join(self.path, self.usb_name)
 
 if __name__ == "__main__":
@@ -2,7 +2,7 @@
 Package for a valve.
 """
 
-import RPi.GPIO as GPIO
+from gpio_backend import GPIO
 import time
 import logging
 
@@ -12,6 +12,10 @@ import validate
 class Valve():
     """
     Class for storing information about a valve event.
+
+    The state of the valve is cached, so opening an open valve or closing a closed valve doesn't write the GPIO pin.
+    The state is unknown (None) until the pin is written for the first time, because setting up the pin doesn't change
+    its level.
     """
     __slots__ = ["valve_pin_number", "valve_open", "mode", "logger"]
 
@@ -48,19 +52,38 @@ class Valve():
         Sets the specified GPIO pin as an output pin.
         """
         GPIO.setup(self.valve_pin_number, GPIO.OUT)
-        self.valve_open = False
+        self.valve_open = None
 
     def open_valve(self):
+        """
+        :return: float representing the time of `time.monotonic()` when the GPIO pin was written, or None if the valve
+        was already open and the pin wasn't written
+        """
+        if self.valve_open == True:
+            return None
         GPIO.output(self.valve_pin_number, 1)
+        write_time = time.monotonic()
         self.valve_open = True
         self.logger.info("valve: valve opened (GPIO number {} {})".format(self.valve_pin_number, self.mode))
+        return write_time
 
     def close_valve(self):
+        """
+        :return: float representing the time of `time.monotonic()` when the GPIO pin was written, or None if the valve
+        was already closed and the pin wasn't written
+        """
+        if self.valve_open == False:
+            return None
         GPIO.output(self.valve_pin_number, 0)
+        write_time = time.monotonic()
         self.valve_open = False
         self.logger.info("valve: valve closed (GPIO number {} {})".format(self.valve_pin_number, self.mode))
+        return write_time
 
     def valve_is_open(self):
+        """
+        :return: True when the valve is open, False when it is closed, None when the state is unknown
+        """
         return self.valve_open
 
 if __name__ == "__main__":
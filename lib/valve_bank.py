@@ -0,0 +1,85 @@
+"""
+Package for a bank of valves that are switched together.
+"""
+
+import logging
+import time
+
+from gpio_backend import GPIO
+
+class ValveBank():
+    """
+    Class for switching several `Valve` objects with one GPIO call. `GPIO.output` accepts a list of pins and a list of
+    levels, so all changed valves are switched by one call instead of one call (and one log record) per valve, and
+    multi-valve transitions are as close to simultaneous as the hardware allows.
+    """
+    __slots__ = ["bag_to_valve_objects_dict", "mode", "logger"]
+
+    def __init__(self, bag_to_valve_objects_dict, mode, logger):
+        """
+        :param bag_to_valve_objects_dict: dictionary containing bag numbers (integers) as keys and corresponding `Valve`
+        objects as values, the valves must be set up
+        :param mode: string representing the Pi's numbering mode, must be "BCM" or "BOARD"
+        :param logger: `logging.Logger` object used for logging actions of the object
+        """
+        self.set_logger(logger)
+        self.bag_to_valve_objects_dict = bag_to_valve_objects_dict
+        self.mode = mode
+
+    def set_logger(self, logger):
+        """
+        :param logger: `logging.Logger` object used for logging actions of the object
+        """
+        assert(isinstance(logger, logging.Logger))
+        self.logger = logger
+
+    def get_open_bags(self):
+        """
+        :return: set of integers representing the bags whose valves are open
+        """
+        return {bag for bag, valve in self.bag_to_valve_objects_dict.items() if valve.valve_is_open()}
+
+    def apply_target_state(self, open_bags, write_all=False):
+        """
+        Opens the valves of `open_bags` and closes all other valves with one GPIO call. Only valves whose state changes
+        or is unknown are written unless `write_all` is True.
+        :param open_bags: iterable of integers representing the bags whose valves are open after the call
+        :param write_all: True to write all valve pins, e.g. to re-assert the state after a glitch
+        :return: float representing the time of `time.monotonic()` when the GPIO pins were written, or None if all
+        valves were already in the target state and no pin was written
+        """
+        open_bags = set(open_bags)
+        assert(open_bags <= self.bag_to_valve_objects_dict.keys())
+        changed_valves = [(bag, valve) for bag, valve in sorted(self.bag_to_valve_objects_dict.items())
+                          if write_all or valve.valve_is_open() != (bag in open_bags)]
+        if not changed_valves:
+            return None
+        GPIO.output([valve.valve_pin_number for _, valve in changed_valves],
+                    [int(bag in open_bags) for bag, _ in changed_valves])
+        write_time = time.monotonic()
+        for bag, valve in changed_valves:
+            valve.valve_open = bag in open_bags
+        self.logger.info("valve_bank.py: opened valves of bags {}, closed valves of bags {} (GPIO numbers {} {})"
+                         .format([bag for bag, _ in changed_valves if bag in open_bags],
+                                 [bag for bag, _ in changed_valves if bag not in open_bags],
+                                 [valve.valve_pin_number for _, valve in changed_valves], self.mode))
+        return write_time
+
+    def close_all_valves(self):
+        """
+        Closes all valves that aren't known to be closed.
+        :return: float representing the time of `time.monotonic()` when the GPIO pins were written, or None if all
+        valves were already closed
+        """
+        return self.apply_target_state(())
+
+
+if __name__ == "__main__":
+    from valve import *
+    logging.basicConfig(format="%(asctime)s %(message)s", level=logging.DEBUG)
+    logger = logging.getLogger("logger")
+    valves = {1: Valve(17, "BCM", logger), 2: Valve(22, "BCM", logger), 3: Valve(10, "BCM", logger)}
+    valve_bank = ValveBank(valves, "BCM", logger)
+    valve_bank.apply_target_state({1, 3})
+    time.sleep(10)
+    valve_bank.close_all_valves()
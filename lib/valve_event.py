@@ -69,6 +69,30 @@ class ValveEvent():
         """
         return (self.valve_number, self.valve_time, self.valve_action)
 
+    def get_time(self):
+        """
+        :return: `datetime` object representing the time when the event takes place, common to all actuator events
+        """
+        return self.valve_time
+
+    def get_action(self):
+        """
+        :return: string representing the action of the event, common to all actuator events
+        """
+        return self.valve_action
+
+    def execute(self, sampler):
+        """
+        Opens or closes the valve of the bag.
+        :param sampler: `Sampler` object
+        :return: float representing the time of `time.monotonic()` when the GPIO pin was written, or None if the sampler
+        doesn't report it
+        """
+        if self.valve_action == "open valve":
+            return sampler.open_valve(self.valve_number)
+        else:
+            return sampler.close_valve(self.valve_number)
+
     def print_valve_event(self):
         print(self.valve_number, "\t", self.valve_time, "\t", self.valve_action)
 
@@ -0,0 +1,59 @@
+"""
+Tests for resetting only the GPIO pins of the hardware configuration after the sampler and the diode were created.
+
+Run from the root of the repository:
+    python3 -m pytest tests
+"""
+
+import logging
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+from gpio_backend import *
+from main import *
+import settings
+
+_TESTS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+class GPIOResetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = logging.getLogger("test logger")
+        self.fake_gpio = select_gpio_backend("fake")
+        self.configuration = Configuration(os.path.join(_TESTS_FOLDER, "valid_configuration.txt"), self.logger,
+                                           self.logger)
+        self.hardware_configuration = HardwareConfiguration(os.path.join(_TESTS_FOLDER,
+                                                                         "valid_hardware_configuration_file.txt"),
+                                                            self.logger)
+
+    def tearDown(self):
+        settings.set_gpio_reset_plan(None)
+
+    def test_reset_configured_pins(self):
+        sampler, diode = create_sampler_and_diode(self.configuration, self.hardware_configuration, self.logger)
+        self.assertEqual(diode.get_diode_light_duration_in_seconds(), 3)
+        sampler.turn_pump_on()
+        sampler.open_valve(1)
+        diode.turn_diode_on()
+        # a pin of another HAT, it must keep its level
+        GPIO.setup(5, GPIO.OUT, initial=GPIO.HIGH)
+        with mock.patch.object(FakeGPIO, "setup", autospec=True, side_effect=FakeGPIO.setup) as setup:
+            settings.reset_gpio_pins()
+        setup.assert_called_once_with(self.fake_gpio, [13, 19, 11, 17], GPIO.OUT, initial=GPIO.LOW)
+        for pin_number in (13, 19, 11, 17):
+            self.assertEqual(self.fake_gpio.get_level(pin_number), GPIO.LOW)
+        self.assertEqual(self.fake_gpio.get_level(5), GPIO.HIGH)
+
+    def test_reset_all_pins_without_configuration(self):
+        GPIO.setmode(GPIO.BCM)
+        with mock.patch.object(FakeGPIO, "setup", autospec=True, side_effect=FakeGPIO.setup) as setup:
+            settings.reset_gpio_pins()
+        setup.assert_called_once_with(self.fake_gpio, settings.ALL_GPIO_PIN_NUMBERS, GPIO.OUT, initial=GPIO.LOW)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Tests for sharing parsed schedules between `SamplerSchedule` objects: objects with different pump parameters, files
+changed without changing their size and modification time and compiled schedule files.
+
+Run from the root of the repository:
+    python3 -m pytest tests
+"""
+
+from datetime import timedelta
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+from sampler_schedule import *
+
+_HEADER = "Bag number, Start filling, Stop filling\n"
+# the bags are 20 seconds apart, so the pump turns off between them only with a short pump time off tolerance
+_SCHEDULE_A = _HEADER + "1,  2020-03-06 11:00:00,  2020-03-06 11:00:30\n" \
+                        "2,  2020-03-06 11:00:50,  2020-03-06 11:01:20\n"
+# same size as `_SCHEDULE_A`
+_SCHEDULE_B = _HEADER + "3,  2020-03-06 11:00:00,  2020-03-06 11:00:30\n" \
+                        "4,  2020-03-06 11:00:50,  2020-03-06 11:01:20\n"
+
+class ParsedScheduleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.folder, "90_schedule.txt")
+        self.compiled_file_path = os.path.join(self.folder, "90_schedule.bin")
+        self.logger = logging.getLogger("test logger")
+        SamplerSchedule._parsed_schedules.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+        SamplerSchedule._parsed_schedules.clear()
+
+    def write_schedule(self, content):
+        with open(self.file_path, "w") as schedule_file:
+            schedule_file.write(content)
+        # the modification time of a file edited within the time resolution of the file system doesn't change
+        os.utime(self.file_path, ns=(10 ** 18, 10 ** 18))
+
+    def read_schedule(self, pump_time_off_tolerance, compiled_file_path=None):
+        return SamplerSchedule(self.file_path, timedelta(seconds=5), timedelta(seconds=5),
+                               timedelta(seconds=pump_time_off_tolerance), self.logger, self.logger, compiled_file_path)
+
+    def get_bag_numbers(self, schedule):
+        return [event.get_bag_number() for event in schedule.get_complete_bag_schedule()]
+
+    def test_pump_parameters_are_not_shared(self):
+        self.write_schedule(_SCHEDULE_A)
+        short_tolerance = self.read_schedule(5)
+        long_tolerance = self.read_schedule(20)
+        self.assertIs(short_tolerance.parsed_schedule, long_tolerance.parsed_schedule)
+        self.assertEqual(len(short_tolerance.get_complete_pump_schedule()), 4)
+        self.assertEqual(len(long_tolerance.get_complete_pump_schedule()), 2)
+        # a third object with the same pump parameters reuses the pump intervals
+        self.assertIs(self.read_schedule(5).complete_pump_intervals, short_tolerance.complete_pump_intervals)
+
+    def test_change_without_new_size_and_modification_time(self):
+        self.write_schedule(_SCHEDULE_A)
+        schedule = self.read_schedule(10, self.compiled_file_path)
+        self.assertEqual(self.get_bag_numbers(schedule), [1, 2])
+        self.write_schedule(_SCHEDULE_B)
+        self.assertEqual(self.get_bag_numbers(schedule), [3, 4])
+        # the compiled schedule file of the old content isn't used either
+        SamplerSchedule._parsed_schedules.clear()
+        self.assertEqual(self.get_bag_numbers(self.read_schedule(10, self.compiled_file_path)), [3, 4])
+
+    def test_compiled_schedule_with_other_pump_parameters(self):
+        self.write_schedule(_SCHEDULE_A)
+        self.read_schedule(5, self.compiled_file_path)
+        SamplerSchedule._parsed_schedules.clear()
+        schedule = self.read_schedule(20, self.compiled_file_path)
+        self.assertEqual(self.get_bag_numbers(schedule), [1, 2])
+        self.assertEqual(len(schedule.get_complete_pump_schedule()), 2)
+
+    def test_parsed_schedule_is_immutable(self):
+        self.write_schedule(_SCHEDULE_A)
+        parsed_schedule = self.read_schedule(10).parsed_schedule
+        with self.assertRaises(AttributeError):
+            parsed_schedule.file_mtime = 0
+        with self.assertRaises(AttributeError):
+            parsed_schedule.pump_intervals = None
+
+
+if __name__ == "__main__":
+    unittest.main()
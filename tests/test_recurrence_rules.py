@@ -0,0 +1,131 @@
+"""
+Tests for expanding lines of the schedule file with recurrence rules and for rejecting lines that repeat samples too
+often in total.
+
+Run from the root of the repository:
+    python3 -m pytest tests
+"""
+
+from datetime import datetime, timedelta
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+from sampler_schedule import *
+
+_HEADER = "Bag number, Start filling, Stop filling\n"
+_HOURLY_LINE = "1,  2020-03-06 11:00:00,  2020-03-06 11:30:00,  every 01:00:00,  {}"
+
+class _ListHandler(logging.Handler):
+    """
+    Handler keeping the messages of the user logger.
+    """
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+class RecurrenceRulesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.logger = logging.getLogger("test logger")
+        self.user_logger = logging.getLogger("test user logger")
+        self.user_logger.propagate = False
+        self.user_logger.setLevel(logging.INFO)
+        self.handler = _ListHandler()
+        self.user_logger.addHandler(self.handler)
+        self.max_repeated_samples = SamplerSchedule._max_repeated_samples
+        SamplerSchedule._max_repeated_samples = 1000
+        SamplerSchedule._parsed_schedules.clear()
+
+    def tearDown(self):
+        SamplerSchedule._max_repeated_samples = self.max_repeated_samples
+        self.user_logger.removeHandler(self.handler)
+        shutil.rmtree(self.folder)
+        SamplerSchedule._parsed_schedules.clear()
+
+    def read_schedule(self, lines):
+        file_path = os.path.join(self.folder, "90_schedule.txt")
+        with open(file_path, "w") as schedule_file:
+            schedule_file.write(_HEADER + "".join(line + "\n" for line in lines))
+        return SamplerSchedule(file_path, timedelta(seconds=5), timedelta(seconds=5), timedelta(seconds=10),
+                               self.logger, self.user_logger)
+
+    def test_expansion(self):
+        schedule = self.read_schedule([_HOURLY_LINE.format("720 times"),
+                                       "2,  2020-03-06 11:40:00,  2020-03-06 11:50:00,  every 24:00:00,  "
+                                       "until 2020-03-31 11:40:00"])
+        bag_schedule = schedule.get_snapshot_bag_schedule()
+        self.assertEqual(len(bag_schedule), 720 + 26)
+        self.assertEqual(bag_schedule.get_bag_event(len(bag_schedule) - 1).get_bag_time_on(),
+                         datetime(2020, 4, 5, 10, 0, 0))
+
+    def test_sample_longer_than_interval(self):
+        line = "1,  2020-03-06 11:00:00,  2020-03-06 11:30:00,  every 00:20:00,  3 times"
+        with self.assertRaises(ScheduleFileErrors) as context:
+            self.read_schedule([line])
+        # the line is rejected instead of reporting every pair of overlapping samples
+        self.assertEqual(len(context.exception.message_list), 1)
+        self.assertTrue(context.exception.message_list[0].startswith("- Line 2: Invalid line (`{}`)".format(line)))
+
+    def test_overlap_with_other_line(self):
+        with self.assertRaises(ScheduleFileErrors) as context:
+            self.read_schedule([_HOURLY_LINE.format("3 times"), "2,  2020-03-06 13:20:00,  2020-03-06 13:40:00"])
+        self.assertEqual(len(context.exception.message_list), 1)
+        self.assertIn("`2, 2020-03-06 13:20:00, 2020-03-06 13:40:00`", context.exception.message_list[0])
+
+    def test_maximum_count(self):
+        self.read_schedule([_HOURLY_LINE.format("1000 times")])
+        with self.assertRaises(ScheduleFileErrors) as context:
+            self.read_schedule([_HOURLY_LINE.format("1001 times")])
+        self.assertEqual(context.exception.message_list[0],
+                         "- Line 2: Invalid line (`{}`).\n + Samples in the schedule file are repeated 1001 times up "
+                         "to this line, they can be repeated at most 1000 times."
+                         .format(_HOURLY_LINE.format("1001 times")))
+        self.assertIn(context.exception.message_list[0], self.handler.messages)
+
+    def test_maximum_total(self):
+        lines = [_HOURLY_LINE.format("400 times"),
+                 "2,  2020-03-06 11:40:00,  2020-03-06 11:45:00,  every 01:00:00,  400 times",
+                 "3,  2020-03-06 11:50:00,  2020-03-06 11:55:00,  every 01:00:00,  400 times",
+                 "3,  2020-03-06 11:50:00",
+                 "4,  2020-03-06 11:35:00,  2020-03-06 11:38:00,  every 01:00:00,  200 times"]
+        with self.assertRaises(ScheduleFileErrors) as context:
+            self.read_schedule(lines)
+        # the line that brings the total above the maximum is rejected, later lines still fit, and the invalid lines
+        # are reported in the order of the file
+        self.assertEqual(len(context.exception.message_list), 2)
+        self.assertIn("- Line 4: Invalid line (`{}`).\n + Samples in the schedule file are repeated 1200 times up to "
+                      "this line".format(lines[2]), context.exception.message_list[0])
+        self.assertTrue(context.exception.message_list[1].startswith("- Line 5: Invalid line"))
+        del lines[2:4]
+        self.assertEqual(len(self.read_schedule(lines).get_snapshot_bag_schedule()), 1000)
+
+    def test_maximum_until(self):
+        # hourly samples for 20 years from a tiny file
+        line = _HOURLY_LINE.format("until 2040-03-06 11:00:00")
+        with self.assertRaises(ScheduleFileErrors) as context:
+            self.read_schedule(["3,  2020-03-06 10:00:00,  2020-03-06 10:10:00", line])
+        self.assertEqual(len(context.exception.message_list), 1)
+        self.assertTrue(context.exception.message_list[0].startswith("- Line 3: Invalid line (`{}`).".format(line)))
+        self.assertIn("repeated 175321 times", context.exception.message_list[0])
+
+    def test_rules_are_not_expanded(self):
+        invalid_lines, recurrence_rules = [], []
+        lines = [(2, _HOURLY_LINE.format("10000000 times")), (3, "2,  2020-03-06 10:00:00,  2020-03-06 10:10:00")]
+        bag_records = list(SamplerSchedule.parse_bag_records(lines, invalid_lines, recurrence_rules))
+        self.assertEqual(len(bag_records), 1)
+        self.assertEqual(invalid_lines, [])
+        self.assertEqual(len(recurrence_rules), 1)
+        self.assertEqual(recurrence_rules[0][2][-1], 10000000)
+
+if __name__ == "__main__":
+    unittest.main()
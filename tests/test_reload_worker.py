@@ -0,0 +1,88 @@
+"""
+Tests for reading the files of a reinserted USB drive in a worker thread without module variables of `main.py` and
+without touching the handlers of the "user logger".
+
+Run from the root of the repository:
+    python3 -m pytest tests
+"""
+
+from datetime import datetime, timedelta
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+from main import *
+
+_TESTS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+_ID_NUMBER = 90
+
+class ReloadWorkerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.media_path = tempfile.mkdtemp()
+        self.usb_path = os.path.join(self.media_path, "usb")
+        os.mkdir(self.usb_path)
+        shutil.copy(os.path.join(_TESTS_FOLDER, "valid_configuration.txt"),
+                    os.path.join(self.usb_path, "{}_config.txt".format(_ID_NUMBER)))
+        self.logger = logging.getLogger("test logger")
+        self.user_logger = logging.getLogger("user logger")
+        self.user_handler = logging.NullHandler()
+        self.user_logger.addHandler(self.user_handler)
+        SamplerSchedule._parsed_schedules.clear()
+
+    def tearDown(self):
+        self.user_logger.removeHandler(self.user_handler)
+        for handler in logging.getLogger("reload user logger").handlers[:]:
+            logging.getLogger("reload user logger").removeHandler(handler)
+            handler.close()
+        SamplerSchedule._parsed_schedules.clear()
+        shutil.rmtree(self.media_path)
+
+    def write_schedule(self, *bag_numbers):
+        start_time = datetime.now() + timedelta(days=1)
+        lines = ["Bag number, Start filling, Stop filling"]
+        for index, bag_number in enumerate(bag_numbers):
+            time_on = start_time + timedelta(hours=index)
+            lines.append("{},  {},  {}".format(bag_number, time_on.strftime("%Y-%m-%d %H:%M:%S"),
+                                               (time_on + timedelta(minutes=10)).strftime("%Y-%m-%d %H:%M:%S")))
+        file_path = os.path.join(self.usb_path, "{}_schedule.txt".format(_ID_NUMBER))
+        with open(file_path, "w") as schedule_file:
+            schedule_file.write("\n".join(lines) + "\n")
+        # the new file must not look unchanged because of the same size and modification time
+        os.utime(file_path, ns=(os.stat(file_path).st_atime_ns, os.stat(file_path).st_mtime_ns + 10 ** 9))
+
+    def insert_usb(self):
+        usb = USB_drive(self.logger, self.media_path)
+        self.assertTrue(usb.is_inserted())
+        return usb
+
+    def test_read_in_worker_thread(self):
+        self.write_schedule(1, 2)
+        usb = self.insert_usb()
+        running_schedules_for_sampler = SamplerSchedule(usb.get_path_for_schedule_file(_ID_NUMBER),
+                                                        timedelta(seconds=5), timedelta(seconds=5),
+                                                        timedelta(seconds=10), self.logger, self.logger)
+        self.write_schedule(1, 3)
+        results = []
+        worker = threading.Thread(target=lambda: results.append(
+            read_new_schedules_and_configuration(usb, _ID_NUMBER, self.logger, running_schedules_for_sampler)))
+        worker.start()
+        worker.join()
+        configuration, new_schedules_for_sampler, schedule_diff = results[0]
+        self.assertEqual([event.get_bag_number() for event in new_schedules_for_sampler.get_complete_bag_schedule()],
+                         [1, 3])
+        self.assertEqual(len(schedule_diff.get_changed_bag_events()), 1)
+        # the handlers of the user logger used by the thread of the event loop are kept
+        self.assertEqual(self.user_logger.handlers, [self.user_handler])
+        # the empty error file of the reload is deleted
+        self.assertEqual(sorted(os.listdir(self.usb_path)), ["90_config.txt", "90_schedule.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+"""
+Tests for resuming a schedule after the sampler stopped in the middle of a sample, with and without the last checkpoint
+of the journal, including a sample interrupted by stopping the runtime.
+
+Run from the root of the repository:
+    python3 -m pytest tests
+"""
+
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+from checkpoint_journal import *
+from diode import *
+from gpio_backend import *
+from runtime import *
+from sampler import *
+from sampler_schedule import *
+from scheduler import *
+from usb_drive import *
+
+_SCHEDULE = "Bag number, Start filling, Stop filling\n" \
+            "1,  2020-03-06 11:00:00,  2020-03-06 11:30:00\n" \
+            "2,  2020-03-06 12:00:00,  2020-03-06 12:10:00\n"
+# the valve of bag 1 should be open, the sampler starts again after the Pi lost power
+_CURRENT_TIME = datetime(2020, 3, 6, 11, 20, 0)
+# the last journaled events before the sampler stopped
+_VALVE_OPEN = Checkpoint(datetime(2020, 3, 6, 11, 0, 0), "open valve", 1, True, 1)
+_VALVE_CLOSED = Checkpoint(datetime(2020, 3, 6, 11, 10, 0), "close valve", 1, False, None)
+_PUMP_ON = Checkpoint(datetime(2020, 3, 6, 10, 59, 55), "turn pump on", None, True, None)
+# events of bag 2, which are executed with every policy
+_BAG_2_EVENTS = [("2020-03-06 11:59:55", None, "turn pump on"), ("2020-03-06 12:00:00", 2, "open valve"),
+                 ("2020-03-06 12:10:00", 2, "close valve"), ("2020-03-06 12:10:05", None, "turn pump off")]
+_RESUMED_EVENTS = [("2020-03-06 10:59:55", None, "turn pump on"), ("2020-03-06 11:20:00", 1, "open valve"),
+                   ("2020-03-06 11:30:00", 1, "close valve"), ("2020-03-06 11:30:05", None, "turn pump off")] \
+    + _BAG_2_EVENTS
+_TRUNCATED_EVENTS = [("2020-03-06 11:20:00", 1, "close valve")] + _BAG_2_EVENTS
+
+class ResumedScheduleTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.mkdtemp()
+        cls.file_path = os.path.join(cls.folder, "90_schedule.txt")
+        with open(cls.file_path, "w") as schedule_file:
+            schedule_file.write(_SCHEDULE)
+        logger = logging.getLogger("test logger")
+        cls.schedule = SamplerSchedule(cls.file_path, timedelta(seconds=5), timedelta(seconds=5),
+                                       timedelta(seconds=10), logger, logger)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.folder)
+        SamplerSchedule._parsed_schedules.clear()
+
+    def get_events(self, interrupted_sample_policy, last_checkpoint=None):
+        """
+        :return: list of tuples (time, bag number or None, action) of the resumed actuator events
+        """
+        actuator_events = self.schedule.iter_resumed_actuator_events(_CURRENT_TIME, interrupted_sample_policy,
+                                                                     last_checkpoint)
+        # the pump turns on at its scheduled time in the past, so it is executed immediately
+        return [(schedule_time.format_time(event.get_time()), getattr(event, "get_valve_number", lambda: None)(),
+                 event.get_action()) for event in actuator_events]
+
+    def test_resume(self):
+        self.assertEqual(self.get_events("resume"), _RESUMED_EVENTS)
+        self.assertEqual(self.get_events("resume", _VALVE_OPEN), _RESUMED_EVENTS)
+        self.assertEqual(self.get_events("resume", _PUMP_ON), _RESUMED_EVENTS)
+        # the journal shows the valve closed after it opened, so the sample isn't reopened
+        self.assertEqual(self.get_events("resume", _VALVE_CLOSED), _BAG_2_EVENTS)
+
+    def test_truncate(self):
+        self.assertEqual(self.get_events("truncate"), _TRUNCATED_EVENTS)
+        self.assertEqual(self.get_events("truncate", _VALVE_OPEN), _TRUNCATED_EVENTS)
+        # the valve is already closed or never opened, there is nothing to truncate
+        self.assertEqual(self.get_events("truncate", _VALVE_CLOSED), _BAG_2_EVENTS)
+        self.assertEqual(self.get_events("truncate", _PUMP_ON), _BAG_2_EVENTS)
+
+    def test_skip(self):
+        for last_checkpoint in (None, _VALVE_OPEN, _VALVE_CLOSED, _PUMP_ON):
+            self.assertEqual(self.get_events("skip", last_checkpoint), _BAG_2_EVENTS)
+
+    def test_checkpoint_of_earlier_sample(self):
+        # the valve of bag 1 was open during an earlier sample, the sample at `_CURRENT_TIME` never started
+        checkpoint = Checkpoint(datetime(2020, 3, 6, 9, 0, 0), "open valve", 1, True, 1)
+        self.assertEqual(self.get_events("resume", checkpoint), _RESUMED_EVENTS)
+        self.assertEqual(self.get_events("truncate", checkpoint), _BAG_2_EVENTS)
+
+    def test_checkpoint_from_journal(self):
+        journal_path = os.path.join(self.folder, "90_checkpoint.bin")
+        journal = CheckpointJournal(journal_path, logging.getLogger("test logger"))
+        for event in self.get_events("resume")[:2]:
+            journal.record_event(ValveEvent(datetime.fromisoformat(event[0]), event[1], event[2])
+                                 if event[1] is not None else PumpEvent(datetime.fromisoformat(event[0]), event[2]))
+        journal.close()
+        last_checkpoint = read_last_checkpoint(journal_path)
+        self.assertEqual(last_checkpoint.get_open_bag_number(), 1)
+        self.assertTrue(last_checkpoint.is_pump_on())
+        self.assertEqual(self.get_events("truncate", last_checkpoint), _TRUNCATED_EVENTS)
+        # a torn record at the end of the journal is ignored
+        with open(journal_path, "ab") as journal_file:
+            journal_file.write(b"\x01\x02\x03")
+        self.assertEqual(read_last_checkpoint(journal_path).get_open_bag_number(), 1)
+
+class RuntimeStopTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.folder, "media"))
+        self.logger = logging.getLogger("test logger")
+        self.fake_gpio = select_gpio_backend("fake")
+        GPIO.setmode(GPIO.BCM)
+        self.sampler = Sampler(27, {1: 17}, "BCM", self.logger)
+        self.diode = Diode(18, "BCM", self.logger)
+        self.diode.set_diode_light_duration(timedelta(seconds=1))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+        SamplerSchedule._parsed_schedules.clear()
+
+    def test_resume_after_shutdown(self):
+        # the valve of bag 1 should be open for another hour
+        start_time = datetime.now().replace(microsecond=0) - timedelta(minutes=1)
+        file_path = os.path.join(self.folder, "90_schedule.txt")
+        with open(file_path, "w") as schedule_file:
+            schedule_file.write("Bag number, Start filling, Stop filling\n1,  {},  {}\n".format(
+                schedule_time.format_time(start_time), schedule_time.format_time(start_time + timedelta(hours=1))))
+        schedule = SamplerSchedule(file_path, timedelta(seconds=5), timedelta(seconds=5), timedelta(seconds=10),
+                                   self.logger, self.logger)
+        journal_path = os.path.join(self.folder, "90_checkpoint.bin")
+        journal = CheckpointJournal(journal_path, self.logger)
+        scheduler = Scheduler(schedule.iter_resumed_actuator_events(datetime.now(), "resume"), self.sampler,
+                              self.logger, checkpoint_journal=journal)
+        runtime = SamplerRuntime(scheduler, USB_drive(self.logger, os.path.join(self.folder, "media")), self.diode,
+                                 self.logger, lambda: None, lambda new_schedule: self.diode)
+
+        async def run():
+            # the pump and the valve are due immediately, the program is stopped in the middle of the sample
+            asyncio.get_running_loop().call_later(0.05, scheduler.request_shutdown)
+            return await runtime.run()
+
+        self.assertEqual(asyncio.run(asyncio.wait_for(run(), 5)), "shutdown")
+        journal.close()
+        self.assertFalse(self.sampler.bag_to_valve_objects_dict[1].valve_is_open())
+        last_checkpoint = read_last_checkpoint(journal_path)
+        self.assertEqual(last_checkpoint.get_open_bag_number(), 1)
+        resumed_events = list(schedule.iter_resumed_actuator_events(datetime.now(), "resume", last_checkpoint))
+        self.assertEqual([(getattr(event, "get_valve_number", lambda: None)(), event.get_action())
+                          for event in resumed_events],
+                         [(None, "turn pump on"), (1, "open valve"), (1, "close valve"), (None, "turn pump off")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Tests for stopping the runtime when one of its background tasks fails.
+
+Run from the root of the repository:
+    python3 -m pytest tests
+"""
+
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+from gpio_backend import *
+from diode import *
+from pump_event import *
+from runtime import *
+from sampler import *
+from scheduler import *
+from usb_drive import *
+
+_TIMEOUT = 5
+
+class _USBDriveFailingOnCancel():
+    """
+    USB drive whose watch raises an exception instead of stopping when it is cancelled.
+    """
+    async def watch_async(self, on_reinsertion, on_removal, poll_interval):
+        try:
+            await asyncio.sleep(_TIMEOUT)
+        except asyncio.CancelledError:
+            raise RuntimeError("inotify watch can't be removed")
+
+class RuntimeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.media_path = tempfile.mkdtemp()
+        self.logger = logging.getLogger("test logger")
+        self.fake_gpio = select_gpio_backend("fake")
+        GPIO.setmode(GPIO.BCM)
+        self.sampler = Sampler(27, {1: 17}, "BCM", self.logger)
+        self.diode = Diode(18, "BCM", self.logger)
+        self.diode.set_diode_light_duration(timedelta(seconds=1))
+
+    def tearDown(self):
+        shutil.rmtree(self.media_path)
+
+    def create_runtime(self):
+        # the only event is far in the future, so the runtime only stops when it is shut down
+        scheduler = Scheduler(iter([PumpEvent(datetime.now() + timedelta(days=1), "turn pump on")]), self.sampler,
+                              self.logger)
+        return SamplerRuntime(scheduler, USB_drive(self.logger, self.media_path), self.diode, self.logger,
+                              lambda: None, lambda new_schedule: self.diode)
+
+    def test_finished_schedule(self):
+        runtime = self.create_runtime()
+        start_time = datetime.now()
+        stop_time = start_time + timedelta(milliseconds=50)
+        runtime.scheduler.set_actuator_events(iter([PumpEvent(start_time, "turn pump on"),
+                                                    PumpEvent(stop_time, "turn pump off")]),
+                                              self.sampler)
+        reason = asyncio.run(asyncio.wait_for(runtime.run(), _TIMEOUT))
+        self.assertEqual(reason, "finished")
+        self.assertIsNone(runtime.scheduler.get_next_event())
+        self.assertIn(1, [level for _, _, level in self.fake_gpio.recorder.get_transitions(27)])
+        self.assertEqual(self.fake_gpio.get_level(27), 0)
+
+    def test_shutdown_leaves_gpio_pins_safe(self):
+        runtime = self.create_runtime()
+        runtime.scheduler.set_actuator_events(iter([PumpEvent(datetime.now(), "turn pump on"),
+                                                    PumpEvent(datetime.now() + timedelta(days=1), "turn pump off")]),
+                                              self.sampler)
+
+        async def run():
+            asyncio.get_running_loop().call_later(0.05, runtime.scheduler.request_shutdown)
+            return await runtime.run()
+
+        reason = asyncio.run(asyncio.wait_for(run(), _TIMEOUT))
+        self.assertEqual(reason, "shutdown")
+        self.assertEqual(runtime.scheduler.get_next_event().get_action(), "turn pump off")
+        # the pump was on when the runtime was shut down, the pump, the valve and the diode are left off
+        self.assertIn(1, [level for _, _, level in self.fake_gpio.recorder.get_transitions(27)])
+        for pin_number in (27, 17, 18):
+            self.assertEqual(self.fake_gpio.get_level(pin_number), 0)
+
+    def test_failed_task_stops_runtime(self):
+        runtime = self.create_runtime()
+        runtime.reconcile_interval = 0.01
+
+        def fail_to_reconcile():
+            raise OSError("GPIO pin can't be written")
+
+        self.sampler.reconcile = fail_to_reconcile
+        with self.assertLogs(self.logger, logging.ERROR) as logs:
+            reason = asyncio.run(asyncio.wait_for(runtime.run(), _TIMEOUT))
+        self.assertEqual(reason, "shutdown")
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("runtime.py: reconciling the actuators failed, stopping the runtime", logs.output[0])
+        self.assertIn("OSError: GPIO pin can't be written", logs.output[0])
+        self.assertEqual(runtime.task_descriptions, {})
+
+    def test_task_failing_while_stopping_is_logged(self):
+        runtime = self.create_runtime()
+        runtime.usb = _USBDriveFailingOnCancel()
+
+        async def run():
+            asyncio.get_running_loop().call_later(0.01, runtime.scheduler.request_shutdown)
+            return await runtime.run()
+
+        with self.assertLogs(self.logger, logging.ERROR) as logs:
+            reason = asyncio.run(asyncio.wait_for(run(), _TIMEOUT))
+        self.assertEqual(reason, "shutdown")
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("runtime.py: watching the USB drive failed while stopping", logs.output[0])
+        self.assertIn("RuntimeError: inotify watch can't be removed", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
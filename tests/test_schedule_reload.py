@@ -0,0 +1,163 @@
+"""
+Tests for comparing and splicing the running schedule with the schedule of a reinserted USB drive.
+
+Run from the root of the repository:
+    python3 -m pytest tests
+"""
+
+from datetime import datetime, timedelta
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+from gpio_backend import *
+from sampler import *
+from sampler_schedule import *
+
+_HEADER = "Bag number, Start filling, Stop filling\n"
+# bag 1 fills at 11:00, the file of the new USB drive schedules bag 3 and bag 2 instead
+_SCHEDULE_A = _HEADER + "1,  2020-03-06 11:00:00,  2020-03-06 11:30:00\n"
+_SCHEDULE_B = _HEADER + "3,  2020-03-06 10:20:00,  2020-03-06 11:10:00\n" \
+                        "2,  2020-03-06 11:40:00,  2020-03-06 11:50:00\n"
+# bag 1 is unchanged, bag 3 is added
+_SCHEDULE_C = _SCHEDULE_A + "3,  2020-03-06 11:40:00,  2020-03-06 11:50:00\n"
+_CURRENT_TIME = datetime(2020, 3, 6, 11, 5, 0)
+_BAG_TO_VALVE_PIN_NUMBERS_DICT = {1: 17, 2: 22, 3: 10}
+
+class ScheduleReloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.logger = logging.getLogger("test logger")
+        SamplerSchedule._parsed_schedules.clear()
+        self.fake_gpio = select_gpio_backend("fake")
+        GPIO.setmode(GPIO.BCM)
+        self.sampler = Sampler(27, _BAG_TO_VALVE_PIN_NUMBERS_DICT, "BCM", self.logger)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+        SamplerSchedule._parsed_schedules.clear()
+
+    def write_schedule(self, file_name, content):
+        file_path = os.path.join(self.folder, file_name)
+        with open(file_path, "w") as schedule_file:
+            schedule_file.write(content)
+        # the reinserted file must not look unchanged because of the same size and modification time
+        os.utime(file_path, ns=(len(content), len(content)))
+        return file_path
+
+    def read_schedule(self, file_path):
+        return SamplerSchedule(file_path, timedelta(seconds=5), timedelta(seconds=5), timedelta(seconds=10),
+                               self.logger, self.logger)
+
+    def start_schedule(self, file_path):
+        """
+        Reads the running schedule and executes its events until `_CURRENT_TIME`.
+        :return: `SamplerSchedule` object
+        """
+        old_schedule = self.read_schedule(file_path)
+        for event in old_schedule.iter_complete_actuator_events():
+            if event.get_time() <= _CURRENT_TIME:
+                event.execute(self.sampler)
+        self.assertTrue(self.sampler.bag_to_valve_objects_dict[1].valve_is_open())
+        return old_schedule
+
+    def swap_schedules(self, old_schedule, new_schedule):
+        """
+        Swaps the running schedule at `_CURRENT_TIME` like `swap_schedules_and_configuration` in `main.py`.
+        :return: `ScheduleDiff` object, list of tuples (bag number or None, action) of the events executed after the
+        swap
+        """
+        schedule_diff = new_schedule.get_schedule_diff(old_schedule)
+        spliced_schedules = new_schedule.get_spliced_schedules(old_schedule, schedule_diff, _CURRENT_TIME)
+        if spliced_schedules is None:
+            self.sampler.turn_pump_off()
+            self.sampler.close_all_valves()
+            actuator_events = list(new_schedule.iter_current_actuator_events(_CURRENT_TIME))
+        else:
+            actuator_events = list(merge_actuator_events(*spliced_schedules))
+        for event in actuator_events:
+            event.execute(self.sampler)
+        return schedule_diff, [(getattr(event, "get_valve_number", lambda: None)(), event.get_action())
+                               for event in actuator_events]
+
+    def test_swap_files_with_same_path(self):
+        file_path = self.write_schedule("90_schedule.txt", _SCHEDULE_A)
+        old_schedule = self.start_schedule(file_path)
+        self.write_schedule("90_schedule.txt", _SCHEDULE_B)
+        new_schedule = self.read_schedule(file_path)
+        schedule_diff, events = self.swap_schedules(old_schedule, new_schedule)
+        self.assertEqual(schedule_diff.get_summary(), "1 removed, 2 inserted, 0 changed bag events")
+        self.assertEqual(events, [(None, "turn pump on"), (2, "open valve"), (2, "close valve"),
+                                  (None, "turn pump off")])
+        self.assertEqual(self.fake_gpio.get_level(_BAG_TO_VALVE_PIN_NUMBERS_DICT[1]), GPIO.LOW)
+        self.assertEqual(self.sampler.valve_bank.get_open_bags(), set())
+
+    def test_swap_files_with_different_paths(self):
+        old_schedule = self.start_schedule(self.write_schedule("90_schedule.txt", _SCHEDULE_A))
+        new_file_path = self.write_schedule("other_90_schedule.txt", _SCHEDULE_B)
+        os.remove(os.path.join(self.folder, "90_schedule.txt"))
+        new_schedule = self.read_schedule(new_file_path)
+        schedule_diff, _ = self.swap_schedules(old_schedule, new_schedule)
+        self.assertEqual(schedule_diff.get_summary(), "1 removed, 2 inserted, 0 changed bag events")
+        self.assertEqual(self.fake_gpio.get_level(_BAG_TO_VALVE_PIN_NUMBERS_DICT[1]), GPIO.LOW)
+
+    def test_unchanged_sample_keeps_running(self):
+        file_path = self.write_schedule("90_schedule.txt", _SCHEDULE_A)
+        old_schedule = self.start_schedule(file_path)
+        self.write_schedule("90_schedule.txt", _SCHEDULE_C)
+        new_schedule = self.read_schedule(file_path)
+        schedule_diff, events = self.swap_schedules(old_schedule, new_schedule)
+        self.assertEqual(schedule_diff.get_summary(), "0 removed, 1 inserted, 0 changed bag events")
+        self.assertEqual(events[0], (1, "close valve"))
+        self.assertEqual(self.fake_gpio.get_level(_BAG_TO_VALVE_PIN_NUMBERS_DICT[1]), GPIO.LOW)
+
+    def test_current_schedule_of_changed_file(self):
+        file_path = self.write_schedule("90_schedule.txt", _SCHEDULE_A)
+        schedule = self.read_schedule(file_path)
+        self.write_schedule("90_schedule.txt", _SCHEDULE_B)
+        # the position of the current event and the events must both come from the changed file
+        current_time = datetime(2020, 3, 6, 10, 0, 0)
+        self.assertEqual([event.get_bag_number() for event in schedule.get_current_bag_schedule(current_time)], [3, 2])
+        self.assertEqual([event.get_valve_number() for event in schedule.get_current_valve_schedule(current_time)],
+                         [3, 3, 2, 2])
+        self.assertEqual(len(schedule.get_current_pump_schedule(current_time)), 4)
+
+
+    def test_removed_sample_is_not_spliced(self):
+        old_schedule = self.read_schedule(self.write_schedule("90_schedule.txt", _SCHEDULE_A))
+        new_schedule = self.read_schedule(self.write_schedule("other_90_schedule.txt", _SCHEDULE_B))
+        schedule_diff = new_schedule.get_schedule_diff(old_schedule)
+        self.assertEqual(schedule_diff.get_summary(), "1 removed, 2 inserted, 0 changed bag events")
+        # the sample of bag 1 in progress was removed, so the new schedule isn't spliced into the running one
+        self.assertIsNone(new_schedule.get_spliced_schedules(old_schedule, schedule_diff, _CURRENT_TIME))
+
+    def test_spliced_schedules_continue_sample(self):
+        old_schedule = self.read_schedule(self.write_schedule("90_schedule.txt", _SCHEDULE_A))
+        new_schedule = self.read_schedule(self.write_schedule("other_90_schedule.txt", _SCHEDULE_C))
+        schedule_diff = new_schedule.get_schedule_diff(old_schedule)
+        self.assertEqual(schedule_diff.get_summary(), "0 removed, 1 inserted, 0 changed bag events")
+        valve_events, pump_events = new_schedule.get_spliced_schedules(old_schedule, schedule_diff, _CURRENT_TIME)
+        # the valve of bag 1 isn't opened again, the spliced schedules continue with its remaining events
+        self.assertEqual([(event.get_valve_number(), event.get_valve_action()) for event in valve_events],
+                         [(1, "close valve"), (3, "open valve"), (3, "close valve")])
+        self.assertEqual([(event.get_pump_time(), event.get_pump_action()) for event in pump_events],
+                         [(datetime(2020, 3, 6, 11, 30, 5), "turn pump off"),
+                          (datetime(2020, 3, 6, 11, 39, 55), "turn pump on"),
+                          (datetime(2020, 3, 6, 11, 50, 5), "turn pump off")])
+
+    def test_unchanged_file(self):
+        old_schedule = self.read_schedule(self.write_schedule("90_schedule.txt", _SCHEDULE_C))
+        new_schedule = self.read_schedule(self.write_schedule("other_90_schedule.txt", _SCHEDULE_C))
+        schedule_diff = new_schedule.get_schedule_diff(old_schedule)
+        self.assertTrue(schedule_diff.is_empty())
+        self.assertEqual(schedule_diff.get_summary(), "0 removed, 0 inserted, 0 changed bag events")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Differential tests of the fast path of `SamplerSchedule.convert_string_to_datetime` against the parser with
+`datetime.strptime` it replaced. Both parsers must return the same time or raise the same type of error for every input.
+
+Run from the root of the repository:
+    python3 -m pytest tests
+"""
+
+from datetime import datetime, timedelta
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+from sampler_schedule import *
+import sampler_schedule
+
+_VALID_TIMES = ["2020-03-06 11:38:00", "2020-03-06 11:38:00.250", "2020-03-06 11:38:00.5", "2020-03-06 11:38:00.05",
+                " 2020-03-06 11:38:00 ", "\t2020-03-06 11:38:00.001\t", "2020-02-29 23:59:59.999",
+                "1970-01-01 00:00:00", "9999-12-31 23:59:59"]
+_EDGE_CASES = ["2019-02-29 12:00:00", "2020-13-01 12:00:00", "2020-00-10 12:00:00", "2020-04-31 12:00:00",
+               "2020-03-06 24:00:00", "2020-03-06 23:60:00", "2020-03-06 23:59:60", "2020-03-06 23:59:61",
+               "0000-01-01 00:00:00", "2020-3-6 1:2:3", "2020-03-06  11:38:00", "2020-03-06T11:38:00",
+               "2020-03-06 11:38:00.", "2020-03-06 11:38:00.1234", "2020-03-06 11:38:00.123456",
+               "2020-03-06 11:38:00.1234567", "2020-03-06 11:38", "2020-03-06", "", " ", "+2020-03-06 11:38:00",
+               "2020-03-06 11:38:0١", "٢020-03-06 11:38:00", "2020-03-06 11:38:00 .250"]
+# characters that are inserted or substituted when mutating valid times
+_MUTATION_CHARACTERS = "0123456789 -:.\tT+x٣"
+_NUMBER_OF_MUTATIONS = 20000
+
+def _parse(parser, time_string):
+    """
+    :return: `datetime` object returned by `parser`, or the type of the error it raised
+    """
+    try:
+        return parser(time_string)
+    except (ValueError, AssertionError) as error:
+        return type(error)
+
+def _mutate(time_string, random_generator):
+    """
+    :return: `time_string` with one to three characters substituted, inserted or deleted
+    """
+    characters = list(time_string)
+    for _ in range(random_generator.randint(1, 3)):
+        position = random_generator.randrange(len(characters) + 1)
+        operation = random_generator.choice(("substitute", "insert", "delete"))
+        if operation == "insert" or position == len(characters):
+            characters.insert(position, random_generator.choice(_MUTATION_CHARACTERS))
+        elif operation == "substitute":
+            characters[position] = random_generator.choice(_MUTATION_CHARACTERS)
+        else:
+            del characters[position]
+    return "".join(characters)
+
+class ScheduleTimeParserTest(unittest.TestCase):
+
+    def assertSameResult(self, time_string):
+        self.assertEqual(_parse(SamplerSchedule.convert_string_to_datetime, time_string),
+                         _parse(sampler_schedule._parse_time_with_strptime, time_string), repr(time_string))
+
+    def test_valid_times(self):
+        for time_string in _VALID_TIMES:
+            self.assertIsInstance(SamplerSchedule.convert_string_to_datetime(time_string), datetime)
+            self.assertSameResult(time_string)
+        self.assertEqual(SamplerSchedule.convert_string_to_datetime("2020-03-06 11:38:00.05"),
+                         datetime(2020, 3, 6, 11, 38, 0, 50000))
+
+    def test_edge_cases(self):
+        for time_string in _EDGE_CASES:
+            self.assertSameResult(time_string)
+
+    def test_random_times(self):
+        random_generator = random.Random(2020)
+        start = datetime(1970, 1, 1)
+        for _ in range(2000):
+            time = start + timedelta(milliseconds=random_generator.randrange(300 * 365 * 24 * 3600 * 1000))
+            self.assertSameResult(schedule_time.format_time(time))
+
+    def test_mutated_times(self):
+        random_generator = random.Random(3)
+        for _ in range(_NUMBER_OF_MUTATIONS):
+            self.assertSameResult(_mutate(random_generator.choice(_VALID_TIMES), random_generator))
+
+
+if __name__ == "__main__":
+    unittest.main()
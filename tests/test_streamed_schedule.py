@@ -0,0 +1,118 @@
+"""
+Tests for sorting the bag events in runs and streaming them to the compiled schedule file, by a single process and by
+validation workers.
+
+Run from the root of the repository:
+    python3 -m pytest tests
+"""
+
+from datetime import datetime, timedelta
+import logging
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+from sampler_schedule import *
+
+_HEADER = "Bag number, Start filling, Stop filling"
+_START_TIME = datetime(2020, 3, 6, 11, 0, 0)
+
+def _get_schedule_lines(number_of_lines):
+    """
+    :return: list of lines of bag events one minute apart, every two lines are swapped
+    """
+    lines = []
+    for index in range(number_of_lines):
+        position = index ^ 1 if index ^ 1 < number_of_lines else index
+        time_on = _START_TIME + timedelta(minutes=position)
+        lines.append("{},  {},  {}".format(position % 8 + 1, schedule_time.format_time(time_on),
+                                           schedule_time.format_time(time_on + timedelta(seconds=30))))
+    return lines
+
+class StreamedScheduleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.folder, "90_schedule.txt")
+        self.compiled_file_path = os.path.join(self.folder, "90_schedule.bin")
+        self.logger = logging.getLogger("test logger")
+        self.sort_run_length = SamplerSchedule._sort_run_length
+        self.min_chunk_size = SamplerSchedule._min_chunk_size
+        self.min_parallel_file_size = SamplerSchedule._min_parallel_file_size
+        SamplerSchedule._sort_run_length = 7
+        SamplerSchedule._parsed_schedules.clear()
+
+    def tearDown(self):
+        SamplerSchedule._sort_run_length = self.sort_run_length
+        SamplerSchedule._min_chunk_size = self.min_chunk_size
+        SamplerSchedule._min_parallel_file_size = self.min_parallel_file_size
+        SamplerSchedule._parsed_schedules.clear()
+        shutil.rmtree(self.folder)
+
+    def read_schedule(self, lines, validation_workers=1, newline="\n"):
+        with open(self.file_path, "w", newline="") as schedule_file:
+            schedule_file.write("".join(line + newline for line in [_HEADER] + lines))
+        SamplerSchedule._parsed_schedules.clear()
+        return SamplerSchedule(self.file_path, timedelta(seconds=5), timedelta(seconds=5), timedelta(seconds=10),
+                               self.logger, self.logger, self.compiled_file_path, validation_workers)
+
+    def get_records(self, schedule):
+        bag_schedule = schedule.get_snapshot_bag_schedule()
+        return list(zip(bag_schedule.bag_numbers, bag_schedule.start_times, bag_schedule.stop_times))
+
+    def test_sorted_in_runs(self):
+        schedule = self.read_schedule(_get_schedule_lines(50))
+        start_times = [start_time for _, start_time, _ in self.get_records(schedule)]
+        self.assertEqual(len(start_times), 50)
+        self.assertEqual(start_times, sorted(start_times))
+        self.assertEqual(sorted(os.listdir(self.folder)), ["90_schedule.bin", "90_schedule.txt"])
+        # the columns aren't built in memory, they are views of the mapped compiled schedule file
+        for column in (schedule.get_snapshot_bag_schedule().start_times, schedule.snapshot_pump_intervals.times_on):
+            self.assertIsInstance(column.base.obj if hasattr(column, "base") else column.obj, mmap.mmap)
+        # the streamed pump intervals are the same as the pump intervals created from the columns
+        pump_intervals = schedule.get_snapshot_bag_schedule().get_pump_intervals(5000, 5000, 10000)
+        self.assertEqual(list(schedule.snapshot_pump_intervals.times_on), list(pump_intervals.times_on))
+        self.assertEqual(list(schedule.snapshot_pump_intervals.times_off), list(pump_intervals.times_off))
+        self.assertEqual(compiled_schedule.read_compiled_schedule(self.compiled_file_path, self.file_path)[0]
+                         .get_content_hash(), schedule.parsed_schedule.get_content_hash())
+
+    def test_overlaps_across_runs(self):
+        lines = _get_schedule_lines(20)
+        lines.append("3,  2020-03-06 11:12:10,  2020-03-06 11:12:20")
+        with self.assertRaises(ScheduleFileErrors) as error:
+            self.read_schedule(lines)
+        self.assertEqual(len(error.exception.message_list), 1)
+        self.assertIn("-> `5, 2020-03-06 11:12:00, 2020-03-06 11:12:30`\n"
+                      "   -> `3, 2020-03-06 11:12:10, 2020-03-06 11:12:20`", error.exception.message_list[0])
+        # an invalid schedule doesn't leave a compiled schedule file
+        self.assertEqual(os.listdir(self.folder), ["90_schedule.txt"])
+
+    def test_validation_workers(self):
+        SamplerSchedule._min_chunk_size = 64
+        SamplerSchedule._min_parallel_file_size = 0
+        lines = _get_schedule_lines(40)
+        lines[25] = "14,  2020-03-06 11:24:00,  2020-03-06 11:24:30"
+        serial_records = None
+        for validation_workers in (1, 3):
+            with self.assertRaises(ScheduleFileErrors) as error:
+                self.read_schedule(lines, validation_workers, newline="\r\n")
+            self.assertEqual(len(error.exception.message_list), 1)
+            self.assertIn("- Line 27: Invalid line (`14,", error.exception.message_list[0])
+        del lines[25]
+        for validation_workers in (1, 3):
+            records = self.get_records(self.read_schedule(lines, validation_workers, newline="\r\n"))
+            serial_records = serial_records or records
+            self.assertEqual(records, serial_records)
+        self.assertEqual(len(serial_records), 39)
+        with self.assertLogs(self.logger, logging.INFO) as logs:
+            self.read_schedule(lines, 3)
+        self.assertTrue(any("in 3 chunks" in message for message in logs.output))
+
+
+if __name__ == "__main__":
+    unittest.main()
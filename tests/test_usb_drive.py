@@ -0,0 +1,143 @@
+"""
+Tests for watching the folder where USB drives are mounted, including the folder being deleted and created again.
+
+Run from the root of the repository:
+    python3 -m pytest tests
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+from usb_drive import *
+
+_POLL_INTERVAL = 0.02
+_TIMEOUT = 5
+
+class USBDriveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.media_path = os.path.join(self.folder, "media")
+        os.mkdir(self.media_path)
+        self.logger = logging.getLogger("test logger")
+        self.changes = []
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def insert_drive(self, usb_name):
+        """
+        Creates the folder of a mounted USB drive with a schedule file in it, the folder is moved into the mount folder
+        so it is never seen empty.
+        """
+        usb_path = os.path.join(self.folder, usb_name)
+        os.mkdir(usb_path)
+        open(os.path.join(usb_path, "90_schedule.txt"), "w").close()
+        os.rename(usb_path, os.path.join(self.media_path, usb_name))
+
+    async def wait_for_changes(self, number_of_changes):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + _TIMEOUT
+        while len(self.changes) < number_of_changes and loop.time() < deadline:
+            await asyncio.sleep(_POLL_INTERVAL)
+        self.assertEqual(len(self.changes), number_of_changes)
+
+    def test_insertion_and_removal_are_noticed(self):
+        usb = USB_drive(self.logger, self.media_path)
+        self.assertFalse(usb.is_inserted())
+
+        async def run():
+            watch_task = asyncio.ensure_future(usb.watch_async(lambda: self.changes.append("inserted"),
+                                                               lambda: self.changes.append("removed"),
+                                                               _POLL_INTERVAL))
+            try:
+                await asyncio.sleep(_POLL_INTERVAL)
+                self.insert_drive("usb_1")
+                await self.wait_for_changes(1)
+                shutil.rmtree(os.path.join(self.media_path, "usb_1"))
+                await self.wait_for_changes(2)
+                self.insert_drive("usb_2")
+                await self.wait_for_changes(3)
+            finally:
+                watch_task.cancel()
+                await asyncio.gather(watch_task, return_exceptions=True)
+
+        asyncio.run(run())
+        self.assertEqual(self.changes, ["inserted", "removed", "inserted"])
+        # the paths are created from the cached name and list of files of the drive
+        self.assertEqual(usb.get_path_for_schedule_file(90), os.path.join(self.media_path, "usb_2", "90_schedule.txt"))
+        self.assertEqual(usb.get_list_of_files(), ["90_schedule.txt"])
+
+    def test_insertion_waits_until_drive_is_mounted(self):
+        usb = USB_drive(self.logger, self.media_path)
+
+        async def run():
+            watch_task = asyncio.ensure_future(usb.watch_async(lambda: self.changes.append("inserted"),
+                                                               lambda: self.changes.append("removed"),
+                                                               _POLL_INTERVAL))
+            try:
+                await asyncio.sleep(_POLL_INTERVAL)
+                # the folder of the drive is created before its file system is mounted
+                usb_path = os.path.join(self.media_path, "usb_1")
+                os.mkdir(usb_path)
+                await asyncio.sleep(_POLL_INTERVAL * 5)
+                open(os.path.join(usb_path, "90_schedule.txt"), "w").close()
+                await self.wait_for_changes(1)
+            finally:
+                watch_task.cancel()
+                await asyncio.gather(watch_task, return_exceptions=True)
+
+        asyncio.run(run())
+        self.assertEqual(self.changes, ["inserted"])
+        self.assertEqual(usb.get_list_of_files(), ["90_schedule.txt"])
+
+
+    def test_multiple_drives_are_logged(self):
+        self.insert_drive("usb_1")
+        self.insert_drive("usb_2")
+        with self.assertLogs(self.logger, logging.ERROR) as logs:
+            usb = USB_drive(self.logger, self.media_path)
+            self.assertFalse(usb.is_inserted())
+        # a failure that lasts is logged only once
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("2 USB drives are inserted (usb_1, usb_2)", logs.output[0])
+        shutil.rmtree(os.path.join(self.media_path, "usb_2"))
+        self.assertTrue(usb.is_inserted())
+        self.assertEqual(usb.get_list_of_files(), ["90_schedule.txt"])
+
+    def test_watch_after_mount_folder_is_deleted(self):
+        usb = USB_drive(self.logger, self.media_path)
+
+        async def run():
+            watch_task = asyncio.ensure_future(usb.watch_async(lambda: self.changes.append("inserted"),
+                                                               lambda: self.changes.append("removed"),
+                                                               _POLL_INTERVAL))
+            try:
+                await asyncio.sleep(_POLL_INTERVAL)
+                self.insert_drive("usb_1")
+                await self.wait_for_changes(1)
+                # the kernel removes the watch with the folder, the drive must still be noticed when it comes back
+                shutil.rmtree(self.media_path)
+                await self.wait_for_changes(2)
+                os.mkdir(self.media_path)
+                await asyncio.sleep(_POLL_INTERVAL * 5)
+                self.insert_drive("usb_2")
+                await self.wait_for_changes(3)
+            finally:
+                watch_task.cancel()
+                await asyncio.gather(watch_task, return_exceptions=True)
+
+        asyncio.run(run())
+        self.assertEqual(self.changes, ["inserted", "removed", "inserted"])
+        self.assertEqual(usb.get_path_to_usb(), os.path.join(self.media_path, "usb_2"))
+
+
+if __name__ == "__main__":
+    unittest.main()